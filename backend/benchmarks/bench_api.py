@@ -0,0 +1,374 @@
+"""
+Teste de carga reprodutível da API
+
+Mede vazão e latências p50/p95/p99 dos cenários principais em cada backend:
+
+- login
+- lancamentos_unidade: GET /api/lancamentos de uma unidade em um mês
+- lancamentos_media_geral: o mesmo período para todas as unidades
+  ("Média Geral" no app.py)
+- submissao_lote: envio do formulário mensal de uma unidade (um lançamento
+  por indicador)
+
+Alvos:
+- sheets: app.py com a planilha falsa de fake_sheets.py (--sheets-latency);
+  com --sheets-http, via gspread até o servidor de fake_sheets_server.py
+- sqlite: app_sqlite.py com um banco temporário carregado por seed.py
+- postgres: app_postgresql_OLD.py sobre --database-url (banco DEDICADO;
+  exige --reset, pois as tabelas são recriadas a partir de schema.sql)
+
+As requisições passam pelo cliente de teste do Flask em várias threads, sem
+rede, para isolar o custo da aplicação. O resultado (com o commit atual) é
+salvo em JSON para comparação com compare.py.
+
+Uso:
+    python benchmarks/bench_api.py --targets sheets sqlite --requests 200
+    python benchmarks/bench_api.py --targets sheets --sheets-latency 0.15 --cold
+    python benchmarks/compare.py antes.json depois.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import itertools
+import threading
+import subprocess
+from collections import namedtuple
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fake_sheets
+from seed import (BENCH_PASSWORD, add_volume_arguments, volumes_from_args,
+                  seed_sqlalchemy, seed_postgres)
+
+TARGETS = ['sheets', 'sqlite', 'postgres']
+SCENARIOS = ['login', 'lancamentos_unidade', 'lancamentos_media_geral', 'submissao_lote']
+
+# request(client, i) -> resposta; reset() é chamado antes de cada iteração com --cold
+Scenario = namedtuple('Scenario', 'name request expected')
+Target = namedtuple('Target', 'name app scenarios reset info')
+
+def percentile(sorted_values, p):
+    """Percentil pelo método do posto mais próximo"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies, errors, wall):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / wall, 2) if wall else 0.0,
+        'mean_ms': round(sum(latencies) / count * 1000, 2) if count else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if count else 0.0
+    }
+
+def run_scenario(target, scenario, total, concurrency, warm_up=5, cold=False):
+    """Executa `total` iterações do cenário distribuídas em `concurrency` threads"""
+    if not cold:
+        client = target.app.test_client()
+        for i in range(warm_up):
+            scenario.request(client, total + i)
+
+    counter = itertools.count()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker():
+        client = target.app.test_client()
+        local = []
+        local_errors = 0
+        while True:
+            i = next(counter)
+            if i >= total:
+                break
+            if cold:
+                target.reset()
+            start = time.perf_counter()
+            response = scenario.request(client, i)
+            local.append(time.perf_counter() - start)
+            if response.status_code not in scenario.expected:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    return summarize(latencies, errors[0], wall)
+
+def _auth(token):
+    return {'Authorization': f'Bearer {token}'}
+
+def _submit_each(client, token, payloads):
+    """Envia vários POSTs e devolve a primeira resposta com erro (ou a última)"""
+    response = None
+    for payload in payloads:
+        response = client.post('/api/lancamentos', json=payload, headers=_auth(token))
+        if response.status_code >= 400:
+            break
+    return response
+
+def sheets_target(args, volumes):
+    os.environ['SHEETS_WARM_UP'] = 'false'
+    import app as sheets_app
+
+    password_hash = sheets_app.password_hasher.hash(BENCH_PASSWORD)
+    usuarios = volumes['unidades'] * volumes['usuarios_por_unidade']
+    sheets = fake_sheets.build_sheets(
+        unidades=volumes['unidades'],
+        indicadores=volumes['indicadores'],
+        anos=volumes['anos'],
+        ano_final=volumes['ano_final'],
+        usuarios=usuarios,
+        password_hash=password_hash
+    )
+    if args.sheets_http:
+        # Passa pelo gspread e por HTTP real até o servidor falso local
+        from fake_sheets_server import FakeSheetsServer
+        spreadsheet = FakeSheetsServer(sheets, latency=args.sheets_latency)
+        base_url, _ = spreadsheet.serve_in_thread()
+        os.environ['SHEETS_API_BASE_URL'] = base_url
+    else:
+        spreadsheet = fake_sheets.install(sheets_app.sheets_manager, sheets, args.sheets_latency)
+
+    with sheets_app.app.app_context():
+        token = sheets_app.create_access_token(identity='admin@hospital.com')
+
+    ano, mes = volumes['ano_final'], 6
+    indicadores = [f'Indicador {i}' for i in range(1, volumes['indicadores'] + 1)]
+
+    def login(client, i):
+        return client.post('/api/auth/login', json={
+            'email': f'usuario{i % usuarios}@hospital.com', 'password': BENCH_PASSWORD
+        })
+
+    def lancamentos_unidade(client, i):
+        unidade = i % volumes['unidades'] + 1
+        return client.get(f'/api/lancamentos?unidade={unidade}&ano={ano}&mes={mes}', headers=_auth(token))
+
+    def lancamentos_media_geral(client, i):
+        return client.get(f'/api/lancamentos?ano={ano}&mes={mes}', headers=_auth(token))
+
+    def submissao_lote(client, i):
+        return client.post('/api/lancamentos', headers=_auth(token), json={
+            'unidade': i % volumes['unidades'] + 1,
+            'mes': i % 12 + 1,
+            'ano': volumes['ano_final'] + 1,
+            'lancamentos': [
+                {'indicador': nome, 'numerador': i % 10, 'denominador': 100} for nome in indicadores
+            ]
+        })
+
+    def reset():
+        for sheet_name in fake_sheets.HEADERS:
+            sheets_app.sheets_manager.invalidate(sheet_name)
+
+    scenarios = [
+        Scenario('login', login, (200,)),
+        Scenario('lancamentos_unidade', lancamentos_unidade, (200,)),
+        Scenario('lancamentos_media_geral', lancamentos_media_geral, (200,)),
+        Scenario('submissao_lote', submissao_lote, (200,))
+    ]
+    return Target('sheets', sheets_app.app, scenarios, reset, {'spreadsheet': spreadsheet})
+
+def sql_scenarios(app, token, volumes):
+    """Cenários comuns a app_sqlite.py e app_postgresql_OLD.py"""
+    ano, mes = volumes['ano_final'], 6
+    usuarios = volumes['unidades'] * volumes['usuarios_por_unidade']
+    por_unidade = max(volumes['usuarios_por_unidade'], 1)
+
+    def login(client, i):
+        n = i % max(usuarios, 1)
+        email = f'operador{n // por_unidade + 1}.{n % por_unidade}@hospital.com' if usuarios else 'admin@hospital.com'
+        return client.post('/auth/login', json={'email': email, 'senha': BENCH_PASSWORD})
+
+    def lancamentos_unidade(client, i):
+        unidade = i % volumes['unidades'] + 1
+        return client.get(f'/api/lancamentos?ano={ano}&mes={mes}&unidade_id={unidade}', headers=_auth(token))
+
+    def lancamentos_media_geral(client, i):
+        return client.get(f'/api/lancamentos?ano={ano}&mes={mes}', headers=_auth(token))
+
+    def submissao_lote(client, i):
+        # Cada iteração usa um período inédito, para não violar a chave única
+        unidade = i % volumes['unidades'] + 1
+        periodo = i // volumes['unidades']
+        payloads = [
+            {
+                'indicador_id': indicador,
+                'unidade_id': unidade,
+                'ano': volumes['ano_final'] + 1 + periodo // 12,
+                'mes': periodo % 12 + 1,
+                'valor': (i + indicador) % 100
+            }
+            for indicador in range(1, volumes['indicadores'] + 1)
+        ]
+        return _submit_each(client, token, payloads)
+
+    return [
+        Scenario('login', login, (200,)),
+        Scenario('lancamentos_unidade', lancamentos_unidade, (200,)),
+        Scenario('lancamentos_media_geral', lancamentos_media_geral, (200,)),
+        Scenario('submissao_lote', submissao_lote, (201,))
+    ]
+
+def sqlite_target(args, volumes, workdir):
+    os.environ['SQLITE_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    import app_sqlite
+
+    with app_sqlite.app.app_context():
+        password_hash = app_sqlite.password_hasher.hash(BENCH_PASSWORD)
+        total = seed_sqlalchemy(app_sqlite.db, vars(app_sqlite), volumes, password_hash)
+        token = app_sqlite.create_access_token(identity='1')
+
+    def reset():
+        app_sqlite.cache.invalidate('indicadores')
+
+    scenarios = sql_scenarios(app_sqlite.app, token, volumes)
+    return Target('sqlite', app_sqlite.app, scenarios, reset, {'lancamentos': total})
+
+def postgres_target(args, volumes):
+    if not args.reset:
+        raise SystemExit('O alvo postgres recria as tabelas; confirme com --reset (use um banco dedicado)')
+
+    from werkzeug.security import generate_password_hash
+    total = seed_postgres(args.database_url, volumes, generate_password_hash(BENCH_PASSWORD), reset=True)
+
+    os.environ['DATABASE_URL'] = args.database_url
+    import app_postgresql_OLD
+    from flask_jwt_extended import create_access_token
+
+    app = app_postgresql_OLD.create_app('production')
+    with app.app_context():
+        token = create_access_token(identity='1')
+
+    def reset():
+        app.extensions['cache'].invalidate('indicadores')
+
+    scenarios = sql_scenarios(app, token, volumes)
+    return Target('postgres', app, scenarios, reset, {'lancamentos': total})
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BENCH_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return f'{commit}-dirty' if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga da API')
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=['sheets', 'sqlite'])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--requests', type=int, default=200, help='Iterações por cenário')
+    parser.add_argument('--concurrency', type=int, default=4, help='Threads simultâneas')
+    parser.add_argument('--cold', action='store_true', help='Descarta o cache antes de cada iteração')
+    parser.add_argument('--sheets-latency', type=float, default=0.0,
+                        help='Latência simulada por chamada ao Google Sheets (segundos)')
+    parser.add_argument('--sheets-http', action='store_true',
+                        help='Usa o servidor HTTP falso (fake_sheets_server.py) em vez da planilha em memória')
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--database-url', help='PostgreSQL para o alvo postgres')
+    parser.add_argument('--reset', action='store_true', help='Autoriza recriar as tabelas no PostgreSQL')
+    parser.add_argument('--output', help='Arquivo JSON (padrão: benchmarks/results/<data>_<commit>.json)')
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+
+    if 'postgres' in args.targets and not args.database_url:
+        parser.error('o alvo postgres exige --database-url')
+
+    # Configuração lida pelos módulos da aplicação no import
+    os.environ['BCRYPT_ROUNDS'] = str(args.bcrypt_rounds)
+    os.environ.setdefault('PROFILE_DIR', tempfile.gettempdir())
+    # Os logs INFO por requisição distorceriam as medições
+    logging.disable(logging.INFO)
+
+    volumes = volumes_from_args(args)
+    workdir = tempfile.mkdtemp(prefix='bench_api_')
+    commit = git_commit()
+    resultados = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'cold': args.cold,
+            'sheets_latency_s': args.sheets_latency,
+            'sheets_http': args.sheets_http,
+            'bcrypt_rounds': args.bcrypt_rounds,
+            'volumes': volumes
+        },
+        'targets': {}
+    }
+
+    try:
+        for name in args.targets:
+            if name == 'sheets':
+                target = sheets_target(args, volumes)
+            elif name == 'sqlite':
+                target = sqlite_target(args, volumes, workdir)
+            else:
+                target = postgres_target(args, volumes)
+
+            cenarios = {}
+            for scenario in target.scenarios:
+                if scenario.name not in args.scenarios:
+                    continue
+                stats = run_scenario(target, scenario, args.requests, args.concurrency, cold=args.cold)
+                cenarios[scenario.name] = stats
+                print(f"{name:<9} {scenario.name:<24} {stats['throughput_rps']:>9.1f} req/s  "
+                      f"p50 {stats['p50_ms']:>8.1f}  p95 {stats['p95_ms']:>8.1f}  "
+                      f"p99 {stats['p99_ms']:>8.1f} ms  erros {stats['errors']}")
+
+            info = dict(target.info)
+            if 'spreadsheet' in info:
+                calls = info.pop('spreadsheet').calls
+                info['sheets_api_calls'] = sum(calls.values()) if isinstance(calls, dict) else calls
+            resultados['targets'][name] = {'info': info, 'scenarios': cenarios}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output
+    if not output:
+        results_dir = os.path.join(BENCH_DIR, 'results')
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit}.json")
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f'Resultados salvos em {output}')
+
+if __name__ == '__main__':
+    main()
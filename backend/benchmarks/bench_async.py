@@ -0,0 +1,212 @@
+"""
+Benchmark do modo ASGI (asgi.py) contra o modo síncrono
+
+Sobe o app.py em um processo com o mesmo número de threads nos dois modos
+e dispara rodadas de requisições simultâneas de dashboard (ranking e
+lançamentos do mês) por HTTP real:
+
+- sync: gunicorn -k gthread --threads N (como em produção)
+- asgi: uvicorn app:asgi_app com ASGI_THREADS=N
+
+O Google Sheets é o servidor de fake_sheets_server.py com --sheets-latency.
+O cache expira entre as rodadas (--cache-ttl), de modo que cada rodada
+começa com as abas fora do cache, como num dashboard muito acessado após a
+expiração. Mede vazão, latências, erros e chamadas à API do Sheets.
+
+Exige gunicorn, uvicorn e httpx (requirements.txt).
+
+Uso:
+    python benchmarks/bench_async.py --concurrency 200 --threads 16 --rounds 5
+    python benchmarks/bench_async.py --modes asgi --sheets-latency 0.3 --output asgi.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import asyncio
+import logging
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import jwt
+import httpx
+
+from fake_sheets import build_sheets
+from fake_sheets_server import FakeSheetsServer
+from seed import add_volume_arguments, volumes_from_args
+from bench_api import summarize, git_commit
+
+MODES = ['sync', 'asgi']
+JWT_SECRET = 'bench-async-jwt-secret-com-32-bytes'
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def access_token(email):
+    """Token no formato do flask_jwt_extended"""
+    now = datetime.now(timezone.utc)
+    return jwt.encode({
+        'sub': email,
+        'type': 'access',
+        'fresh': False,
+        'jti': str(uuid.uuid4()),
+        'iat': now,
+        'nbf': now,
+        'exp': now + timedelta(hours=1)
+    }, JWT_SECRET, algorithm='HS256')
+
+def server_command(mode, port, threads):
+    if mode == 'sync':
+        return [sys.executable, '-m', 'gunicorn', '-w', '1', '-k', 'gthread', '--threads', str(threads),
+                '--timeout', '120', '-b', f'127.0.0.1:{port}', 'app:app']
+    return [sys.executable, '-m', 'uvicorn', 'app:asgi_app', '--host', '127.0.0.1', '--port', str(port),
+            '--log-level', 'warning', '--no-access-log']
+
+def start_server(mode, args, sheets_url):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        'SHEETS_API_BASE_URL': sheets_url,
+        'SHEETS_WARM_UP': 'false',
+        'CACHE_TTL': str(args.cache_ttl),
+        'ASGI_THREADS': str(args.threads),
+        'JWT_SECRET_KEY': JWT_SECRET,
+        'PYTHONPATH': SRC_DIR
+    })
+    process = subprocess.Popen(
+        server_command(mode, port, args.threads),
+        cwd=SRC_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f'{url}/api/health/live', timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'Servidor {mode} não respondeu')
+
+async def run_round(url, paths, concurrency, token):
+    """`concurrency` requisições simultâneas; devolve (latências, erros, duração)"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {'Authorization': f'Bearer {token}'}
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120, headers=headers) as client:
+        async def one(i):
+            start = time.perf_counter()
+            try:
+                response = await client.get(paths[i % len(paths)])
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            return time.perf_counter() - start, ok
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*[one(i) for i in range(concurrency)])
+        wall = time.perf_counter() - start
+
+    return [latency for latency, _ in results], sum(1 for _, ok in results if not ok), wall
+
+def run_mode(mode, args, server, sheets_url, paths, token):
+    process, url = start_server(mode, args, sheets_url)
+    try:
+        latencies, errors, wall = [], 0, 0.0
+        calls_before = server.stats()['calls']
+        for _ in range(args.rounds):
+            # Espera o cache expirar: a rodada começa sem as abas
+            time.sleep(args.cache_ttl + 0.2)
+            round_latencies, round_errors, round_wall = asyncio.run(
+                run_round(url, paths, args.concurrency, token)
+            )
+            latencies.extend(round_latencies)
+            errors += round_errors
+            wall += round_wall
+        calls_after = server.stats()['calls']
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    stats = summarize(latencies, errors, wall)
+    stats['sheets_calls'] = {
+        operation: count - calls_before.get(operation, 0)
+        for operation, count in calls_after.items()
+        if count != calls_before.get(operation, 0)
+    }
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Modo ASGI x modo síncrono')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--concurrency', type=int, default=200, help='Requisições simultâneas por rodada')
+    parser.add_argument('--threads', type=int, default=16, help='Threads do processo nos dois modos')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--cache-ttl', type=int, default=2, help='CACHE_TTL do servidor (segundos)')
+    parser.add_argument('--sheets-latency', type=float, default=0.15,
+                        help='Latência simulada por chamada ao Google Sheets (segundos)')
+    parser.add_argument('--output', help='Arquivo JSON com o resultado')
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+
+    # Os logs INFO por requisição do servidor falso poluiriam a saída
+    logging.disable(logging.INFO)
+
+    volumes = volumes_from_args(args)
+    sheets = build_sheets(
+        unidades=volumes['unidades'],
+        indicadores=volumes['indicadores'],
+        anos=volumes['anos'],
+        ano_final=volumes['ano_final'],
+        usuarios=volumes['unidades'] * volumes['usuarios_por_unidade']
+    )
+    server = FakeSheetsServer(sheets, latency=args.sheets_latency)
+    sheets_url, http_server = server.serve_in_thread()
+
+    ano = volumes['ano_final']
+    paths = [f'/api/indicadores/ranking?periodo={ano}-01', f'/api/lancamentos?mes=1&ano={ano}']
+    token = access_token(sheets['Usuarios'][1][0])
+
+    resultados = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {
+            'concurrency': args.concurrency,
+            'threads': args.threads,
+            'rounds': args.rounds,
+            'cache_ttl_s': args.cache_ttl,
+            'sheets_latency_s': args.sheets_latency,
+            'volumes': volumes
+        },
+        'modes': {}
+    }
+
+    try:
+        for mode in args.modes:
+            stats = run_mode(mode, args, server, sheets_url, paths, token)
+            resultados['modes'][mode] = stats
+            print(f"{mode:5s} {stats['throughput_rps']:8.1f} req/s  p50 {stats['p50_ms']:8.1f} ms  "
+                  f"p99 {stats['p99_ms']:8.1f} ms  erros {stats['errors']}  sheets {stats['sheets_calls']}")
+    finally:
+        http_server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f'Resultado salvo em {args.output}')
+
+if __name__ == '__main__':
+    main()
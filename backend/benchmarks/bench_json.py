@@ -0,0 +1,106 @@
+"""
+Benchmark da serialização JSON das respostas
+
+Serializa uma lista de lançamentos no formato de to_dict() (o payload do
+dashboard) com:
+
+- flask: DefaultJSONProvider, com float()/isoformat() feitos antes, como os
+  to_dict() faziam
+- stdlib: FastJSONProvider com o módulo json
+- orjson: FastJSONProvider com orjson (se instalado)
+
+Uso:
+    python benchmarks/bench_json.py [--rows 20000] [--repeats 20] [--output resultado.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import serialization
+from serialization import FastJSONProvider
+
+def build_rows(total):
+    criado_em = datetime(2025, 1, 5, 8, 30, 15, 123456)
+    return [
+        {
+            'id': i,
+            'indicador_id': i % 40 + 1,
+            'indicador_nome': f'Indicador {i % 40 + 1}',
+            'unidade_id': i % 50 + 1,
+            'unidade_nome': f'Unidade {i % 50 + 1}',
+            'usuario_id': i % 200 + 1,
+            'usuario_nome': f'Operador {i % 200 + 1}',
+            'ano': 2025,
+            'mes': i % 12 + 1,
+            'valor': Decimal(f'{(i * 37) % 10000}.{i % 10000:04d}'),
+            'observacoes': None,
+            'criado_em': criado_em,
+            'atualizado_em': criado_em
+        }
+        for i in range(total)
+    ]
+
+def legacy_rows(rows):
+    """Conversão manual que os to_dict() faziam antes do provider"""
+    return [
+        {**row, 'valor': float(row['valor']), 'criado_em': row['criado_em'].isoformat(),
+         'atualizado_em': row['atualizado_em'].isoformat()}
+        for row in rows
+    ]
+
+def time_response(app, payload, repeats):
+    with app.app_context():
+        app.json.response({'lancamentos': payload})
+        start = time.perf_counter()
+        for _ in range(repeats):
+            response = app.json.response({'lancamentos': payload})
+        elapsed = (time.perf_counter() - start) / repeats
+    return elapsed, len(response.get_data())
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de serialização JSON')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    resultados = {}
+
+    app = Flask(__name__)
+    app.json = DefaultJSONProvider(app)
+    start = time.perf_counter()
+    legacy = legacy_rows(rows)
+    conversion = time.perf_counter() - start
+    elapsed, size = time_response(app, legacy, args.repeats)
+    resultados['flask'] = {'ms': round((elapsed + conversion) * 1000, 1), 'bytes': size}
+
+    encoders = ['stdlib'] + (['orjson'] if serialization.orjson is not None else [])
+    for encoder in encoders:
+        app = Flask(__name__)
+        app.json = FastJSONProvider(app, encoder=encoder)
+        elapsed, size = time_response(app, rows, args.repeats)
+        resultados[encoder] = {'ms': round(elapsed * 1000, 1), 'bytes': size}
+
+    base = resultados['flask']['ms']
+    print(f"{'codificador':<12} {'ms':>8} {'bytes':>10} {'ganho':>7}")
+    for nome, r in resultados.items():
+        r['speedup'] = round(base / r['ms'], 2) if r['ms'] else 0.0
+        print(f"{nome:<12} {r['ms']:>8} {r['bytes']:>10} {r['speedup']:>6}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+
+if __name__ == '__main__':
+    main()
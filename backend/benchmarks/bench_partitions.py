@@ -0,0 +1,188 @@
+"""
+Benchmark do particionamento de lancamentos por ano (PostgreSQL)
+
+Carrega os mesmos lançamentos em duas tabelas com os índices de
+database/schema.sql:
+
+- heap: tabela única, como antes da migração
+- particionada: PARTITION BY RANGE (ano), uma partição por ano
+
+O histórico cresce para trás a partir de --ano-final e, a cada marco de
+--marcos (anos acumulados), são medidas as consultas do ano corrente:
+
+- mes: lançamentos de um mês (listagem do dashboard)
+- ano: soma por indicador e unidade no ano (acumulados, ranking)
+
+Com partições, o custo das consultas do ano corrente deve ficar estável à
+medida que os anos passados se acumulam; a coluna "partições" mostra
+quantas partições o plano lê (partition pruning).
+
+As tabelas bench_lancamentos_* são recriadas: use um banco DEDICADO.
+
+Uso:
+    python benchmarks/bench_partitions.py --database-url postgresql://.../bench --reset
+        [--marcos 1,5,10,20] [--repeats 20] [--output resultado.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from seed import DEFAULT_VOLUMES, lancamento_rows, _chunks
+
+COLUMNS = ['indicador_id', 'unidade_id', 'usuario_id', 'ano', 'mes', 'valor']
+
+TABLES = {
+    'heap': 'bench_lancamentos_heap',
+    'particionada': 'bench_lancamentos_part'
+}
+
+DEFINITION = """
+    id SERIAL,
+    indicador_id INTEGER NOT NULL,
+    unidade_id INTEGER NOT NULL,
+    usuario_id INTEGER NOT NULL,
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    valor DECIMAL(15,4) NOT NULL,
+    observacoes TEXT,
+    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+"""
+
+QUERIES = {
+    'mes': "SELECT id, indicador_id, unidade_id, valor FROM {table} WHERE ano = %(ano)s AND mes = %(mes)s",
+    'ano': ("SELECT indicador_id, unidade_id, SUM(valor) FROM {table} "
+            "WHERE ano = %(ano)s GROUP BY indicador_id, unidade_id")
+}
+
+def create_tables(cur):
+    heap, part = TABLES['heap'], TABLES['particionada']
+    cur.execute(f'DROP TABLE IF EXISTS {heap}, {part} CASCADE')
+
+    cur.execute(f"""
+        CREATE TABLE {heap} ({DEFINITION},
+            PRIMARY KEY (id),
+            UNIQUE (indicador_id, unidade_id, ano, mes))
+    """)
+    cur.execute(f"""
+        CREATE TABLE {part} ({DEFINITION},
+            PRIMARY KEY (id, ano),
+            UNIQUE (indicador_id, unidade_id, ano, mes)) PARTITION BY RANGE (ano)
+    """)
+    for name in (heap, part):
+        cur.execute(f'CREATE INDEX {name}_periodo ON {name} (ano, mes)')
+        cur.execute(f'CREATE INDEX {name}_indicador ON {name} (indicador_id)')
+        cur.execute(f'CREATE INDEX {name}_unidade ON {name} (unidade_id)')
+
+def load_year(cur, volumes, ano, batch_size):
+    """Insere um ano de lançamentos nas duas tabelas"""
+    from psycopg2.extras import execute_values
+
+    part = TABLES['particionada']
+    cur.execute(f'CREATE TABLE {part}_{ano} PARTITION OF {part} FOR VALUES FROM ({ano}) TO ({ano + 1})')
+
+    rows = lancamento_rows(dict(volumes, anos=1, ano_final=ano))
+    total = 0
+    for chunk in _chunks(rows, batch_size):
+        values = [tuple(row[c] for c in COLUMNS) for row in chunk]
+        for table in TABLES.values():
+            execute_values(cur, f"INSERT INTO {table} ({', '.join(COLUMNS)}) VALUES %s", values, page_size=batch_size)
+        total += len(chunk)
+    return total
+
+def scanned_relations(cur, sql, params):
+    """Tabelas/partições lidas pelo plano da consulta"""
+    cur.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    relations = set()
+    stack = [plan[0]['Plan']]
+    while stack:
+        node = stack.pop()
+        if 'Relation Name' in node:
+            relations.add(node['Relation Name'])
+        stack.extend(node.get('Plans', []))
+    return len(relations)
+
+def time_query(cur, sql, params, repeats):
+    cur.execute(sql, params)
+    cur.fetchall()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do particionamento de lancamentos')
+    parser.add_argument('--database-url', required=True, help='PostgreSQL de destino (banco dedicado)')
+    parser.add_argument('--reset', action='store_true', help='Confirma a recriação das tabelas do benchmark')
+    parser.add_argument('--marcos', default='1,5,10,20', help='Anos acumulados em que as consultas são medidas')
+    parser.add_argument('--unidades', type=int, default=DEFAULT_VOLUMES['unidades'])
+    parser.add_argument('--indicadores', type=int, default=DEFAULT_VOLUMES['indicadores'])
+    parser.add_argument('--ano-final', type=int, default=DEFAULT_VOLUMES['ano_final'])
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    args = parser.parse_args()
+
+    if not args.reset:
+        parser.error('o benchmark recria as tabelas bench_lancamentos_*; confirme com --reset (use um banco dedicado)')
+
+    marcos = sorted({int(m) for m in args.marcos.split(',') if m.strip()})
+    volumes = {
+        'unidades': args.unidades,
+        'indicadores': args.indicadores,
+        'usuarios_por_unidade': 1
+    }
+    params = {'ano': args.ano_final, 'mes': 6}
+
+    import psycopg2
+
+    conn = psycopg2.connect(args.database_url)
+    conn.autocommit = True
+    resultados = []
+    try:
+        with conn.cursor() as cur:
+            create_tables(cur)
+
+            anos = 0
+            total = 0
+            print(f"{'anos':>5} {'linhas':>10} {'consulta':<9} {'heap ms':>9} {'part. ms':>9} {'partições':>10}")
+            for marco in marcos:
+                while anos < marco:
+                    total += load_year(cur, volumes, args.ano_final - anos, args.batch_size)
+                    anos += 1
+                for table in TABLES.values():
+                    cur.execute(f'VACUUM ANALYZE {table}')
+
+                for nome, template in QUERIES.items():
+                    medida = {'anos': anos, 'linhas': total, 'consulta': nome}
+                    for layout, table in TABLES.items():
+                        sql = template.format(table=table)
+                        medida[f'{layout}_ms'] = round(time_query(cur, sql, params, args.repeats) * 1000, 2)
+                        medida[f'{layout}_relacoes'] = scanned_relations(cur, sql, params)
+                    resultados.append(medida)
+                    print(f"{anos:>5} {total:>10} {nome:<9} {medida['heap_ms']:>9} "
+                          f"{medida['particionada_ms']:>9} {medida['particionada_relacoes']:>10}")
+
+            cur.execute(f"DROP TABLE IF EXISTS {', '.join(TABLES.values())} CASCADE")
+    finally:
+        conn.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark de memória e GC: dicts de get_all_records x registros com __slots__
+
+Gera a aba Lancamentos com o volume padrão de seed.py e compara:
+
+- dicts: o que o gspread faz em get_all_records (um dict por linha)
+- slots: records.Lancamento.decode sobre get_all_values
+
+Para cada formato mede memória retida e pico (tracemalloc), tempo de
+decodificação, coletas do GC durante a decodificação e o tempo da filtragem
+de um período com agregação por indicador, como em get_lancamentos.
+
+Uso:
+    python benchmarks/bench_records.py [--anos 5] [--output resultado.json]
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_sheets import build_sheets
+from seed import add_volume_arguments, volumes_from_args
+from records import Lancamento, numericise
+
+def decode_dicts(rows):
+    header = rows[0]
+    return [dict(zip(header, (numericise(v) for v in row))) for row in rows[1:]]
+
+def decode_slots(rows):
+    return Lancamento.decode(rows)
+
+def aggregate_dicts(records, ano, mes):
+    agregados = {}
+    for record in records:
+        if str(record.get('Ano', '')) != str(ano) or str(record.get('Mes', '')) != str(mes):
+            continue
+        nome = record.get('Indicador_Nome', '')
+        soma = agregados.setdefault(nome, [0.0, 0.0])
+        soma[0] += float(record.get('Valor_Numerador', 0) or 0)
+        soma[1] += float(record.get('Valor_Denominador', 0) or 0)
+    return agregados
+
+def aggregate_slots(records, ano, mes):
+    agregados = {}
+    for record in records:
+        if record.ano != ano or record.mes != mes:
+            continue
+        soma = agregados.setdefault(record.indicador_nome, [0.0, 0.0])
+        soma[0] += float(record.valor_numerador or 0)
+        soma[1] += float(record.valor_denominador or 0)
+    return agregados
+
+def measure(decode, aggregate, rows, ano, mes, repeats):
+    # Tempo e coletas do GC sem o tracemalloc, que distorce os tempos
+    gc.collect()
+    collections_before = sum(s['collections'] for s in gc.get_stats())
+    start = time.perf_counter()
+    records = decode(rows)
+    decode_s = time.perf_counter() - start
+    collections = sum(s['collections'] for s in gc.get_stats()) - collections_before
+    del records
+
+    gc.collect()
+    tracemalloc.start()
+    records = decode(rows)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        aggregate(records, ano, mes)
+    aggregate_s = (time.perf_counter() - start) / repeats
+
+    return {
+        'rows': len(records),
+        'retained_mb': round(current / 1024 / 1024, 2),
+        'peak_mb': round(peak / 1024 / 1024, 2),
+        'bytes_per_row': round(current / len(records), 1) if records else 0,
+        'decode_ms': round(decode_s * 1000, 1),
+        'gc_collections': collections,
+        'aggregate_ms': round(aggregate_s * 1000, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Memória dos registros de lançamentos')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+
+    volumes = volumes_from_args(args)
+    rows = build_sheets(
+        unidades=volumes['unidades'],
+        indicadores=volumes['indicadores'],
+        anos=volumes['anos'],
+        ano_final=volumes['ano_final'],
+        usuarios=0
+    )['Lancamentos']
+
+    resultados = {
+        'dicts': measure(decode_dicts, aggregate_dicts, rows, volumes['ano_final'], 6, args.repeats),
+        'slots': measure(decode_slots, aggregate_slots, rows, volumes['ano_final'], 6, args.repeats)
+    }
+
+    print(f"{'formato':<8} {'linhas':>8} {'retido MB':>10} {'pico MB':>8} {'B/linha':>8} "
+          f"{'decod. ms':>10} {'GCs':>5} {'agreg. ms':>10}")
+    for nome, r in resultados.items():
+        print(f"{nome:<8} {r['rows']:>8} {r['retained_mb']:>10} {r['peak_mb']:>8} {r['bytes_per_row']:>8} "
+              f"{r['decode_ms']:>10} {r['gc_collections']:>5} {r['aggregate_ms']:>10}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+
+if __name__ == '__main__':
+    main()
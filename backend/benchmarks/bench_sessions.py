@@ -0,0 +1,103 @@
+"""
+Benchmark do custo de sessão por requisição em cada backend
+
+Para cada backend monta uma aplicação mínima que lê session['user_id'] a
+cada requisição (como require_auth e salvar_lancamentos em app.py) e mede o
+tempo médio por requisição descontando uma rota que não toca a sessão.
+
+Uso:
+    python benchmarks/bench_sessions.py [--requests 2000] [--output resultado.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from flask import Flask, session, jsonify
+
+from sessions import configure_sessions
+
+BACKENDS = ['cookie', 'memory', 'filesystem']
+
+def create_bench_app(backend, session_dir):
+    """Aplicação mínima com o backend de sessão escolhido"""
+    os.environ['SESSION_BACKEND'] = backend
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'bench-secret-key'
+    app.config['SESSION_PERMANENT'] = False
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
+    app.config['SESSION_FILE_DIR'] = session_dir
+    configure_sessions(app)
+
+    @app.route('/login', methods=['POST'])
+    def login():
+        session['user_id'] = 'enfermeira@hospital.com'
+        session['user_profile'] = {'nome': 'Enfermeira', 'perfil': 'operador'}
+        return jsonify({'success': True})
+
+    @app.route('/autenticado')
+    def autenticado():
+        return jsonify({'user': session.get('user_id')})
+
+    @app.route('/sem-sessao')
+    def sem_sessao():
+        return jsonify({'user': None})
+
+    return app
+
+def time_requests(client, path, total):
+    start = time.perf_counter()
+    for _ in range(total):
+        response = client.get(path)
+        assert response.status_code == 200
+    return (time.perf_counter() - start) / total
+
+def run(total):
+    resultados = {}
+
+    for backend in BACKENDS:
+        with tempfile.TemporaryDirectory() as session_dir:
+            app = create_bench_app(backend, session_dir)
+            client = app.test_client()
+            client.post('/login')
+
+            # Aquecimento
+            time_requests(client, '/autenticado', 50)
+
+            base = time_requests(client, '/sem-sessao', total)
+            com_sessao = time_requests(client, '/autenticado', total)
+
+            resultados[backend] = {
+                'request_us': round(com_sessao * 1e6, 1),
+                'baseline_us': round(base * 1e6, 1),
+                'session_overhead_us': round((com_sessao - base) * 1e6, 1),
+                'files_on_disk': len(os.listdir(session_dir))
+            }
+
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de backends de sessão')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    args = parser.parse_args()
+
+    resultados = run(args.requests)
+
+    print(f"{'backend':<12} {'req (us)':>10} {'overhead (us)':>14} {'arquivos':>9}")
+    for backend, r in resultados.items():
+        print(f"{backend:<12} {r['request_us']:>10} {r['session_overhead_us']:>14} {r['files_on_disk']:>9}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+
+if __name__ == '__main__':
+    main()
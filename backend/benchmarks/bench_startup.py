@@ -0,0 +1,92 @@
+"""
+Benchmark de inicialização do app.py (cold start)
+
+Em um processo novo a cada rodada mede:
+- import_ms: tempo para importar o módulo app
+- ready_ms: tempo desde o início do processo até /api/health responder 200
+  em um servidor HTTP real
+- heavy_modules: módulos pesados do Google carregados durante a importação
+
+Por padrão o aquecimento em segundo plano fica desligado, para que a lista
+de módulos reflita só a importação; --warm-up liga o aquecimento.
+
+Uso:
+    python benchmarks/bench_startup.py [--runs 5] [--warm-up] [--output resultado.json]
+"""
+
+import os
+import sys
+import json
+import statistics
+import subprocess
+import argparse
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+PROBE = r'''
+import sys, time, json, threading, urllib.request
+start = time.perf_counter()
+import app
+import_done = time.perf_counter()
+heavy = sorted(m for m in ('gspread', 'google.auth', 'google.oauth2', 'googleapiclient') if m in sys.modules)
+
+from werkzeug.serving import make_server
+server = make_server('127.0.0.1', 0, app.app, threaded=True)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = f'http://127.0.0.1:{server.server_port}/api/health'
+while True:
+    try:
+        if urllib.request.urlopen(url, timeout=1).status == 200:
+            break
+    except Exception:
+        time.sleep(0.001)
+ready = time.perf_counter()
+server.shutdown()
+print(json.dumps({
+    'import_ms': (import_done - start) * 1000,
+    'ready_ms': (ready - start) * 1000,
+    'heavy_modules': heavy
+}))
+'''
+
+def run_once(warm_up=False):
+    env = dict(os.environ)
+    env['SHEETS_WARM_UP'] = 'true' if warm_up else 'false'
+    env.setdefault('GOOGLE_CREDENTIALS_FILE', os.path.join(SRC_DIR, 'inexistente.json'))
+    env['PYTHONPATH'] = SRC_DIR
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de inicialização do app.py')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--warm-up', action='store_true', help='Liga o aquecimento do Sheets')
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    args = parser.parse_args()
+
+    rodadas = [run_once(args.warm_up) for _ in range(args.runs)]
+    resultado = {
+        'runs': args.runs,
+        'warm_up': args.warm_up,
+        'import_ms_median': round(statistics.median(r['import_ms'] for r in rodadas), 1),
+        'ready_ms_median': round(statistics.median(r['ready_ms'] for r in rodadas), 1),
+        'heavy_modules_at_import': rodadas[0]['heavy_modules']
+    }
+
+    print(f"importação: {resultado['import_ms_median']} ms (mediana de {args.runs})")
+    print(f"pronto (/api/health): {resultado['ready_ms_median']} ms")
+    print(f"módulos do Google na importação: {', '.join(resultado['heavy_modules_at_import']) or 'nenhum'}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Compara dois resultados de bench_api.py
+
+Mostra a variação de vazão e de p50/p95/p99 por alvo e cenário e marca como
+regressão o que piorou além do limite (padrão 10%). Sai com código 1 se
+houver regressão, para uso em CI.
+
+Uso:
+    python benchmarks/compare.py antes.json depois.json [--threshold 10]
+"""
+
+import sys
+import json
+import argparse
+
+METRICS = [
+    ('throughput_rps', 'req/s', True),
+    ('p50_ms', 'p50', False),
+    ('p95_ms', 'p95', False),
+    ('p99_ms', 'p99', False)
+]
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def change(before, after):
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+def compare(base, novo, threshold):
+    """Retorna as linhas da tabela e a lista de regressões"""
+    lines = []
+    regressions = []
+
+    for target, dados in novo['targets'].items():
+        base_scenarios = base['targets'].get(target, {}).get('scenarios', {})
+        for scenario, stats in dados['scenarios'].items():
+            anterior = base_scenarios.get(scenario)
+            if anterior is None:
+                lines.append(f'{target:<9} {scenario:<24} (novo cenário)')
+                continue
+
+            parts = []
+            for key, label, higher_is_better in METRICS:
+                delta = change(anterior[key], stats[key])
+                worse = -delta if higher_is_better else delta
+                flag = ' !' if worse > threshold else ''
+                if flag:
+                    regressions.append(f'{target}/{scenario} {label}: {anterior[key]} -> {stats[key]} ({delta:+.1f}%)')
+                parts.append(f'{label} {anterior[key]:>8} -> {stats[key]:>8} ({delta:+6.1f}%){flag}')
+            if stats.get('errors') and not anterior.get('errors'):
+                regressions.append(f"{target}/{scenario}: {stats['errors']} erro(s)")
+            lines.append(f'{target:<9} {scenario:<24} ' + '  '.join(parts))
+
+    return lines, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara resultados de benchmark')
+    parser.add_argument('base', help='Resultado de referência (JSON)')
+    parser.add_argument('novo', help='Resultado a comparar (JSON)')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Piora máxima aceita, em %%')
+    args = parser.parse_args()
+
+    base = load(args.base)
+    novo = load(args.novo)
+
+    print(f"Base: {base['commit']} ({base['timestamp']})  Novo: {novo['commit']} ({novo['timestamp']})")
+    if base.get('config') != novo.get('config'):
+        print('Aviso: as configurações dos dois resultados são diferentes')
+
+    lines, regressions = compare(base, novo, args.threshold)
+    for line in lines:
+        print(line)
+
+    if regressions:
+        print(f'\nRegressões acima de {args.threshold:.0f}%:')
+        for regression in regressions:
+            print(f'  {regression}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Planilha falsa em memória para benchmarks do app.py
+
+Substitui apenas o objeto gspread.Spreadsheet dentro do GoogleSheetsManager,
+de modo que cache, métricas e o restante do gerenciador continuam sendo o
+código real. Cada chamada à "API" espera `latency` segundos.
+"""
+
+import time
+import threading
+
+HEADERS = {
+    'Usuarios': ['Email', 'Nome', 'Password', 'Role', 'Unidade', 'COREN', 'Data_Cadastro', 'Status'],
+    'Unidades': ['ID', 'Nome', 'Foto_URL'],
+    'Indicadores_Dicionario': ['ID', 'Indicador', 'O que Mede', 'Numerador', 'Denominador', 'Fórmula', 'Meta'],
+    'Lancamentos': ['Timestamp', 'Email_Usuario', 'ID_Unidade', 'Indicador_Nome', 'Mes', 'Ano',
+                    'Valor_Numerador', 'Valor_Denominador']
+}
+
+METAS = ['Zero', '<5%', '>=95', '<=2', '>85', '']
+
+def _numericise(value):
+    """Converte como o gspread: inteiros e decimais viram números"""
+    if value == '':
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title, rows):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.rows = rows
+        self._lock = threading.Lock()
+
+    def get_all_values(self):
+        self.spreadsheet.api_call()
+        with self._lock:
+            return [list(row) for row in self.rows]
+
+    def get_all_records(self):
+        self.spreadsheet.api_call()
+        with self._lock:
+            header = self.rows[0]
+            return [dict(zip(header, (_numericise(v) for v in row))) for row in self.rows[1:]]
+
+    def append_row(self, values):
+        self.spreadsheet.api_call()
+        with self._lock:
+            self.rows.append([str(v) for v in values])
+
+    def append_rows(self, values):
+        self.spreadsheet.api_call()
+        with self._lock:
+            self.rows.extend([str(v) for v in row] for row in values)
+
+    def update_cell(self, row, col, value):
+        self.spreadsheet.api_call()
+        with self._lock:
+            line = self.rows[row - 1]
+            while len(line) < col:
+                line.append('')
+            line[col - 1] = str(value)
+
+    def delete_rows(self, start_index, end_index=None):
+        self.spreadsheet.api_call()
+        with self._lock:
+            del self.rows[start_index - 1:(end_index or start_index)]
+
+class FakeSpreadsheet:
+    """Planilha com as abas do sistema e latência configurável"""
+
+    def __init__(self, sheets, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.id = 'planilha-falsa'
+        self._worksheets = {
+            title: FakeWorksheet(self, title, rows) for title, rows in sheets.items()
+        }
+
+    def api_call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def worksheet(self, title):
+        self.api_call()
+        return self._worksheets[title]
+
+    def fetch_sheet_metadata(self, params=None):
+        self.api_call()
+        return {'spreadsheetId': self.id}
+
+def build_sheets(unidades=50, indicadores=40, anos=5, ano_final=2025, usuarios=200, password_hash=''):
+    """Monta as abas com volumes realistas (todas as células como texto)"""
+    sheets = {name: [list(header)] for name, header in HEADERS.items()}
+
+    sheets['Usuarios'].append([
+        'admin@hospital.com', 'Administrador', password_hash, 'admin', '1', '', '2024-01-01 00:00:00', 'Ativo'
+    ])
+    for i in range(usuarios):
+        sheets['Usuarios'].append([
+            f'usuario{i}@hospital.com', f'Usuário {i}', password_hash, 'operador',
+            str(i % unidades + 1), f'COREN-{i:05d}', '2024-01-01 00:00:00', 'Ativo'
+        ])
+
+    for u in range(1, unidades + 1):
+        sheets['Unidades'].append([str(u), f'Unidade {u}', ''])
+
+    for i in range(1, indicadores + 1):
+        sheets['Indicadores_Dicionario'].append([
+            str(i), f'Indicador {i}', f'Descrição detalhada do indicador {i}',
+            f'Numerador do indicador {i}', f'Denominador do indicador {i}',
+            '(Numerador / Denominador) x 100', METAS[i % len(METAS)]
+        ])
+
+    lancamentos = sheets['Lancamentos']
+    for ano in range(ano_final - anos + 1, ano_final + 1):
+        for mes in range(1, 13):
+            for u in range(1, unidades + 1):
+                for i in range(1, indicadores + 1):
+                    den = 50 + (u * 7 + i * 3 + mes) % 150
+                    num = (u + i + mes + ano) % (den // 4 + 1)
+                    lancamentos.append([
+                        f'{ano}-{mes:02d}-05T08:00:00', f'usuario{u}@hospital.com', str(u),
+                        f'Indicador {i}', str(mes), str(ano), str(num), str(den)
+                    ])
+
+    return sheets
+
+def install(sheets_manager, sheets, latency=0.0):
+    """Conecta o GoogleSheetsManager à planilha falsa"""
+    spreadsheet = FakeSpreadsheet(sheets, latency)
+    sheets_manager._client = object()
+    sheets_manager._spreadsheet = spreadsheet
+    return spreadsheet
@@ -0,0 +1,341 @@
+"""
+Servidor local que imita a API REST v4 do Google Sheets
+
+Implementa o subconjunto usado pelo gspread no app.py:
+
+- GET  /v4/spreadsheets/<id>                      (metadados)
+- GET  /v4/spreadsheets/<id>/values/<range>       (values.get)
+- GET  /v4/spreadsheets/<id>/values:batchGet      (values.batchGet)
+- POST /v4/spreadsheets/<id>/values/<range>:append (values.append)
+- PUT  /v4/spreadsheets/<id>/values/<range>       (values.update)
+
+Cada chamada espera `latency` segundos (mais `jitter` aleatório), as cotas de
+leitura e escrita por minuto são aplicadas como no Google (429
+RESOURCE_EXHAUSTED) e `error_rate` injeta 429 aleatórios. O sorteio usa uma
+semente fixa para que as execuções sejam reprodutíveis.
+
+Qualquer ID de planilha é aceito; todos apontam para os mesmos dados.
+
+Uso:
+    python benchmarks/fake_sheets_server.py --port 8765 --latency 0.15 --read-quota 300
+    SHEETS_API_BASE_URL=http://127.0.0.1:8765 python src/app.py
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import threading
+from collections import deque
+
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_sheets import build_sheets
+from seed import add_volume_arguments, volumes_from_args
+
+_CELL_PATTERN = re.compile(r'^([A-Za-z]*)(\d*)$')
+
+def _column_index(letters):
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + ord(char) - ord('A') + 1
+    return index
+
+def _column_letters(index):
+    letters = ''
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(ord('A') + rest) + letters
+    return letters
+
+def parse_range(range_name):
+    """Separa "'Aba'!A1:H10" em (aba, linha1, coluna1, linha2, coluna2)
+
+    Linhas e colunas são 1-based; None indica aberto até o fim.
+    """
+    if '!' in range_name:
+        title, cells = range_name.rsplit('!', 1)
+    else:
+        title, cells = range_name, ''
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+
+    if not cells:
+        return title, 1, 1, None, None
+
+    start, _, end = cells.partition(':')
+    start_col, start_row = _CELL_PATTERN.match(start).groups()
+    if end:
+        end_col, end_row = _CELL_PATTERN.match(end).groups()
+    else:
+        end_col, end_row = start_col, start_row
+
+    return (
+        title,
+        int(start_row) if start_row else 1,
+        _column_index(start_col) if start_col else 1,
+        int(end_row) if end_row else None,
+        _column_index(end_col) if end_col else None
+    )
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    return str(value)
+
+def _error(code, status, message):
+    return jsonify({'error': {'code': code, 'message': message, 'status': status}}), code
+
+class FakeSheetsServer:
+    """Dados das abas, cotas e estatísticas do servidor falso"""
+
+    def __init__(self, sheets, latency=0.0, jitter=0.0, read_quota=0, write_quota=0,
+                 error_rate=0.0, seed=42):
+        self.sheets = sheets
+        self.latency = latency
+        self.jitter = jitter
+        self.read_quota = read_quota
+        self.write_quota = write_quota
+        self.error_rate = error_rate
+        self.calls = {}
+        self.throttled = 0
+        self.injected = 0
+        self._random = random.Random(seed)
+        self._windows = {'read': deque(), 'write': deque()}
+        self._lock = threading.Lock()
+        self.app = self._create_app()
+
+    def _admit(self, kind, operation):
+        """Aplica latência, injeção de erro e cota; retorna uma resposta de erro ou None"""
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            inject = self.error_rate and self._random.random() < self.error_rate
+
+            quota = self.read_quota if kind == 'read' else self.write_quota
+            window = self._windows[kind]
+            now = time.monotonic()
+            while window and now - window[0] >= 60:
+                window.popleft()
+            exceeded = quota and len(window) >= quota
+            if not exceeded and not inject:
+                window.append(now)
+
+        if delay:
+            time.sleep(delay)
+
+        if exceeded:
+            with self._lock:
+                self.throttled += 1
+            return _error(429, 'RESOURCE_EXHAUSTED',
+                          f"Quota exceeded for quota metric '{kind.capitalize()} requests' "
+                          f"and limit '{kind.capitalize()} requests per minute per user'")
+        if inject:
+            with self._lock:
+                self.injected += 1
+            return _error(429, 'RESOURCE_EXHAUSTED', 'Erro 429 injetado pelo servidor falso')
+        return None
+
+    def _value_range(self, range_name):
+        title, row1, col1, row2, col2 = parse_range(range_name)
+        rows = self.sheets.get(title)
+        if rows is None:
+            return None
+
+        with self._lock:
+            selected = rows[row1 - 1:row2] if row2 else rows[row1 - 1:]
+            values = [
+                [_cell_text(v) for v in (row[col1 - 1:col2] if col2 else row[col1 - 1:])]
+                for row in selected
+            ]
+
+        # A API omite linhas vazias no final
+        while values and not any(values[-1]):
+            values.pop()
+        return {'range': range_name, 'majorDimension': 'ROWS', 'values': values}
+
+    def metadata(self, spreadsheet_id):
+        sheets = []
+        for index, (title, rows) in enumerate(self.sheets.items()):
+            sheets.append({'properties': {
+                'sheetId': index,
+                'title': title,
+                'index': index,
+                'sheetType': 'GRID',
+                'gridProperties': {
+                    'rowCount': max(len(rows), 1000),
+                    'columnCount': max((len(r) for r in rows), default=26)
+                }
+            }})
+        return {
+            'spreadsheetId': spreadsheet_id,
+            'properties': {'title': 'Planilha falsa', 'locale': 'pt_BR', 'timeZone': 'America/Sao_Paulo'},
+            'sheets': sheets,
+            'spreadsheetUrl': f'https://docs.google.com/spreadsheets/d/{spreadsheet_id}'
+        }
+
+    def append(self, range_name, values):
+        title = parse_range(range_name)[0]
+        rows = self.sheets.get(title)
+        if rows is None:
+            return None
+
+        with self._lock:
+            start = len(rows) + 1
+            rows.extend([_cell_text(v) for v in row] for row in values)
+
+        width = max((len(row) for row in values), default=0)
+        updated = f"'{title}'!A{start}:{_column_letters(max(width, 1))}{start + len(values) - 1}"
+        return {
+            'tableRange': f"'{title}'!A1:{_column_letters(max(width, 1))}{start - 1}",
+            'updates': {
+                'updatedRange': updated,
+                'updatedRows': len(values),
+                'updatedColumns': width,
+                'updatedCells': sum(len(row) for row in values)
+            }
+        }
+
+    def update(self, range_name, values):
+        title, row1, col1, _, _ = parse_range(range_name)
+        rows = self.sheets.get(title)
+        if rows is None:
+            return None
+
+        with self._lock:
+            for r, row_values in enumerate(values):
+                index = row1 - 1 + r
+                while len(rows) <= index:
+                    rows.append([])
+                line = rows[index]
+                for c, value in enumerate(row_values):
+                    col = col1 - 1 + c
+                    while len(line) <= col:
+                        line.append('')
+                    line[col] = _cell_text(value)
+
+        return {
+            'updatedRange': range_name,
+            'updatedRows': len(values),
+            'updatedColumns': max((len(row) for row in values), default=0),
+            'updatedCells': sum(len(row) for row in values)
+        }
+
+    def stats(self):
+        with self._lock:
+            return {'calls': dict(self.calls), 'throttled': self.throttled, 'injected': self.injected}
+
+    def _create_app(self):
+        app = Flask(__name__)
+        server = self
+
+        @app.route('/v4/spreadsheets/<spreadsheet_id>', methods=['GET'])
+        def get_metadata(spreadsheet_id):
+            error = server._admit('read', 'metadata')
+            if error:
+                return error
+            body = server.metadata(spreadsheet_id)
+            if request.args.get('fields') == 'spreadsheetId':
+                body = {'spreadsheetId': spreadsheet_id}
+            return jsonify(body)
+
+        @app.route('/v4/spreadsheets/<spreadsheet_id>/values:batchGet', methods=['GET'])
+        def batch_get(spreadsheet_id):
+            error = server._admit('read', 'values.batchGet')
+            if error:
+                return error
+            value_ranges = []
+            for range_name in request.args.getlist('ranges'):
+                value_range = server._value_range(range_name)
+                if value_range is None:
+                    return _error(400, 'INVALID_ARGUMENT', f'Unable to parse range: {range_name}')
+                value_ranges.append(value_range)
+            return jsonify({'spreadsheetId': spreadsheet_id, 'valueRanges': value_ranges})
+
+        @app.route('/v4/spreadsheets/<spreadsheet_id>/values/<path:range_name>', methods=['GET', 'POST', 'PUT'])
+        def values(spreadsheet_id, range_name):
+            if request.method == 'POST':
+                if not range_name.endswith(':append'):
+                    return _error(404, 'NOT_FOUND', 'Método não suportado')
+                error = server._admit('write', 'values.append')
+                if error:
+                    return error
+                result = server.append(range_name[:-len(':append')], (request.get_json() or {}).get('values', []))
+                if result is None:
+                    return _error(400, 'INVALID_ARGUMENT', f'Unable to parse range: {range_name}')
+                return jsonify({'spreadsheetId': spreadsheet_id, **result})
+
+            if request.method == 'PUT':
+                error = server._admit('write', 'values.update')
+                if error:
+                    return error
+                result = server.update(range_name, (request.get_json() or {}).get('values', []))
+                if result is None:
+                    return _error(400, 'INVALID_ARGUMENT', f'Unable to parse range: {range_name}')
+                return jsonify({'spreadsheetId': spreadsheet_id, **result})
+
+            error = server._admit('read', 'values.get')
+            if error:
+                return error
+            value_range = server._value_range(range_name)
+            if value_range is None:
+                return _error(400, 'INVALID_ARGUMENT', f'Unable to parse range: {range_name}')
+            return jsonify(value_range)
+
+        @app.route('/_stats', methods=['GET'])
+        def get_stats():
+            return jsonify(server.stats())
+
+        return app
+
+    def serve_in_thread(self, host='127.0.0.1', port=0):
+        """Inicia o servidor em uma thread; retorna (url_base, servidor_http)"""
+        http_server = make_server(host, port, self.app, threaded=True)
+        threading.Thread(target=http_server.serve_forever, name='fake-sheets', daemon=True).start()
+        return f'http://{host}:{http_server.server_port}', http_server
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor falso da API do Google Sheets')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Segundos por chamada')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Variação aleatória máxima (segundos)')
+    parser.add_argument('--read-quota', type=int, default=0, help='Leituras por minuto (0 = sem limite)')
+    parser.add_argument('--write-quota', type=int, default=0, help='Escritas por minuto (0 = sem limite)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de chamadas com 429 injetado')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--password-hash', default='', help='Hash bcrypt gravado para todos os usuários')
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+
+    volumes = volumes_from_args(args)
+    sheets = build_sheets(
+        unidades=volumes['unidades'],
+        indicadores=volumes['indicadores'],
+        anos=volumes['anos'],
+        ano_final=volumes['ano_final'],
+        usuarios=volumes['unidades'] * volumes['usuarios_por_unidade'],
+        password_hash=args.password_hash
+    )
+    server = FakeSheetsServer(
+        sheets,
+        latency=args.latency,
+        jitter=args.jitter,
+        read_quota=args.read_quota,
+        write_quota=args.write_quota,
+        error_rate=args.error_rate,
+        seed=args.seed
+    )
+
+    print(f'SHEETS_API_BASE_URL=http://{args.host}:{args.port}')
+    make_server(args.host, args.port, server.app, threaded=True).serve_forever()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""
+Carga de dados com volumes realistas para os benchmarks
+
+Volume padrão: 50 unidades × 40 indicadores × 5 anos × 12 meses
+(120.000 lançamentos), 4 usuários por unidade e um administrador.
+
+- SQLite: tabelas dos modelos de app_sqlite.py (SQLITE_DATABASE_URI)
+- PostgreSQL: database/schema.sql, executado sobre um banco DEDICADO ao
+  benchmark; as tabelas existentes são removidas antes da carga. As senhas
+  usam o hash do werkzeug, como em models.py (app_postgresql_OLD.py)
+
+Uso:
+    python benchmarks/seed.py --sqlite /tmp/bench.db
+    python benchmarks/seed.py --database-url postgresql://.../bench --reset
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+from sqlalchemy import insert
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCHEMA_PATH = os.path.join(BACKEND_DIR, 'database', 'schema.sql')
+
+DEFAULT_VOLUMES = {
+    'unidades': 50,
+    'indicadores': 40,
+    'anos': 5,
+    'ano_final': 2025,
+    'usuarios_por_unidade': 4
+}
+
+BENCH_PASSWORD = 'senha123'
+TIPOS = ['qualidade', 'seguranca', 'produtividade', 'eficiencia']
+
+def unidade_rows(volumes):
+    return [
+        {'id': u, 'nome': f'Unidade {u}', 'codigo': f'UN{u:03d}', 'ativo': True}
+        for u in range(1, volumes['unidades'] + 1)
+    ]
+
+def indicador_rows(volumes):
+    return [
+        {
+            'id': i,
+            'nome': f'Indicador {i}',
+            'descricao': f'Descrição detalhada do indicador {i}',
+            'tipo': TIPOS[i % len(TIPOS)],
+            'unidade_medida': 'percentual',
+            'meta_mensal': 5 + (i * 7) % 90,
+            'ativo': True
+        }
+        for i in range(1, volumes['indicadores'] + 1)
+    ]
+
+def usuario_rows(volumes, password_hash):
+    rows = [{
+        'id': 1, 'nome': 'Administrador', 'email': 'admin@hospital.com',
+        'senha_hash': password_hash, 'role': 'admin', 'unidade_id': 1, 'ativo': True
+    }]
+    for u in range(1, volumes['unidades'] + 1):
+        for n in range(volumes['usuarios_por_unidade']):
+            rows.append({
+                'id': len(rows) + 1,
+                'nome': f'Operador {u}.{n}',
+                'email': f'operador{u}.{n}@hospital.com',
+                'senha_hash': password_hash,
+                'role': 'operador',
+                'unidade_id': u,
+                'ativo': True
+            })
+    return rows
+
+def lancamento_rows(volumes):
+    """Gera os lançamentos de forma determinística"""
+    por_unidade = volumes['usuarios_por_unidade']
+    primeiro_ano = volumes['ano_final'] - volumes['anos'] + 1
+    criado_em = datetime(volumes['ano_final'], 1, 1)
+
+    for ano in range(primeiro_ano, volumes['ano_final'] + 1):
+        for mes in range(1, 13):
+            for u in range(1, volumes['unidades'] + 1):
+                usuario_id = 2 + (u - 1) * por_unidade if por_unidade else 1
+                for i in range(1, volumes['indicadores'] + 1):
+                    yield {
+                        'indicador_id': i,
+                        'unidade_id': u,
+                        'usuario_id': usuario_id,
+                        'ano': ano,
+                        'mes': mes,
+                        'valor': round(((u * 31 + i * 17 + mes * 7 + ano) % 1000) / 10, 4),
+                        'observacoes': None,
+                        'criado_em': criado_em
+                    }
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def seed_sqlalchemy(db, models, volumes, password_hash, batch_size=5000):
+    """Recria as tabelas dos modelos e insere os dados em lote
+
+    models: dict com as classes 'Unidade', 'Usuario', 'Indicador' e 'Lancamento'
+    """
+    db.drop_all()
+    db.create_all()
+
+    db.session.execute(insert(models['Unidade']), unidade_rows(volumes))
+    db.session.execute(insert(models['Indicador']), indicador_rows(volumes))
+    db.session.execute(insert(models['Usuario']), usuario_rows(volumes, password_hash))
+
+    total = 0
+    for chunk in _chunks(lancamento_rows(volumes), batch_size):
+        db.session.execute(insert(models['Lancamento']), chunk)
+        total += len(chunk)
+    db.session.commit()
+    return total
+
+def seed_postgres(database_url, volumes, password_hash, reset=False, batch_size=5000):
+    """Aplica database/schema.sql e insere os dados com execute_values"""
+    import psycopg2
+    from psycopg2.extras import execute_values
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('public.lancamentos')")
+            if cur.fetchone()[0] is not None:
+                if not reset:
+                    raise SystemExit('O banco já tem as tabelas do sistema; use --reset num banco dedicado')
+                cur.execute('DROP TABLE IF EXISTS lancamentos, usuarios, indicadores, unidades CASCADE')
+
+            with open(SCHEMA_PATH, encoding='utf-8') as f:
+                cur.execute(f.read())
+            # Os dados de exemplo do schema são substituídos pelos do benchmark
+            cur.execute('TRUNCATE lancamentos, usuarios, indicadores, unidades RESTART IDENTITY CASCADE')
+            # lancamentos é particionada por ano: uma partição por ano da carga
+            primeiro_ano = volumes['ano_final'] - volumes['anos'] + 1
+            cur.execute('SELECT criar_particao_lancamentos(ano) FROM generate_series(%s, %s) AS ano',
+                        (primeiro_ano, volumes['ano_final']))
+
+            def insert_rows(table, rows):
+                columns = list(rows[0])
+                execute_values(
+                    cur,
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s",
+                    [tuple(row[c] for c in columns) for row in rows],
+                    page_size=batch_size
+                )
+                cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                            f"(SELECT COALESCE(MAX(id), 1) FROM {table}))")
+
+            insert_rows('unidades', unidade_rows(volumes))
+            insert_rows('indicadores', indicador_rows(volumes))
+            insert_rows('usuarios', usuario_rows(volumes, password_hash))
+
+            total = 0
+            columns = ['indicador_id', 'unidade_id', 'usuario_id', 'ano', 'mes', 'valor', 'criado_em']
+            for chunk in _chunks(lancamento_rows(volumes), batch_size):
+                execute_values(
+                    cur,
+                    f"INSERT INTO lancamentos ({', '.join(columns)}) VALUES %s",
+                    [tuple(row[c] for c in columns) for row in chunk],
+                    page_size=batch_size
+                )
+                total += len(chunk)
+
+            cur.execute('ANALYZE')
+        conn.commit()
+        return total
+    finally:
+        conn.close()
+
+def add_volume_arguments(parser):
+    parser.add_argument('--unidades', type=int, default=DEFAULT_VOLUMES['unidades'])
+    parser.add_argument('--indicadores', type=int, default=DEFAULT_VOLUMES['indicadores'])
+    parser.add_argument('--anos', type=int, default=DEFAULT_VOLUMES['anos'])
+    parser.add_argument('--ano-final', type=int, default=DEFAULT_VOLUMES['ano_final'])
+    parser.add_argument('--usuarios-por-unidade', type=int, default=DEFAULT_VOLUMES['usuarios_por_unidade'])
+
+def volumes_from_args(args):
+    return {
+        'unidades': args.unidades,
+        'indicadores': args.indicadores,
+        'anos': args.anos,
+        'ano_final': args.ano_final,
+        'usuarios_por_unidade': args.usuarios_por_unidade
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Carga de dados para benchmarks')
+    parser.add_argument('--sqlite', help='Arquivo SQLite de destino')
+    parser.add_argument('--database-url', help='PostgreSQL de destino (banco dedicado)')
+    parser.add_argument('--reset', action='store_true', help='Remove as tabelas existentes no PostgreSQL')
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.sqlite and not args.database_url:
+        parser.error('informe --sqlite ou --database-url')
+
+    volumes = volumes_from_args(args)
+    sys.path.insert(0, os.path.join(BACKEND_DIR, 'src'))
+    start = time.perf_counter()
+
+    if args.sqlite:
+        os.environ['SQLITE_DATABASE_URI'] = f'sqlite:///{os.path.abspath(args.sqlite)}'
+        import app_sqlite
+        with app_sqlite.app.app_context():
+            password_hash = app_sqlite.password_hasher.hash(BENCH_PASSWORD)
+            total = seed_sqlalchemy(app_sqlite.db, vars(app_sqlite), volumes, password_hash)
+    else:
+        from werkzeug.security import generate_password_hash
+        total = seed_postgres(args.database_url, volumes, generate_password_hash(BENCH_PASSWORD), args.reset)
+
+    print(f'{total} lançamentos inseridos em {time.perf_counter() - start:.1f}s')
+
+if __name__ == '__main__':
+    main()
@@ -22,7 +22,7 @@ class Config:
     FLASK_ENV = os.environ.get('FLASK_ENV', 'production')
     FLASK_DEBUG = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
     
-    # Sessão
+    # Sessão (o backend vem de SESSION_BACKEND, lido só em src/sessions.py)
     SESSION_TYPE = 'redis' if os.environ.get('REDIS_URL') else 'filesystem'
     SESSION_REDIS = os.environ.get('REDIS_URL')
     SESSION_PERMANENT = False
@@ -0,0 +1,94 @@
+"""
+Script para particionar a tabela lancamentos por ano (PostgreSQL)
+
+Sem argumentos, migra uma tabela lancamentos ainda não particionada
+(particionar_lancamentos.sql) e garante as partições do ano corrente e do
+seguinte. Pode ser agendado (ex.: cron em dezembro) para criar a partição
+do próximo ano com antecedência; a aplicação também cria a partição de um
+ano novo antes do primeiro lançamento nele (src/partitions.py).
+
+Uso:
+    python database/particionar_lancamentos.py
+    python database/particionar_lancamentos.py --ano 2031
+"""
+import os
+import sys
+import argparse
+from datetime import datetime
+
+import psycopg2
+
+MIGRATION_PATH = os.path.join(os.path.dirname(__file__), 'particionar_lancamentos.sql')
+
+def connect():
+    """Conecta com as mesmas variáveis de init_db.py"""
+    return psycopg2.connect(
+        host=os.environ.get('DB_HOST', 'localhost'),
+        port=os.environ.get('DB_PORT', '5432'),
+        user=os.environ.get('DB_USER', 'postgres'),
+        password=os.environ.get('DB_PASSWORD', 'postgres'),
+        database=os.environ.get('DB_NAME', 'gestao_indicadores')
+    )
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('lancamentos'))"
+    )
+    return cursor.fetchone()[0]
+
+def migrate(cursor):
+    """Converte a tabela única em particionada, copiando os dados"""
+    cursor.execute("SELECT COUNT(*) FROM lancamentos")
+    total = cursor.fetchone()[0]
+    print(f"Particionando lancamentos ({total} linhas)...")
+
+    with open(MIGRATION_PATH, 'r', encoding='utf-8') as f:
+        cursor.execute(f.read())
+
+    cursor.execute("SELECT COUNT(*) FROM lancamentos")
+    copiadas = cursor.fetchone()[0]
+    if copiadas != total:
+        raise RuntimeError(f"Cópia incompleta: {copiadas} de {total} linhas")
+
+def create_partitions(cursor, anos):
+    for ano in anos:
+        cursor.execute("SELECT criar_particao_lancamentos(%s)", (ano,))
+        print(f"Partição {cursor.fetchone()[0]} disponível")
+
+def list_partitions(cursor):
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::BIGINT
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'lancamentos'::regclass
+        ORDER BY c.relname
+    """)
+    return cursor.fetchall()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Particionar lancamentos por ano')
+    parser.add_argument('--ano', type=int, action='append', help='Cria a partição deste ano (pode repetir)')
+    args = parser.parse_args()
+
+    ano_atual = datetime.now().year
+    anos = args.ano or [ano_atual, ano_atual + 1]
+
+    try:
+        conn = connect()
+        cursor = conn.cursor()
+
+        if not is_partitioned(cursor):
+            migrate(cursor)
+        create_partitions(cursor, anos)
+        conn.commit()
+
+        for nome, limites, linhas in list_partitions(cursor):
+            print(f"  {nome}: {limites} (~{max(linhas, 0)} linhas)")
+
+        cursor.close()
+        conn.close()
+        print("Particionamento concluído com sucesso!")
+
+    except Exception as e:
+        print(f"Erro ao particionar lancamentos: {str(e)}")
+        sys.exit(1)
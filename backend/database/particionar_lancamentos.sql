@@ -0,0 +1,109 @@
+-- Migração: lancamentos (tabela única) -> lancamentos particionada por ano
+--
+-- Executada por particionar_lancamentos.py numa única transação, com a
+-- tabela bloqueada durante a cópia. Os IDs são preservados e a sequência
+-- continua de onde estava. Ao final a tabela antiga é removida.
+
+LOCK TABLE lancamentos IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE lancamentos RENAME TO lancamentos_heap;
+DROP TRIGGER IF EXISTS update_lancamentos_updated_at ON lancamentos_heap;
+
+-- Libera os nomes de índices e restrições para a nova tabela
+DO $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT c.relname AS nome
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = 'lancamentos_heap'::regclass
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', r.nome, left(r.nome, 57) || '_heap');
+    END LOOP;
+END $$;
+
+CREATE TABLE lancamentos (
+    id INTEGER NOT NULL,
+    indicador_id INTEGER NOT NULL REFERENCES indicadores(id),
+    unidade_id INTEGER NOT NULL REFERENCES unidades(id),
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL CHECK (mes BETWEEN 1 AND 12),
+    valor DECIMAL(15,4) NOT NULL,
+    observacoes TEXT,
+    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, ano),
+    CONSTRAINT unique_lancamento_periodo UNIQUE (indicador_id, unidade_id, ano, mes)
+) PARTITION BY RANGE (ano);
+
+-- A sequência da tabela antiga passa para a nova
+DO $$
+DECLARE
+    sequencia TEXT := pg_get_serial_sequence('lancamentos_heap', 'id');
+BEGIN
+    IF sequencia IS NULL THEN
+        CREATE SEQUENCE lancamentos_id_seq;
+        sequencia := 'lancamentos_id_seq';
+        PERFORM setval(sequencia, COALESCE((SELECT MAX(id) FROM lancamentos_heap), 0) + 1, false);
+    END IF;
+    EXECUTE format('ALTER TABLE lancamentos ALTER COLUMN id SET DEFAULT nextval(%L::regclass)', sequencia);
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY lancamentos.id', sequencia);
+END $$;
+
+CREATE OR REPLACE FUNCTION criar_particao_lancamentos(p_ano INTEGER)
+RETURNS TEXT AS $$
+DECLARE
+    nome TEXT := format('lancamentos_%s', p_ano);
+BEGIN
+    IF to_regclass(nome) IS NULL THEN
+        BEGIN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF lancamentos FOR VALUES FROM (%s) TO (%s)',
+                nome, p_ano, p_ano + 1
+            );
+        EXCEPTION WHEN duplicate_table THEN
+            NULL;
+        END;
+    END IF;
+    RETURN nome;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Uma partição por ano com dados, mais o ano corrente e o seguinte
+SELECT criar_particao_lancamentos(ano)
+FROM (
+    SELECT DISTINCT ano FROM lancamentos_heap
+    UNION
+    SELECT EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER
+    UNION
+    SELECT EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER + 1
+) anos
+ORDER BY ano;
+
+INSERT INTO lancamentos (id, indicador_id, unidade_id, usuario_id, ano, mes, valor, observacoes, criado_em, atualizado_em)
+SELECT id, indicador_id, unidade_id, usuario_id, ano, mes, valor, observacoes, criado_em, atualizado_em
+FROM lancamentos_heap;
+
+-- Índices criados na tabela particionada valem para todas as partições,
+-- inclusive as criadas depois
+CREATE INDEX idx_lancamentos_indicador ON lancamentos(indicador_id);
+CREATE INDEX idx_lancamentos_unidade ON lancamentos(unidade_id);
+CREATE INDEX idx_lancamentos_periodo ON lancamentos(ano, mes);
+CREATE INDEX idx_lancamentos_usuario ON lancamentos(usuario_id);
+
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.atualizado_em = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER update_lancamentos_updated_at BEFORE UPDATE ON lancamentos FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+DROP TABLE lancamentos_heap;
+
+ANALYZE lancamentos;
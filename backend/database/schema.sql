@@ -39,8 +39,13 @@ CREATE TABLE indicadores (
 );
 
 -- Tabela de Lançamentos de Indicadores
+-- Particionada por ano (uma partição por ano, lancamentos_AAAA): as consultas
+-- do dashboard filtram por ano e só leem a partição do ano pedido, por mais
+-- anos de histórico que se acumulem. Numa tabela particionada a chave
+-- primária e a restrição única precisam incluir a coluna de partição; cada
+-- partição recebe a sua cópia de ambas.
 CREATE TABLE lancamentos (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     indicador_id INTEGER NOT NULL REFERENCES indicadores(id),
     unidade_id INTEGER NOT NULL REFERENCES unidades(id),
     usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
@@ -50,8 +55,36 @@ CREATE TABLE lancamentos (
     observacoes TEXT,
     criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE(indicador_id, unidade_id, ano, mes)
-);
+    PRIMARY KEY (id, ano),
+    CONSTRAINT unique_lancamento_periodo UNIQUE (indicador_id, unidade_id, ano, mes)
+) PARTITION BY RANGE (ano);
+
+-- Cria a partição de um ano, se ainda não existir. Chamada pela aplicação
+-- antes de gravar num ano novo (partitions.py) e por
+-- database/particionar_lancamentos.py
+CREATE OR REPLACE FUNCTION criar_particao_lancamentos(p_ano INTEGER)
+RETURNS TEXT AS $$
+DECLARE
+    nome TEXT := format('lancamentos_%s', p_ano);
+BEGIN
+    IF to_regclass(nome) IS NULL THEN
+        BEGIN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF lancamentos FOR VALUES FROM (%s) TO (%s)',
+                nome, p_ano, p_ano + 1
+            );
+        EXCEPTION WHEN duplicate_table THEN
+            -- Criada em paralelo por outra conexão
+            NULL;
+        END;
+    END IF;
+    RETURN nome;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partições do ano corrente e do seguinte
+SELECT criar_particao_lancamentos(EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER);
+SELECT criar_particao_lancamentos(EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER + 1);
 
 -- Índices para melhor performance
 CREATE INDEX idx_usuarios_email ON usuarios(email);
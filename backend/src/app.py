@@ -5,20 +5,36 @@ Desenvolvido em Flask para integração com Google Sheets e deployment no Netlif
 
 from flask import Flask, request, jsonify, session
 from flask_cors import CORS
-from flask_session import Session
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-import bcrypt
+from flask_jwt_extended import JWTManager, create_access_token, decode_token, jwt_required, get_jwt_identity, verify_jwt_in_request
 import os
-import json
 import logging
 from datetime import datetime, timedelta
 from functools import wraps
-import gspread
-from google.oauth2.service_account import Credentials
-from google.oauth2 import id_token
-from google.auth.transport import requests
 import traceback
 
+from cache import create_cache
+from catalog import IndicatorCatalog
+from archive import ArchiveStore
+from changes import ChangeFeedError, ChangeFeedUnavailable, changes_request, create_changelog, visibility
+from stream import (create_stream_hub, entry_periodo, stream_response, stream_token_claims, is_stream_token,
+                    StreamError, StreamUnauthorized, StreamUnavailable)
+from snapshot import SnapshotStore
+from sheets import GoogleSheetsManager
+from columnar import ColumnarLancamentos, to_periodo, to_number, format_periodo
+from records import Lancamento, LancamentoAgregado, numericise
+from sessions import configure_sessions
+from passwords import create_password_hasher, PasswordHasherBusy
+from health import DependencyProbe, liveness, readiness
+from metrics import init_metrics, track_sheets
+from profiling import init_profiling
+from compression import init_compression
+from serialization import FastJSONProvider
+from http_cache import conditional
+from series import serie_request, resultado as serie_resultado
+from rolling import RollingStore, changed_windows, periodo_param
+from ranking import rank_units, for_unit
+from pagination import EXPOSED_HEADERS, PaginationError, page_request, paginate_sequence, set_page_headers
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -28,130 +44,189 @@ logger = logging.getLogger(__name__)
 
 # Configuração da aplicação Flask
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
-app.config['SESSION_TYPE'] = 'filesystem'
 app.config['SESSION_PERMANENT'] = False
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
 
 # Configuração JWT
 jwt = JWTManager(app)
 
+@jwt.token_verification_loader
+def _token_da_api(jwt_header, jwt_data):
+    """O token curto do stream SSE não vale nas rotas da API"""
+    return not is_stream_token(jwt_data)
+
 # Configuração CORS
 CORS(app, supports_credentials=True, origins=[
     'http://localhost:3000',
     'http://localhost:8080', 
     'https://*.netlify.app',
     'https://*.netlify.com'
-])
-
-# Configuração de sessão
-Session(app)
+], expose_headers=EXPOSED_HEADERS)
 
-# Configurações do Google Sheets
-GOOGLE_SHEETS_CONFIG = {
-    'SPREADSHEET_ID': os.environ.get('GOOGLE_SPREADSHEET_ID', '1RXm-9-K_1H8GZjvNjnhpBvNnDQCejDMkBUPEKF26Too'),
-    'SCOPES': [
-        'https://www.googleapis.com/auth/spreadsheets',
-        'https://www.googleapis.com/auth/drive.file'
-    ]
-}
+# Configuração de sessão (SESSION_BACKEND: cookie, memory, redis ou filesystem)
+configure_sessions(app)
 
 # Configuração OAuth Google
 GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
 
-class GoogleSheetsManager:
-    """Gerenciador de conexão com Google Sheets"""
-    
-    def __init__(self):
-        self.client = None
-        self.spreadsheet = None
-        self._initialize_client()
+# Cache compartilhado (L1 em memória + Redis quando REDIS_URL estiver definido)
+cache = create_cache()
+
+# Log de alterações para /api/changes (no Redis do cache, quando houver)
+changelog = create_changelog(cache)
+
+# Hashing de senhas em pool de processos (BCRYPT_ROUNDS, PASSWORD_WORKERS)
+password_hasher = create_password_hasher()
+
+# Métricas de latência e endpoint /metrics
+init_metrics(app, cache=cache)
+
+# Instância global do gerenciador
+sheets_manager = GoogleSheetsManager(cache)
+
+def get_indicator_catalog():
+    """Dicionário de indicadores compilado, refeito quando a aba é invalidada"""
+    return cache.get_or_set(
+        'Indicadores_Dicionario',
+        'catalog',
+        lambda: IndicatorCatalog.from_records(sheets_manager.get_all_records('Indicadores_Dicionario'))
+    )
+
+# Anos fechados arquivados fora da planilha (archive.py)
+archive_store = ArchiveStore()
+
+def _sheet_lancamentos(arquivados):
+    """Linhas da aba Lancamentos que não pertencem a anos arquivados"""
+    records = sheets_manager.get_records('Lancamentos', Lancamento)
+    if not arquivados:
+        return records
+    return [record for record in records if record.ano not in arquivados]
+
+def get_lancamentos_records(ano=None):
+    """Registros de Lancamentos, com os anos arquivados lidos do arquivo
     
-    def _initialize_client(self):
-        """Inicializa o cliente Google Sheets"""
-        try:
-            # Obtém credenciais do ambiente
-            credentials_json = os.environ.get('GOOGLE_CREDENTIALS_JSON')
-            
-            if credentials_json:
-                # Parse das credenciais JSON
-                credentials_data = json.loads(credentials_json)
-                credentials = Credentials.from_service_account_info(
-                    credentials_data,
-                    scopes=GOOGLE_SHEETS_CONFIG['SCOPES']
-                )
-            else:
-                # Fallback para arquivo de credenciais
-                credentials_file = os.environ.get('GOOGLE_CREDENTIALS_FILE', 'credentials.json')
-                if os.path.exists(credentials_file):
-                    credentials = Credentials.from_service_account_file(
-                        credentials_file,
-                        scopes=GOOGLE_SHEETS_CONFIG['SCOPES']
-                    )
-                else:
-                    raise Exception("Credenciais do Google não encontradas")
-            
-            # Inicializa cliente
-            self.client = gspread.authorize(credentials)
-            self.spreadsheet = self.client.open_by_key(GOOGLE_SHEETS_CONFIG['SPREADSHEET_ID'])
-            
-            logger.info("Cliente Google Sheets inicializado com sucesso")
-            
-        except Exception as e:
-            logger.error(f"Erro ao inicializar Google Sheets: {str(e)}")
-            self.client = None
-            self.spreadsheet = None
+    Com ano, só os registros dele (do arquivo ou filtrados da planilha);
+    sem ano, os dos anos arquivados seguidos dos da planilha.
+    """
+    if ano is not None:
+        arquivado = archive_store.get(ano)
+        if arquivado is not None:
+            return arquivado.records
+        return [record for record in sheets_manager.get_records('Lancamentos', Lancamento) if record.ano == ano]
     
-    def get_worksheet(self, sheet_name):
-        """Obtém uma planilha específica"""
-        try:
-            if not self.spreadsheet:
-                self._initialize_client()
-            
-            return self.spreadsheet.worksheet(sheet_name)
-        except Exception as e:
-            logger.error(f"Erro ao acessar planilha '{sheet_name}': {str(e)}")
-            return None
+    anos = archive_store.years()
+    records = []
+    for arquivado in anos:
+        records.extend(archive_store.get(arquivado).records)
+    records.extend(_sheet_lancamentos(set(anos)))
+    return records
+
+def _build_columnar():
+    # Dos anos arquivados bastam os agregados pré-calculados
+    anos = archive_store.years()
+    records = []
+    for ano in anos:
+        records.extend(archive_store.get(ano).aggregate_records())
+    records.extend(_sheet_lancamentos(set(anos)))
+    return ColumnarLancamentos.from_records(records)
+
+# Com SNAPSHOT_DIR, as colunas ficam num arquivo mapeado e compartilhado
+# pelos workers (snapshot.py) em vez de uma cópia no cache de cada um
+columnar_snapshot = SnapshotStore(os.environ['SNAPSHOT_DIR'], _build_columnar) if os.environ.get('SNAPSHOT_DIR') else None
+
+def get_columnar_lancamentos():
+    """Lançamentos em colunas (columnar.py), refeitos quando a aba é invalidada"""
+    if columnar_snapshot is not None:
+        epoch, [(versao, _)] = cache.versions(['Lancamentos'])
+        return columnar_snapshot.get(f'{epoch}:{versao}:{archive_store.signature()}')
+    return cache.get_or_set('Lancamentos', f'columnar:{archive_store.signature()}', _build_columnar)
+
+# Acumulados de 12 meses e do ano (rolling.py), atualizados nas escritas
+rolling_lancamentos = RollingStore(
+    cache, 'Lancamentos', lambda: get_columnar_lancamentos().rows(), signature=archive_store.signature
+)
+
+def _delta_lancamento(unidade, mes, ano, lanc):
+    """Linha gravada em Lancamentos como delta dos acumulados
+
+    Os valores passam por numericise, como na leitura da aba, para cair nas
+    mesmas chaves. Devolve None se ano/mês não são válidos (a linha também
+    fica de fora na leitura).
+    """
+    ano, mes = numericise(str(ano)), numericise(str(mes))
+    if type(ano) is not int or type(mes) is not int or not 1 <= mes <= 12:
+        return None
+    return (
+        lanc.get('indicador', ''),
+        numericise(str(unidade)),
+        to_periodo(ano, mes),
+        to_number(numericise(str(lanc.get('numerador', '')))),
+        to_number(numericise(str(lanc.get('denominador', ''))))
+    )
+
+def ranking_planilha(periodo):
+    """Ranking das unidades em todos os indicadores (ranking.py)"""
+    catalogo = get_indicator_catalog()
+    somas = get_columnar_lancamentos().period_sums(periodo)
     
-    def get_all_records(self, sheet_name):
-        """Obtém todos os registros de uma planilha"""
-        try:
-            worksheet = self.get_worksheet(sheet_name)
-            if worksheet:
-                return worksheet.get_all_records()
-            return []
-        except Exception as e:
-            logger.error(f"Erro ao obter registros de '{sheet_name}': {str(e)}")
-            return []
+    nomes = list(catalogo.indicadores) + [nome for nome in somas if nome not in catalogo.indicadores]
+    indicadores = []
+    for nome in nomes:
+        unidades = somas.get(nome, {})
+        resultados = {unidade: serie_resultado(num, den) for unidade, (num, den) in unidades.items()}
+        
+        # A média do hospital é a Média Geral: razão das somas
+        total_num = sum(num for num, _ in unidades.values())
+        total_den = sum(den for _, den in unidades.values())
+        media, linhas = rank_units(resultados, catalogo.rank_key(nome), serie_resultado(total_num, total_den))
+        
+        status = catalogo.statuses([nome] * len(linhas), [linha['resultado'] for linha in linhas])
+        for linha, cor in zip(linhas, status):
+            num, den = unidades[linha['unidade']]
+            linha.update(numerador=num, denominador=den, status=cor)
+        
+        indicador = catalogo.get(nome)
+        indicadores.append({
+            'id': indicador.id if indicador else '',
+            'nome': nome,
+            'meta': indicador.meta if indicador else '',
+            'media': media,
+            'unidades_ranqueadas': sum(1 for linha in linhas if linha['posicao'] is not None),
+            'unidades': linhas
+        })
     
-    def append_row(self, sheet_name, row_data):
-        """Adiciona uma linha à planilha"""
-        try:
-            worksheet = self.get_worksheet(sheet_name)
-            if worksheet:
-                worksheet.append_row(row_data)
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Erro ao adicionar linha em '{sheet_name}': {str(e)}")
-            return False
+    return {'periodo': format_periodo(periodo), 'indicadores': indicadores}
+
+def _posicao(item):
+    """Chave de paginação de pares (posição na aba, registro)"""
+    return (item[0],)
+
+def _nome_indicador(lancamento):
+    """Chave de paginação dos lançamentos agregados por indicador"""
+    return (str(lancamento.indicador_nome),)
+
+# Sonda de readiness com resultado em cache (HEALTH_PROBE_TTL)
+sheets_probe = DependencyProbe('google_sheets', sheets_manager.ping)
+
+def is_admin_request():
+    """Verifica pelo token JWT se quem faz a requisição é administrador"""
+    verify_jwt_in_request(optional=True)
+    email = get_jwt_identity()
+    if not email:
+        return False
     
-    def update_cell(self, sheet_name, row, col, value):
-        """Atualiza uma célula específica"""
-        try:
-            worksheet = self.get_worksheet(sheet_name)
-            if worksheet:
-                worksheet.update_cell(row, col, value)
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Erro ao atualizar célula em '{sheet_name}': {str(e)}")
-            return False
+    for usuario in sheets_manager.get_all_records('Usuarios'):
+        if usuario.get('Email', '').lower() == email.lower():
+            return usuario.get('Role') == 'admin'
+    return False
 
-# Instância global do gerenciador
-sheets_manager = GoogleSheetsManager()
+# Perfil por requisição via cabeçalho X-Profile (apenas administradores)
+init_profiling(app, is_admin_request)
+init_compression(app)
 
 def require_auth(f):
     """Decorator para rotas que requerem autenticação"""
@@ -267,6 +342,26 @@ def unit_access_required(f):
     
     return decorated_function
 
+def server_busy_response():
+    """Resposta para quando a fila de hashing de senhas está cheia"""
+    response = jsonify({'message': 'Servidor ocupado, tente novamente em instantes'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '2'
+    return response
+
+def rehash_password(usuarios, user_data, password):
+    """Atualiza o hash da senha na planilha com o custo atual"""
+    try:
+        row = usuarios.index(user_data) + 2  # Pula cabeçalho
+        col = list(user_data.keys()).index('Password') + 1
+        sheets_manager.update_cell('Usuarios', row, col, password_hasher.hash(password))
+        logger.info(f"Hash de senha atualizado: {user_data.get('Email')}")
+    except PasswordHasherBusy:
+        # Tenta novamente no próximo login
+        pass
+    except Exception as e:
+        logger.error(f"Erro ao atualizar hash de senha: {str(e)}")
+
 # ========================================
 # ROTAS DE AUTENTICAÇÃO
 # ========================================
@@ -276,6 +371,9 @@ def unit_access_required(f):
 def google_auth():
     """Autenticação via Google OAuth"""
     try:
+        from google.oauth2 import id_token
+        from google.auth.transport import requests
+        
         token = request.json.get('token')
         
         if not token:
@@ -387,7 +485,7 @@ def register():
                 return jsonify({'message': 'Email já cadastrado'}), 409
         
         # Hash da senha
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        password_hash = password_hasher.hash(password)
         
         # Preparar dados para inserção
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -407,6 +505,10 @@ def register():
         
         if success:
             logger.info(f"Usuário cadastrado: {email}")
+            changelog.record('Usuarios', 'criado', {
+                'Email': email, 'Nome': nome, 'Role': role, 'Unidade': unidade,
+                'COREN': coren, 'Data_Cadastro': timestamp, 'Status': 'Ativo'
+            }, unidade=numericise(str(unidade)))
             return jsonify({
                 'message': 'Usuário cadastrado com sucesso',
                 'user': {
@@ -419,6 +521,8 @@ def register():
         else:
             return jsonify({'message': 'Erro ao salvar usuário'}), 500
             
+    except PasswordHasherBusy:
+        return server_busy_response()
     except Exception as e:
         logger.error(f"Erro no cadastro: {str(e)}")
         return jsonify({'message': 'Erro interno do servidor'}), 500
@@ -450,13 +554,17 @@ def login():
         
         # Verificar senha
         stored_password = user_data.get('Password', '')
-        if not bcrypt.checkpw(password.encode('utf-8'), stored_password.encode('utf-8')):
+        if not password_hasher.check(password, stored_password):
             return jsonify({'message': 'Email ou senha incorretos'}), 401
         
         # Verificar se usuário está ativo
         if user_data.get('Status', '').lower() != 'ativo':
             return jsonify({'message': 'Usuário inativo'}), 401
         
+        # Regera o hash se o custo do bcrypt mudou
+        if password_hasher.needs_rehash(stored_password):
+            rehash_password(usuarios, user_data, password)
+        
         # Criar perfil do usuário
         user_profile = {
             'email': user_data['Email'],
@@ -477,6 +585,8 @@ def login():
             'user': user_profile
         })
         
+    except PasswordHasherBusy:
+        return server_busy_response()
     except Exception as e:
         logger.error(f"Erro no login: {str(e)}")
         return jsonify({'message': 'Erro interno do servidor'}), 500
@@ -486,22 +596,29 @@ def login():
 # ========================================
 
 @app.route('/api/unidades', methods=['GET'])
+@conditional(cache, ['Unidades'], fresh=sheets_manager.is_cached)
 @handle_errors
 def get_unidades():
     """Obtém lista de unidades hospitalares"""
     try:
         records = sheets_manager.get_all_records('Unidades')
         
+        # Paginação pela posição da linha na aba (as linhas só são acrescentadas)
+        page = page_request()
+        pagina = paginate_sequence(list(enumerate(records)), _posicao, page)
+        
         unidades = []
-        for record in records:
+        for _, record in pagina.items:
             unidades.append({
                 'id': str(record.get('ID', '')),
                 'nome': record.get('Nome', ''),
                 'foto_url': record.get('Foto_URL', '') or None
             })
         
-        return jsonify(unidades)
+        return set_page_headers(jsonify(unidades), pagina)
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao buscar unidades: {str(e)}")
         return jsonify({'error': 'Erro ao buscar unidades'}), 500
@@ -521,13 +638,17 @@ def update_unidade_foto(unidade_id):
             return jsonify({'error': 'Planilha não encontrada'}), 500
         
         # Obtém todos os dados
-        all_values = worksheet.get_all_values()
+        with track_sheets('get_all_values', 'Unidades'):
+            all_values = worksheet.get_all_values()
         
         # Procura pela unidade
         for i, row in enumerate(all_values[1:], start=2):  # Pula cabeçalho
             if row[0] == unidade_id:  # Coluna A = ID
                 # Atualiza coluna C (foto_url)
-                worksheet.update_cell(i, 3, foto_url)
+                with track_sheets('update_cell', 'Unidades'):
+                    worksheet.update_cell(i, 3, foto_url)
+                sheets_manager.invalidate('Unidades')
+                changelog.record('Unidades', 'atualizado', {'ID': numericise(unidade_id), 'Foto_URL': foto_url})
                 return jsonify({
                     'success': True,
                     'message': 'Foto da unidade atualizada com sucesso'
@@ -540,6 +661,7 @@ def update_unidade_foto(unidade_id):
         return jsonify({'error': 'Erro ao atualizar foto'}), 500
 
 @app.route('/api/indicadores/dicionario', methods=['GET'])
+@conditional(cache, ['Indicadores_Dicionario'], fresh=sheets_manager.is_cached)
 @handle_errors
 def get_indicadores_dicionario():
     """Obtém o dicionário de indicadores"""
@@ -562,13 +684,172 @@ def get_indicadores_dicionario():
         logger.error(f"Erro ao buscar dicionário de indicadores: {str(e)}")
         return jsonify({'error': 'Erro ao buscar indicadores'}), 500
 
+@app.route('/api/indicadores/<indicador_id>/serie', methods=['GET'])
+@jwt_required()
+@auth_required
+@handle_errors
+def get_serie_indicador(indicador_id):
+    """Série mensal de um indicador para uma ou mais unidades
+    
+    indicador_id é o ID da aba Indicadores_Dicionario (ou o nome). Os
+    parâmetros estão descritos em series.py; a Média Geral é a soma de
+    numeradores e denominadores de todas as unidades.
+    """
+    try:
+        catalogo = get_indicator_catalog()
+        indicador = catalogo.find(indicador_id)
+        if indicador is None:
+            return jsonify({'error': 'Indicador não encontrado'}), 404
+        
+        user_role = request.current_user.get('role')
+        user_unit = numericise(str(request.current_user.get('unidade', '')))
+        
+        try:
+            if user_role == 'operador':
+                pedido = serie_request(default_unidades=(str(user_unit),), parse_unidade=numericise)
+            else:
+                pedido = serie_request(parse_unidade=numericise)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Operadores só veem a própria unidade
+        if user_role == 'operador' and (pedido.geral or any(u != user_unit for u in pedido.unidades)):
+            return jsonify({'message': 'Acesso negado à unidade'}), 403
+        
+        series = get_columnar_lancamentos().series(
+            indicador.nome, pedido.inicio, pedido.fim, pedido.unidades, pedido.geral
+        )
+        
+        resposta = []
+        for unidade, (numeradores, denominadores) in series.items():
+            valores = [serie_resultado(num, den) for num, den in zip(numeradores, denominadores)]
+            resposta.append({
+                'unidade': 'Média Geral' if unidade is None else unidade,
+                'numerador': numeradores,
+                'denominador': denominadores,
+                'resultado': valores,
+                'status': catalogo.statuses([indicador.nome] * len(valores), valores)
+            })
+        
+        return jsonify({
+            'indicador': {
+                'id': indicador.id,
+                'nome': indicador.nome,
+                'meta': indicador.meta,
+                'descricao': indicador.descricao,
+                'num_label': indicador.num_label,
+                'den_label': indicador.den_label
+            },
+            'periodos': pedido.periodos(),
+            'series': resposta
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao buscar série do indicador: {str(e)}")
+        return jsonify({'error': 'Erro ao buscar série do indicador'}), 500
+
+@app.route('/api/indicadores/acumulados', methods=['GET'])
+@jwt_required()
+@auth_required
+@handle_errors
+def get_acumulados():
+    """Mês, últimos 12 meses e acumulado no ano de cada indicador
+    
+    Parâmetros em rolling.py; para operadores, a unidade é sempre a
+    própria. Numerador e denominador são somados na janela, e o resultado
+    é a razão das somas.
+    """
+    try:
+        user_role = request.current_user.get('role')
+        user_unit = numericise(str(request.current_user.get('unidade', '')))
+        
+        try:
+            periodo = periodo_param()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        unidade = request.args.get('unidade')
+        unidade = numericise(unidade) if unidade and unidade != 'geral' else None
+        if user_role == 'operador':
+            if unidade is not None and unidade != user_unit:
+                return jsonify({'message': 'Acesso negado à unidade'}), 403
+            unidade = user_unit
+        
+        catalogo = get_indicator_catalog()
+        acumulados = rolling_lancamentos.get()
+        
+        indicadores = []
+        for nome in acumulados.indicadores():
+            janelas = acumulados.get(nome, unidade, periodo)
+            if janelas is None:
+                continue
+            indicador = catalogo.get(nome)
+            item = {
+                'id': indicador.id if indicador else '',
+                'nome': nome,
+                'meta': indicador.meta if indicador else ''
+            }
+            for chave, (num, den) in janelas.items():
+                valor = serie_resultado(num, den)
+                item[chave] = {
+                    'numerador': num,
+                    'denominador': den,
+                    'resultado': valor,
+                    'status': catalogo.statuses([nome], [valor])[0]
+                }
+            indicadores.append(item)
+        
+        return jsonify({
+            'periodo': format_periodo(periodo),
+            'unidade': 'Média Geral' if unidade is None else unidade,
+            'indicadores': indicadores
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao buscar acumulados: {str(e)}")
+        return jsonify({'error': 'Erro ao buscar acumulados'}), 500
+
+@app.route('/api/indicadores/ranking', methods=['GET'])
+@jwt_required()
+@auth_required
+@handle_errors
+def get_ranking():
+    """Ranking das unidades em cada indicador num mês (ranking.py)"""
+    try:
+        try:
+            periodo = periodo_param()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Em cache por mês até a próxima escrita; a versão do dicionário
+        # entra na chave porque metas e nomes vêm dele, e a assinatura dos
+        # arquivos porque o job de arquivamento troca a fonte dos anos fechados
+        versao = cache.version('Indicadores_Dicionario')
+        chave = f'ranking:{periodo}:{versao}:{archive_store.signature()}'
+        ranking = cache.get_or_set('Lancamentos', chave, lambda: ranking_planilha(periodo))
+        
+        if request.current_user.get('role') == 'operador':
+            ranking = for_unit(ranking, numericise(str(request.current_user.get('unidade', ''))))
+        
+        return jsonify(ranking)
+        
+    except Exception as e:
+        logger.error(f"Erro ao calcular ranking: {str(e)}")
+        return jsonify({'error': 'Erro ao calcular ranking'}), 500
+
 @app.route('/api/lancamentos', methods=['GET'])
 @jwt_required()
 @auth_required
 @unit_access_required
 @handle_errors
 def get_lancamentos():
-    """Obtém lançamentos com filtros"""
+    """Obtém lançamentos com filtros
+    
+    Com formato=compacto a resposta é {"indicadores": {nome: {meta,
+    descricao, num_label, den_label}}, "lancamentos": [...]}, sem repetir
+    os dados do indicador em cada linha. Aceita paginação por limit/after
+    (ver pagination.py).
+    """
     try:
         # Parâmetros de filtro
         unidade = request.args.get('unidade')
@@ -582,105 +863,101 @@ def get_lancamentos():
         if user_role == 'operador':
             unidade = user_unit
         
-        # Busca dados do dicionário
-        dicionario_records = sheets_manager.get_all_records('Indicadores_Dicionario')
-        mapa_indicadores = {}
+        # Dicionário de indicadores com as metas já interpretadas
+        catalogo = get_indicator_catalog()
         
-        for record in dicionario_records:
-            nome = record.get('Indicador')
-            if nome:
-                mapa_indicadores[nome] = {
-                    'descricao': record.get('O que Mede', ''),
-                    'num_label': record.get('Numerador', ''),
-                    'den_label': record.get('Denominador', ''),
-                    'formula': record.get('Fórmula', ''),
-                    'meta': record.get('Meta', '')
-                }
+        # Os valores da planilha já vêm convertidos em números
+        ano_filtro = numericise(str(ano)) if ano else None
+        mes_filtro = numericise(str(mes)) if mes else None
         
-        # Busca lançamentos
-        lancamentos_records = sheets_manager.get_all_records('Lancamentos')
+        # Busca lançamentos (registros compactos, sem um dict por linha);
+        # anos fechados vêm do arquivo
+        lancamentos_records = get_lancamentos_records(ano_filtro)
         
-        # Filtra lançamentos
-        lancamentos_filtrados = []
+        # Pares (posição na aba, registro): a posição é a chave do cursor.
+        # O arquivamento de um ano muda as posições: a assinatura dos
+        # arquivos vai no cursor e invalida os cursores anteriores
+        lancamentos_periodo = [
+            (posicao, record) for posicao, record in enumerate(lancamentos_records)
+            if (ano_filtro is None or record.ano == ano_filtro)
+            and (mes_filtro is None or record.mes == mes_filtro)
+        ]
+        
+        page = page_request()
         
         if unidade:
             # Filtro por unidade específica
-            for record in lancamentos_records:
-                match = True
-                if ano and str(record.get('Ano', '')) != str(ano):
-                    match = False
-                if mes and str(record.get('Mes', '')) != str(mes):
-                    match = False
-                if str(record.get('ID_Unidade', '')) != str(unidade):
-                    match = False
-                
-                if match:
-                    lancamentos_filtrados.append(record)
+            unidade_filtro = numericise(str(unidade))
+            pagina = paginate_sequence(
+                [par for par in lancamentos_periodo if par[1].id_unidade == unidade_filtro],
+                _posicao, page, scope=archive_store.signature()
+            )
+            lancamentos_filtrados = [record for _, record in pagina.items]
         else:
             # Agregação para todas as unidades
-            lancamentos_periodo = []
-            for record in lancamentos_records:
-                match = True
-                if ano and str(record.get('Ano', '')) != str(ano):
-                    match = False
-                if mes and str(record.get('Mes', '')) != str(mes):
-                    match = False
-                
-                if match:
-                    lancamentos_periodo.append(record)
-            
-            # Agrega por indicador
             agregados = {}
-            for record in lancamentos_periodo:
-                nome = record.get('Indicador_Nome', '')
-                if nome not in agregados:
-                    agregados[nome] = {
-                        'Indicador_Nome': nome,
-                        'ID_Unidade': 'Média Geral',
-                        'Mes': mes or 'N/A',
-                        'Ano': ano or 'N/A',
-                        'Valor_Numerador': 0,
-                        'Valor_Denominador': 0
-                    }
+            for _, record in lancamentos_periodo:
+                nome = record.indicador_nome
+                agregado = agregados.get(nome)
+                if agregado is None:
+                    agregado = agregados[nome] = LancamentoAgregado(nome, mes or 'N/A', ano or 'N/A')
                 
-                agregados[nome]['Valor_Numerador'] += float(record.get('Valor_Numerador', 0) or 0)
-                agregados[nome]['Valor_Denominador'] += float(record.get('Valor_Denominador', 0) or 0)
+                agregado.valor_numerador += float(record.valor_numerador or 0)
+                agregado.valor_denominador += float(record.valor_denominador or 0)
             
-            lancamentos_filtrados = list(agregados.values())
-        
-        # Processa resultados
-        resultado = []
+            # Uma linha por indicador; paginadas, ficam em ordem de nome
+            lancamentos_agregados = list(agregados.values())
+            if page.active:
+                lancamentos_agregados.sort(key=_nome_indicador)
+            pagina = paginate_sequence(lancamentos_agregados, _nome_indicador, page)
+            lancamentos_filtrados = pagina.items
+        
+        # Calcula os resultados (percentual arredondado como exibido)
+        nomes = []
+        valores = []
         for lanc in lancamentos_filtrados:
-            dic = mapa_indicadores.get(lanc.get('Indicador_Nome', ''), {})
-            num = float(lanc.get('Valor_Numerador', 0) or 0)
-            den = float(lanc.get('Valor_Denominador', 0) or 0)
-            
-            # Calcula resultado
-            if den != 0:
-                resultado_calc = (num / den) * 100
-                resultado_str = f"{resultado_calc:.2f}"
-            else:
-                resultado_str = 'N/A'
-            
-            meta = dic.get('meta', 'N/A')
-            
-            # Define status (simplificado)
-            status = 'gray'
-            if meta == 'Zero' and resultado_str != 'N/A':
-                status = 'green' if float(resultado_str) == 0 else 'red'
+            num = float(lanc.valor_numerador or 0)
+            den = float(lanc.valor_denominador or 0)
+            nomes.append(lanc.indicador_nome)
+            valores.append(round((num / den) * 100, 2) if den != 0 else None)
+        
+        # Status de todas as linhas em uma única passada
+        status_list = catalogo.statuses(nomes, valores)
+        
+        # Os dicts da resposta só são montados aqui. Os dados do indicador
+        # (meta, descrição e rótulos) são montados uma vez por indicador;
+        # no formato compacto vão numa tabela à parte, referenciada pelo
+        # Indicador_Nome de cada linha, em vez de repetidos linha a linha
+        compacto = request.args.get('formato') == 'compacto'
+        indicadores = {}
+        resultado = []
+        for lanc, nome, valor, status in zip(lancamentos_filtrados, nomes, valores, status_list):
+            info = indicadores.get(nome)
+            if info is None:
+                dic = catalogo.get(nome)
+                info = indicadores[nome] = {
+                    'meta': dic.meta if dic else 'N/A',
+                    'descricao': dic.descricao if dic else 'N/A',
+                    'num_label': dic.num_label if dic else 'N/A',
+                    'den_label': dic.den_label if dic else 'N/A'
+                }
             
-            resultado.append({
-                **lanc,
-                'resultado': resultado_str,
-                'meta': meta,
-                'status': status,
-                'descricao': dic.get('descricao', 'N/A'),
-                'num_label': dic.get('num_label', 'N/A'),
-                'den_label': dic.get('den_label', 'N/A')
-            })
-        
-        return jsonify(resultado)
-        
+            item = lanc.to_dict()
+            item['resultado'] = f"{valor:.2f}" if valor is not None else 'N/A'
+            item['status'] = status
+            if not compacto:
+                item.update(info)
+            resultado.append(item)
+        
+        if compacto:
+            resposta = {'indicadores': indicadores, 'lancamentos': resultado}
+            if page.active:
+                resposta['paginacao'] = pagina.metadata()
+            return set_page_headers(jsonify(resposta), pagina)
+        return set_page_headers(jsonify(resultado), pagina)
+        
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao buscar lançamentos: {str(e)}")
         return jsonify({'error': 'Erro ao buscar lançamentos'}), 500
@@ -708,6 +985,10 @@ def salvar_lancamentos():
                 'error': 'Nenhum indicador foi preenchido'
             })
         
+        # Anos arquivados são somente leitura
+        if numericise(str(ano)) in archive_store.years():
+            return jsonify({'error': f'O ano {ano} está arquivado e não aceita lançamentos'}), 409
+        
         # Obtém informações do usuário
         user_email = session.get('user_id', '')
         timestamp = datetime.now().isoformat()
@@ -733,8 +1014,21 @@ def salvar_lancamentos():
             return jsonify({'error': 'Planilha não encontrada'}), 500
         
         # Adiciona todas as linhas
-        for row in rows_to_append:
-            worksheet.append_row(row)
+        marca = rolling_lancamentos.begin_write()
+        gravados = 0
+        try:
+            for row in rows_to_append:
+                with track_sheets('append_row', 'Lancamentos'):
+                    worksheet.append_row(row)
+                gravados += 1
+        finally:
+            sheets_manager.invalidate('Lancamentos')
+            deltas = [_delta_lancamento(unidade, mes, ano, lanc) for lanc in lancamentos[:gravados]]
+            rolling_lancamentos.apply(marca, [delta for delta in deltas if delta is not None])
+            header = [column for column, _ in Lancamento.COLUMNS]
+            gravadas = [[str(value) for value in row] for row in rows_to_append[:gravados]]
+            for record in Lancamento.decode([header] + gravadas):
+                changelog.record('Lancamentos', 'criado', record.to_dict(), unidade=record.id_unidade)
         
         return jsonify({
             'success': True,
@@ -745,6 +1039,107 @@ def salvar_lancamentos():
         logger.error(f"Erro ao salvar lançamentos: {str(e)}")
         return jsonify({'error': 'Erro ao salvar lançamentos'}), 500
 
+@app.route('/api/changes', methods=['GET'])
+@jwt_required()
+@auth_required
+@handle_errors
+def get_changes():
+    """Alterações desde o cursor `since` (ver changes.py)
+    
+    Operadores só recebem as alterações da própria unidade (e as que não
+    pertencem a nenhuma); usuários cadastrados só aparecem para admins.
+    """
+    try:
+        since, limit = changes_request()
+        
+        user_role = request.current_user.get('role')
+        visible = visibility(
+            numericise(str(request.current_user.get('unidade'))),
+            todas_unidades=user_role != 'operador',
+            admin=user_role == 'admin',
+            restritas=('Usuarios',)
+        )
+        
+        return jsonify(changelog.since(since, limit, visible))
+    except ChangeFeedError as e:
+        return jsonify({'error': str(e)}), 400
+    except ChangeFeedUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Erro ao buscar alterações: {str(e)}")
+        return jsonify({'error': 'Erro ao buscar alterações'}), 500
+
+@app.route('/api/stream/token', methods=['POST'])
+@jwt_required()
+@auth_required
+@handle_errors
+def get_stream_token():
+    """Token curto para conectar ao stream SSE (ver stream.py)"""
+    if stream_hub.unavailable:
+        return jsonify({'error': stream_hub.unavailable}), 503
+    
+    claims, expires = stream_token_claims()
+    token = create_access_token(identity=request.current_user['email'], additional_claims=claims, expires_delta=expires)
+    return jsonify({'token': token, 'expira_em': int(expires.total_seconds())})
+
+@app.route('/api/stream', methods=['GET'])
+def get_stream():
+    """Alterações em tempo real por Server-Sent Events (ver stream.py)"""
+    try:
+        return stream_response(stream_hub)
+    except StreamError as e:
+        return jsonify({'error': str(e)}), 400
+    except StreamUnauthorized as e:
+        return jsonify({'error': str(e)}), 401
+    except StreamUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Erro ao abrir o stream: {str(e)}")
+        return jsonify({'error': 'Erro ao abrir o stream'}), 500
+
+def _stream_user(token, params, query):
+    """Usuário do stream SSE pelo token (ver stream.py)"""
+    try:
+        claims = decode_token(token)
+    except Exception:
+        return None
+    if query and not is_stream_token(claims):
+        return None
+    email = claims[app.config['JWT_IDENTITY_CLAIM']]
+    
+    usuarios = sheets_manager.get_all_records('Usuarios')
+    user_data = next((u for u in usuarios if u.get('Email', '').lower() == str(email).lower()), None)
+    if not user_data or user_data.get('Status', '').lower() != 'ativo':
+        return None
+    
+    role = user_data.get('Role', 'operador')
+    user_unit = numericise(str(user_data.get('Unidade', '')))
+    visible = visibility(user_unit, todas_unidades=role != 'operador', admin=role == 'admin', restritas=('Usuarios',))
+    
+    unidade = params.get('unidade')
+    unidade = numericise(unidade) if unidade and unidade != 'geral' else None
+    if role == 'operador':
+        unidade = user_unit
+    return visible, unidade
+
+def _stream_agregados(entry):
+    """Acumulados do indicador lançado, se já estão em memória"""
+    periodo = entry_periodo(entry)
+    if entry['entidade'] != 'Lancamentos' or periodo is None:
+        return
+    acumulados = rolling_lancamentos.current()
+    if acumulados is not None:
+        dados = entry['dados']
+        agregados = changed_windows(acumulados, dados['Indicador_Nome'], dados['ID_Unidade'], periodo)
+        # Status do mês na unidade e na soma geral, como na listagem de
+        # lançamentos: o dashboard atualiza o card sem recarregar
+        meses = [janelas['mes'] if janelas else None for janelas in (agregados['janelas'], agregados['geral'])]
+        unidade, geral = get_indicator_catalog().statuses(
+            [dados['Indicador_Nome']] * 2, [serie_resultado(*mes) if mes else None for mes in meses]
+        )
+        agregados['status'] = {'unidade': unidade, 'geral': geral}
+        entry['agregados'] = agregados
+
 # ========================================
 # ROTAS ADMINISTRATIVAS
 # ========================================
@@ -761,7 +1156,10 @@ def get_usuarios():
     
     try:
         usuarios = sheets_manager.get_all_records('Usuarios')
-        return jsonify(usuarios)
+        pagina = paginate_sequence(list(enumerate(usuarios)), _posicao, page_request())
+        return set_page_headers(jsonify([usuario for _, usuario in pagina.items]), pagina)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao buscar usuários: {str(e)}")
         return jsonify({'error': 'Erro ao buscar usuários'}), 500
@@ -774,8 +1172,8 @@ def get_usuarios():
 def health_check():
     """Verifica saúde da API"""
     try:
-        # Testa conexão com Google Sheets
-        if sheets_manager.client:
+        # Estado da conexão com Google Sheets (sem forçar a inicialização)
+        if sheets_manager.is_ready:
             sheets_status = 'connected'
         else:
             sheets_status = 'disconnected'
@@ -792,6 +1190,21 @@ def health_check():
             'error': str(e)
         }), 500
 
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness: o processo está respondendo"""
+    return jsonify(liveness())
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: Google Sheets respondendo com latência aceitável"""
+    body, status = readiness(
+        [sheets_probe],
+        cache=cache,
+        extras={'password_hashing': password_hasher.stats()}
+    )
+    return jsonify(body), status
+
 @app.route('/api/config', methods=['GET'])
 def get_config():
     """Obtém configurações públicas"""
@@ -800,7 +1213,7 @@ def get_config():
         'version': '1.0.0',
         'features': {
             'google_auth': bool(GOOGLE_CLIENT_ID),
-            'google_sheets': bool(sheets_manager.client)
+            'google_sheets': sheets_manager.is_ready
         }
     })
 
@@ -825,6 +1238,37 @@ def internal_error(error):
 # INICIALIZAÇÃO
 # ========================================
 
+# Push das alterações por SSE (/api/stream); nada é aberto antes da primeira conexão
+stream_hub = create_stream_hub(changelog, _stream_user, app.json.dumps, enrich=_stream_agregados, cache=cache)
+
+# Modo ASGI (asgi.py, `uvicorn app:asgi_app`): as abas que cada rota lê são
+# carregadas de forma assíncrona antes da view, sem ocupar thread na espera
+_ABAS_LANCAMENTOS = [('Lancamentos', Lancamento), ('Indicadores_Dicionario', None)]
+ASGI_PREFETCH_ROUTES = [
+    (r'/api/auth/(login|register|google)$', [('Usuarios', None)]),
+    (r'/api/admin/usuarios$', [('Usuarios', None)]),
+    (r'/api/unidades$', [('Unidades', None)]),
+    (r'/api/indicadores/dicionario$', [('Indicadores_Dicionario', None)]),
+    (r'/api/indicadores/(acumulados|ranking|[^/]+/serie)$', _ABAS_LANCAMENTOS),
+    (r'/api/lancamentos$', _ABAS_LANCAMENTOS)
+]
+
+def __getattr__(name):
+    """asgi_app é criado no primeiro acesso: os workers síncronos (gunicorn)
+    e os scripts não importam asgi.py, sheets_async.py nem o httpx"""
+    if name == 'asgi_app':
+        from asgi import create_asgi_app
+        from sheets_async import create_route_prefetch
+
+        prefetch = create_route_prefetch(sheets_manager, ASGI_PREFETCH_ROUTES, authenticated=[('Usuarios', None)])
+        globals()['asgi_app'] = create_asgi_app(app, prefetch=prefetch)
+        return globals()['asgi_app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Aquecimento em segundo plano: o servidor começa a escutar imediatamente
+if os.environ.get('SHEETS_WARM_UP', 'true').lower() == 'true':
+    sheets_manager.start_warm_up(['Usuarios', 'Unidades', 'Indicadores_Dicionario'])
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
@@ -8,16 +8,21 @@ from flask_jwt_extended import JWTManager, create_access_token, jwt_required, ge
 from datetime import datetime, timedelta
 import os
 import logging
-import bcrypt
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from passwords import create_password_hasher, PasswordHasherBusy
+from health import DependencyProbe, liveness, readiness
+from metrics import init_metrics
+from serialization import FastJSONProvider
+
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Flask App
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # Config
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'secret')
@@ -27,6 +32,12 @@ app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 # JWT
 jwt = JWTManager(app)
 
+# Hashing de senhas em pool de processos
+password_hasher = create_password_hasher()
+
+# Métricas de latência HTTP em /metrics
+init_metrics(app)
+
 # CORS
 CORS(app)
 
@@ -42,14 +53,59 @@ def get_db():
         logger.error(f"DB Error: {e}")
         return None
 
+def ping_database():
+    """Ida e volta mínima ao banco"""
+    conn = psycopg2.connect(DATABASE_URL, connect_timeout=5)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+    finally:
+        conn.close()
+
+database_probe = DependencyProbe('database', ping_database)
+
 @app.route('/health')
 def health():
     return {'status': 'ok', 'time': datetime.now().isoformat()}
 
+@app.route('/health/live')
+def health_live():
+    return liveness()
+
+@app.route('/health/ready')
+def health_ready():
+    body, status = readiness(
+        [database_probe],
+        extras={'password_hashing': password_hasher.stats()}
+    )
+    return body, status
+
 @app.route('/')
 def home():
     return {'message': 'Gestão Indicadores API', 'status': 'running'}
 
+def rehash_password(user_id, senha):
+    """Atualiza o hash da senha com o custo atual (sem impedir o login)"""
+    try:
+        senha_hash = password_hasher.hash(senha)
+        conn = get_db()
+        if not conn:
+            return
+        try:
+            cur = conn.cursor()
+            cur.execute("UPDATE usuarios SET senha_hash = %s WHERE id = %s", (senha_hash, user_id))
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+        logger.info(f"Hash de senha atualizado: usuário {user_id}")
+    except PasswordHasherBusy:
+        # Tenta novamente no próximo login
+        pass
+    except Exception as e:
+        logger.error(f"Erro ao atualizar hash de senha: {e}")
+
 @app.route('/auth/login', methods=['POST'])
 def login():
     try:
@@ -73,9 +129,13 @@ def login():
         if not user:
             return {'message': 'Usuário não encontrado'}, 401
         
-        if not bcrypt.checkpw(senha.encode(), user['senha_hash'].encode()):
+        if not password_hasher.check(senha, user['senha_hash']):
             return {'message': 'Senha incorreta'}, 401
         
+        # Regerar hash se o custo do bcrypt mudou
+        if password_hasher.needs_rehash(user['senha_hash']):
+            rehash_password(user['id'], senha)
+        
         token = create_access_token(identity=user['id'])
         
         return {
@@ -88,6 +148,8 @@ def login():
             }
         }
         
+    except PasswordHasherBusy:
+        return {'message': 'Servidor ocupado'}, 503, {'Retry-After': '2'}
     except Exception as e:
         logger.error(f"Login error: {e}")
         return {'message': 'Erro interno'}, 500
@@ -129,7 +191,7 @@ def init_db():
             cur.execute("INSERT INTO unidades (nome, codigo) VALUES ('UTI Geral', 'UTI01')")
             
             # Usuários
-            senha = bcrypt.hashpw('admin123'.encode(), bcrypt.gensalt()).decode()
+            senha = password_hasher.hash('admin123')
             
             cur.execute("""
                 INSERT INTO usuarios (email, nome, senha_hash, role, unidade_id) 
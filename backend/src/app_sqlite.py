@@ -5,13 +5,31 @@ Versão simplificada com SQLite
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, decode_token, jwt_required, get_jwt_identity, verify_jwt_in_request
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
 from datetime import datetime, timedelta
 import os
 import logging
+import operator
 from functools import wraps
-import bcrypt
+
+from cache import create_cache, install_sqlalchemy_invalidation
+from passwords import create_password_hasher, PasswordHasherBusy
+from health import DependencyProbe, liveness, readiness, sqlalchemy_pool_stats
+from metrics import init_metrics, instrument_sqlalchemy
+from profiling import init_profiling
+from compression import init_compression
+from serialization import FastJSONProvider
+from http_cache import conditional
+from columnar import to_periodo
+from series import serie_request, sql_series, sql_serie_response
+from rolling import RollingStore, changed_windows, periodo_param, sql_rows, sql_acumulados_response
+from ranking import for_unit, sql_ranking
+from changes import ChangeFeedError, ChangeFeedUnavailable, changes_request, create_changelog, visibility
+from stream import (create_stream_hub, entry_periodo, stream_response, stream_token_claims, is_stream_token,
+                    StreamError, StreamUnauthorized, StreamUnavailable)
+from pagination import EXPOSED_HEADERS, PaginationError, page_request, paginate_query, paginate_sequence, set_page_headers
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -19,16 +37,38 @@ logger = logging.getLogger(__name__)
 
 # Configuração da aplicação Flask
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config['SECRET_KEY'] = 'gestao-indicadores-secret-key'
 app.config['JWT_SECRET_KEY'] = 'jwt-secret-key'
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///gestao_indicadores.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('SQLITE_DATABASE_URI', 'sqlite:///gestao_indicadores.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Configurar extensões
 db = SQLAlchemy(app)
 jwt = JWTManager(app)
 
+@jwt.token_verification_loader
+def _token_da_api(jwt_header, jwt_data):
+    """O token curto do stream SSE não vale nas rotas da API"""
+    return not is_stream_token(jwt_data)
+
+# Cache compartilhado, invalidado a cada commit que altera a tabela
+cache = create_cache()
+# O ultimo_login gravado a cada login não invalida 'usuarios' (nem o
+# ETag de /api/unidades de todos os usuários)
+install_sqlalchemy_invalidation(db, cache, ignored_columns={'usuarios': ['ultimo_login']})
+
+# Log de alterações para /api/changes (no Redis do cache, quando houver)
+changelog = create_changelog(cache)
+
+# Hashing de senhas em pool de processos (BCRYPT_ROUNDS, PASSWORD_WORKERS)
+password_hasher = create_password_hasher()
+
+# Métricas de latência HTTP e SQL, expostas em /metrics
+instrument_sqlalchemy()
+init_metrics(app, cache=cache)
+
 # Configurar CORS
 CORS(app, supports_credentials=True, origins=[
     'http://localhost:3000',
@@ -37,7 +77,7 @@ CORS(app, supports_credentials=True, origins=[
     'http://127.0.0.1:3000',
     'http://127.0.0.1:8080',
     'http://127.0.0.1:8086'
-])
+], expose_headers=EXPOSED_HEADERS)
 
 # Modelos (copiados do init_sqlite.py)
 class Unidade(db.Model):
@@ -76,10 +116,13 @@ class Usuario(db.Model):
     lancamentos = db.relationship('Lancamento', backref='usuario', lazy='dynamic')
     
     def set_password(self, password):
-        self.senha_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.senha_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return bcrypt.checkpw(password.encode('utf-8'), self.senha_hash.encode('utf-8'))
+        return password_hasher.check(password, self.senha_hash)
+    
+    def needs_rehash(self):
+        return password_hasher.needs_rehash(self.senha_hash)
     
     def can_access_unidade(self, unidade_id):
         if self.role in ['admin', 'gestor']:
@@ -91,6 +134,11 @@ class Usuario(db.Model):
             return Unidade.query.filter_by(ativo=True).all()
         return [self.unidade]
     
+    def accessible_unidades_query(self):
+        if self.role in ['admin', 'gestor']:
+            return Unidade.query.filter_by(ativo=True)
+        return Unidade.query.filter_by(id=self.unidade_id)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -140,6 +188,10 @@ class Lancamento(db.Model):
     observacoes = db.Column(db.Text)
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_lancamentos_periodo', 'ano', 'mes'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -155,6 +207,19 @@ class Lancamento(db.Model):
             'observacoes': self.observacoes
         }
 
+def is_admin_request():
+    """Verifica pelo token JWT se quem faz a requisição é administrador"""
+    verify_jwt_in_request(optional=True)
+    current_user_id = get_jwt_identity()
+    if not current_user_id:
+        return False
+    user = Usuario.query.get(current_user_id)
+    return bool(user and user.ativo and user.role == 'admin')
+
+# Perfil por requisição via cabeçalho X-Profile (apenas administradores)
+init_profiling(app, is_admin_request)
+init_compression(app)
+
 # Decorador para verificar roles
 def role_required(roles):
     def decorator(f):
@@ -179,6 +244,13 @@ def role_required(roles):
         return decorated_function
     return decorator
 
+def server_busy_response():
+    """Resposta para quando a fila de hashing de senhas está cheia"""
+    response = jsonify({'message': 'Servidor ocupado, tente novamente em instantes'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '2'
+    return response
+
 # ROTAS DE AUTENTICAÇÃO
 @app.route('/auth/login', methods=['POST'])
 def login():
@@ -198,18 +270,24 @@ def login():
         if not user.ativo:
             return jsonify({'message': 'Usuário inativo'}), 401
         
+        # Regerar hash se o custo do bcrypt mudou
+        if user.needs_rehash():
+            user.set_password(data['senha'])
+        
         # Atualizar último login
         user.ultimo_login = datetime.utcnow()
         db.session.commit()
         
         # Criar token JWT
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=str(user.id))
         
         return jsonify({
             'token': access_token,
             'user': user.to_dict()
         }), 200
         
+    except PasswordHasherBusy:
+        return server_busy_response()
     except Exception as e:
         logger.error(f"Erro no login: {str(e)}")
         return jsonify({'message': 'Erro interno do servidor'}), 500
@@ -246,9 +324,10 @@ def register():
         
         db.session.add(user)
         db.session.commit()
+        changelog.record('usuarios', 'criado', user.to_dict(), unidade=user.unidade_id)
         
         # Criar token JWT
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=str(user.id))
         
         return jsonify({
             'token': access_token,
@@ -256,6 +335,9 @@ def register():
             'message': 'Usuário cadastrado com sucesso'
         }), 201
         
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return server_busy_response()
     except Exception as e:
         logger.error(f"Erro no cadastro: {str(e)}")
         db.session.rollback()
@@ -281,6 +363,7 @@ def get_profile():
 # ROTAS DE UNIDADES
 @app.route('/api/unidades', methods=['GET'])
 @jwt_required()
+@conditional(cache, ['unidades', 'usuarios'], scope=get_jwt_identity)
 def get_unidades():
     """Listar unidades"""
     try:
@@ -290,33 +373,168 @@ def get_unidades():
         if not user:
             return jsonify({'message': 'Usuário não encontrado'}), 404
         
-        # Filtrar unidades baseado no role do usuário
-        unidades = user.get_accessible_unidades()
+        # Filtrar unidades baseado no role do usuário, em ordem de nome
+        # (coluna única e indexada, usada como chave do cursor)
+        page = page_request()
+        escopo = 'todas' if user.role in ['admin', 'gestor'] else user.unidade_id
+        query = user.accessible_unidades_query()
+        pagina = paginate_query(
+            query, [Unidade.nome], page,
+            count=lambda: cache.get_or_set('unidades', f'count:{escopo}', query.count)
+        )
         
-        return jsonify({
-            'unidades': [unidade.to_dict() for unidade in unidades]
-        }), 200
+        resposta = {'unidades': [unidade.to_dict() for unidade in pagina.items]}
+        if page.active:
+            resposta['paginacao'] = pagina.metadata()
+        return set_page_headers(jsonify(resposta), pagina), 200
         
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao listar unidades: {str(e)}")
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
 # ROTAS DE INDICADORES
+def indicadores_ativos():
+    """Indicadores ativos (to_dict), ordenados por id, em cache"""
+    return cache.get_or_set(
+        'indicadores', 'ativos',
+        lambda: [
+            indicador.to_dict()
+            for indicador in Indicador.query.filter_by(ativo=True).order_by(Indicador.id).all()
+        ]
+    )
+
+# Acumulados de 12 meses e do ano (rolling.py), atualizados nas escritas
+rolling_lancamentos = RollingStore(cache, 'lancamentos', lambda: sql_rows(db, Lancamento))
+
 @app.route('/api/indicadores', methods=['GET'])
 @jwt_required()
+@conditional(cache, ['indicadores'])
 def get_indicadores():
     """Listar indicadores"""
     try:
-        indicadores = Indicador.query.filter_by(ativo=True).all()
+        # Lista em cache ordenada por id; as páginas são fatias dela
+        indicadores = indicadores_ativos()
         
-        return jsonify({
-            'indicadores': [indicador.to_dict() for indicador in indicadores]
-        }), 200
+        page = page_request()
+        pagina = paginate_sequence(indicadores, lambda indicador: (indicador['id'],), page)
+        
+        resposta = {'indicadores': pagina.items}
+        if page.active:
+            resposta['paginacao'] = pagina.metadata()
+        return set_page_headers(jsonify(resposta), pagina), 200
         
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao listar indicadores: {str(e)}")
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
+@app.route('/api/indicadores/acumulados', methods=['GET'])
+@jwt_required()
+def get_acumulados():
+    """Mês, últimos 12 meses e acumulado no ano (parâmetros em rolling.py)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = Usuario.query.get(current_user_id)
+        
+        if not user:
+            return jsonify({'message': 'Usuário não encontrado'}), 404
+        
+        try:
+            periodo = periodo_param()
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        # Sem unidade, a soma de todas; operadores veem só a própria
+        unidade_id = request.args.get('unidade_id', type=int)
+        if user.role == 'operador':
+            unidade_id = user.unidade_id
+        elif unidade_id and not user.can_access_unidade(unidade_id):
+            return jsonify({'message': 'Acesso negado à unidade'}), 403
+        
+        resposta = sql_acumulados_response(rolling_lancamentos.get(), indicadores_ativos(), unidade_id, periodo)
+        return jsonify(resposta), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao buscar acumulados: {str(e)}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@app.route('/api/indicadores/ranking', methods=['GET'])
+@jwt_required()
+def get_ranking():
+    """Ranking das unidades em cada indicador num mês (ranking.py)
+    
+    Os indicadores não dizem se maior é melhor: ordem=desc (padrão) ou asc.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        user = Usuario.query.get(current_user_id)
+        
+        if not user:
+            return jsonify({'message': 'Usuário não encontrado'}), 404
+        
+        try:
+            periodo = periodo_param()
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        ordem = request.args.get('ordem', 'desc')
+        if ordem not in ('asc', 'desc'):
+            return jsonify({'message': 'Parâmetro ordem deve ser asc ou desc'}), 400
+        rank_key = operator.neg if ordem == 'desc' else float
+        
+        # Em cache por mês até a próxima escrita em lançamentos ou indicadores
+        versao = cache.version('indicadores')
+        ranking = cache.get_or_set(
+            'lancamentos', f'ranking:{periodo}:{ordem}:{versao}',
+            lambda: sql_ranking(db, Lancamento, indicadores_ativos(), periodo, rank_key)
+        )
+        
+        if user.role == 'operador':
+            ranking = for_unit(ranking, user.unidade_id)
+        return jsonify(ranking), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao calcular ranking: {str(e)}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@app.route('/api/indicadores/<int:indicador_id>/serie', methods=['GET'])
+@jwt_required()
+def get_serie_indicador(indicador_id):
+    """Série mensal de um indicador (parâmetros em series.py)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = Usuario.query.get(current_user_id)
+        
+        if not user:
+            return jsonify({'message': 'Usuário não encontrado'}), 404
+        
+        indicador = Indicador.query.get(indicador_id)
+        if not indicador:
+            return jsonify({'message': 'Indicador não encontrado'}), 404
+        
+        try:
+            if user.role == 'operador':
+                pedido = serie_request(default_unidades=(str(user.unidade_id),), parse_unidade=int)
+            else:
+                pedido = serie_request(parse_unidade=int)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        # A Média Geral envolve todas as unidades
+        if (pedido.geral and user.role == 'operador') or \
+                any(not user.can_access_unidade(unidade_id) for unidade_id in pedido.unidades):
+            return jsonify({'message': 'Acesso negado à unidade'}), 403
+        
+        series = sql_series(db, Lancamento, indicador_id, pedido)
+        return jsonify(sql_serie_response(indicador, pedido, series)), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao buscar série do indicador: {str(e)}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
 # ROTAS DE LANÇAMENTOS
 @app.route('/api/lancamentos', methods=['GET'])
 @jwt_required()
@@ -346,20 +564,30 @@ def get_lancamentos():
         
         # Filtrar por unidade baseado no role do usuário
         if user.role == 'operador':
-            query = query.filter(Lancamento.unidade_id == user.unidade_id)
+            unidade_id = user.unidade_id
         elif unidade_id:
             # Verificar se o usuário pode acessar a unidade
             if not user.can_access_unidade(unidade_id):
                 return jsonify({'message': 'Acesso negado à unidade'}), 403
+        
+        if unidade_id:
             query = query.filter(Lancamento.unidade_id == unidade_id)
         
-        # Executar query
-        lancamentos = query.all()
+        # Página ordenada por (ano, mes, id): coberta por idx_lancamentos_periodo.
+        # O total vem do cache e só é recontado depois de uma escrita
+        page = page_request()
+        pagina = paginate_query(
+            query, [Lancamento.ano, Lancamento.mes, Lancamento.id], page,
+            count=lambda: cache.get_or_set('lancamentos', f'count:{ano}:{mes}:{unidade_id}', query.count)
+        )
         
-        return jsonify({
-            'lancamentos': [lancamento.to_dict() for lancamento in lancamentos]
-        }), 200
+        resposta = {'lancamentos': [lancamento.to_dict() for lancamento in pagina.items]}
+        if page.active:
+            resposta['paginacao'] = pagina.metadata()
+        return set_page_headers(jsonify(resposta), pagina), 200
         
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao listar lançamentos: {str(e)}")
         return jsonify({'message': 'Erro interno do servidor'}), 500
@@ -419,8 +647,14 @@ def create_lancamento():
             observacoes=data.get('observacoes')
         )
         
+        marca = rolling_lancamentos.begin_write()
         db.session.add(lancamento)
         db.session.commit()
+        rolling_lancamentos.apply(marca, [(
+            lancamento.indicador_id, lancamento.unidade_id,
+            to_periodo(lancamento.ano, lancamento.mes), float(lancamento.valor), 1
+        )])
+        changelog.record('lancamentos', 'criado', lancamento.to_dict(), unidade=lancamento.unidade_id)
         
         return jsonify({
             'lancamento': lancamento.to_dict(),
@@ -432,16 +666,140 @@ def create_lancamento():
         db.session.rollback()
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
-# ROTA DE HEALTH CHECK
+@app.route('/api/changes', methods=['GET'])
+@jwt_required()
+def get_changes():
+    """Alterações desde o cursor `since` (ver changes.py)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = Usuario.query.get(current_user_id)
+        
+        if not user:
+            return jsonify({'message': 'Usuário não encontrado'}), 404
+        
+        since, limit = changes_request()
+        visible = visibility(
+            user.unidade_id,
+            todas_unidades=user.role in ['admin', 'gestor'],
+            admin=user.role == 'admin',
+            restritas=('usuarios',)
+        )
+        return jsonify(changelog.since(since, limit, visible)), 200
+        
+    except ChangeFeedError as e:
+        return jsonify({'message': str(e)}), 400
+    except ChangeFeedUnavailable as e:
+        return jsonify({'message': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Erro ao buscar alterações: {str(e)}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@app.route('/api/stream/token', methods=['POST'])
+@jwt_required()
+def get_stream_token():
+    """Token curto para conectar ao stream SSE (ver stream.py)"""
+    if stream_hub.unavailable:
+        return jsonify({'message': stream_hub.unavailable}), 503
+    
+    try:
+        user = Usuario.query.get(get_jwt_identity())
+        if not user or not user.ativo:
+            return jsonify({'message': 'Usuário inválido ou inativo'}), 401
+        
+        claims, expires = stream_token_claims()
+        token = create_access_token(identity=str(user.id), additional_claims=claims, expires_delta=expires)
+        return jsonify({'token': token, 'expira_em': int(expires.total_seconds())}), 200
+    
+    except Exception as e:
+        logger.error(f"Erro ao gerar token do stream: {str(e)}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@app.route('/api/stream', methods=['GET'])
+def get_stream():
+    """Alterações em tempo real por Server-Sent Events (ver stream.py)"""
+    try:
+        return stream_response(stream_hub)
+    except StreamError as e:
+        return jsonify({'message': str(e)}), 400
+    except StreamUnauthorized as e:
+        return jsonify({'message': str(e)}), 401
+    except StreamUnavailable as e:
+        return jsonify({'message': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Erro ao abrir o stream: {str(e)}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+def _stream_user(token, params, query):
+    """Usuário do stream SSE pelo token (ver stream.py)"""
+    try:
+        claims = decode_token(token)
+    except Exception:
+        return None
+    if query and not is_stream_token(claims):
+        return None
+    user_id = claims[app.config['JWT_IDENTITY_CLAIM']]
+    user = Usuario.query.get(user_id)
+    if not user or not user.ativo:
+        return None
+    
+    visible = visibility(
+        user.unidade_id,
+        todas_unidades=user.role in ['admin', 'gestor'],
+        admin=user.role == 'admin',
+        restritas=('usuarios',)
+    )
+    unidade = params.get('unidade_id')
+    unidade = int(unidade) if unidade and unidade.isdigit() else None
+    if user.role not in ['admin', 'gestor']:
+        unidade = user.unidade_id
+    return visible, unidade
+
+def _stream_agregados(entry):
+    """Acumulados do indicador lançado, se já estão em memória"""
+    periodo = entry_periodo(entry)
+    if entry['entidade'] != 'lancamentos' or periodo is None:
+        return
+    acumulados = rolling_lancamentos.current()
+    if acumulados is not None:
+        dados = entry['dados']
+        entry['agregados'] = changed_windows(acumulados, dados['indicador_id'], dados['unidade_id'], periodo)
+
+# Push das alterações por SSE (/api/stream); nada é aberto antes da primeira conexão
+stream_hub = create_stream_hub(changelog, _stream_user, app.json.dumps, enrich=_stream_agregados, cache=cache)
+
+# ROTAS DE HEALTH CHECK
+def ping_database():
+    """Ida e volta mínima ao banco"""
+    with db.engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+
+database_probe = DependencyProbe('database', ping_database)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.utcnow().isoformat(),
-        'database': 'connected'
+        'database': 'connected' if database_probe.result()['ok'] else 'disconnected'
     }), 200
 
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness: o processo está respondendo"""
+    return jsonify(liveness()), 200
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: banco respondendo e pool de conexões com folga"""
+    body, status = readiness(
+        [database_probe],
+        pools={'database': sqlalchemy_pool_stats(db.engine)},
+        cache=cache,
+        extras={'password_hashing': password_hasher.stats()}
+    )
+    return jsonify(body), status
+
 if __name__ == '__main__':
     with app.app_context():
         # Verificar se tabelas existem, se não, criar
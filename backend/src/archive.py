@@ -0,0 +1,315 @@
+"""
+Arquivo dos anos fechados da aba Lancamentos
+
+Um ano fechado não muda mais, mas continuava na aba Lancamentos, lida
+inteira a cada recarga. O job de arquivamento (python archive.py) grava
+cada ano fechado num arquivo imutável em ARCHIVE_DIR e, com --remover,
+tira as linhas desse ano da planilha.
+
+Formato de lancamentos_AAAA.arq (imutável, somente leitura no disco):
+
+- MAGIC, seguido de um bloco zlib com:
+- 4 bytes (big-endian) com o tamanho do cabeçalho JSON
+- cabeçalho: ano, linhas, o dicionário de valores de cada coluna e os
+  agregados pré-calculados (somas de numerador e denominador por
+  indicador, unidade e mês)
+- os códigos de cada coluna (array 'I', little-endian), na ordem das
+  colunas do cabeçalho
+
+As colunas são codificadas por dicionário, como no armazenamento colunar
+(columnar.py): unidades, indicadores, meses e e-mails se repetem muito e o
+arquivo fica pequeno. Os valores voltam exatamente como vieram da planilha
+(textos e números).
+
+A leitura é transparente (ArchiveStore): um ano arquivado é servido do
+arquivo, e os demais da planilha, que fica só com o ano corrente. O
+armazenamento colunar usa os agregados do arquivo em vez das linhas.
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import struct
+import logging
+import threading
+from array import array
+from datetime import datetime
+
+from columnar import to_number
+from records import Lancamento
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'GIARQ\x01\n'
+FILE_PATTERN = re.compile(r'^lancamentos_(\d{4})\.arq$')
+
+_ATTRS = [attr for _, attr in Lancamento.COLUMNS]
+
+def archive_dir():
+    return os.environ.get('ARCHIVE_DIR', os.path.join(os.getcwd(), 'arquivo'))
+
+def archive_path(directory, ano):
+    return os.path.join(directory, f'lancamentos_{ano}.arq')
+
+def _codes_bytes(codes):
+    if sys.byteorder != 'little':
+        codes.byteswap()
+    return codes.tobytes()
+
+def _aggregates(records):
+    somas = {}
+    for record in records:
+        key = (record.indicador_nome, record.id_unidade, record.mes)
+        soma = somas.get(key)
+        if soma is None:
+            soma = somas[key] = [0.0, 0.0]
+        soma[0] += to_number(record.valor_numerador)
+        soma[1] += to_number(record.valor_denominador)
+    return [[ind, uni, mes, num, den] for (ind, uni, mes), (num, den) in somas.items()]
+
+def encode_year(ano, records):
+    """Conteúdo do arquivo de um ano (bytes)"""
+    colunas = []
+    blocos = []
+    for attr in _ATTRS:
+        valores = {}
+        codes = array('I', (valores.setdefault(getattr(record, attr), len(valores)) for record in records))
+        colunas.append({'atributo': attr, 'valores': list(valores)})
+        blocos.append(_codes_bytes(codes))
+
+    header = json.dumps({
+        'ano': ano,
+        'linhas': len(records),
+        'colunas': colunas,
+        'agregados': _aggregates(records),
+        'criado_em': datetime.now().isoformat()
+    }, ensure_ascii=False).encode('utf-8')
+
+    payload = struct.pack('>I', len(header)) + header + b''.join(blocos)
+    return MAGIC + zlib.compress(payload, 9)
+
+def write_year(directory, ano, records, force=False):
+    """Grava o arquivo de um ano de forma atômica; devolve o caminho
+
+    Um arquivo existente só é substituído com force=True.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = archive_path(directory, ano)
+    if os.path.exists(path) and not force:
+        raise FileExistsError(f'Ano {ano} já arquivado em {path}')
+
+    temp = f'{path}.{os.getpid()}.tmp'
+    with open(temp, 'wb') as f:
+        f.write(encode_year(ano, records))
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(temp, 0o444)
+    os.replace(temp, path)
+    return path
+
+class ArchivedYear:
+    """Um ano arquivado, decodificado"""
+
+    __slots__ = ('ano', 'records', 'aggregates')
+
+    def __init__(self, ano, records, aggregates):
+        self.ano = ano
+        self.records = records
+        self.aggregates = aggregates
+
+    @classmethod
+    def decode(cls, data):
+        if not data.startswith(MAGIC):
+            raise ValueError('Arquivo de lançamentos inválido')
+        payload = zlib.decompress(data[len(MAGIC):])
+        (size,) = struct.unpack('>I', payload[:4])
+        header = json.loads(payload[4:4 + size].decode('utf-8'))
+
+        linhas = header['linhas']
+        offset = 4 + size
+        colunas = []
+        for coluna in header['colunas']:
+            codes = array('I')
+            end = offset + linhas * codes.itemsize
+            codes.frombytes(payload[offset:end])
+            if sys.byteorder != 'little':
+                codes.byteswap()
+            offset = end
+            valores = coluna['valores']
+            colunas.append([valores[code] for code in codes])
+
+        if [coluna['atributo'] for coluna in header['colunas']] != _ATTRS:
+            raise ValueError('Colunas do arquivo não correspondem a Lancamento')
+
+        new = Lancamento.__new__
+        records = []
+        for state in zip(*colunas):
+            record = new(Lancamento)
+            record.__setstate__(state)
+            records.append(record)
+
+        return cls(header['ano'], tuple(records), header['agregados'])
+
+    def aggregate_records(self):
+        """Agregados como registros Lancamento (uma linha por indicador, unidade e mês)"""
+        records = []
+        for indicador, unidade, mes, num, den in self.aggregates:
+            record = Lancamento.__new__(Lancamento)
+            record.__setstate__(('', '', unidade, indicador, mes, self.ano, num, den))
+            records.append(record)
+        return records
+
+class ArchiveStore:
+    """Anos arquivados em ARCHIVE_DIR, carregados sob demanda
+
+    A lista de anos é relida quando o diretório muda (mtime), de modo que
+    um job de arquivamento rodando à parte é percebido sem reiniciar.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or archive_dir()
+        self._dir_mtime = None
+        self._files = {}
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._dir_mtime:
+            return self._files
+
+        files = {}
+        if mtime is not None:
+            for entry in os.scandir(self.directory):
+                match = FILE_PATTERN.match(entry.name)
+                if match:
+                    stat = entry.stat()
+                    files[int(match.group(1))] = (entry.path, stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            self._files = files
+            self._dir_mtime = mtime
+            self._loaded = {ano: year for ano, year in self._loaded.items() if ano in files}
+        return files
+
+    def years(self):
+        return sorted(self._scan())
+
+    def signature(self):
+        """Identifica o conjunto de arquivos (para chaves de cache)"""
+        files = self._scan()
+        if not files:
+            return '0'
+        return format(zlib.crc32(repr(sorted(files.items())).encode('utf-8')), 'x')
+
+    def get(self, ano):
+        """ArchivedYear do ano, ou None se não arquivado"""
+        files = self._scan()
+        info = files.get(ano)
+        if info is None:
+            return None
+
+        with self._lock:
+            year = self._loaded.get(ano)
+            if year is not None and year[0] == info:
+                return year[1]
+
+        with open(info[0], 'rb') as f:
+            archived = ArchivedYear.decode(f.read())
+        with self._lock:
+            self._loaded[ano] = (info, archived)
+        logger.info(f"Ano {ano} carregado do arquivo ({len(archived.records)} lançamentos)")
+        return archived
+
+def archive_sheet(manager, ate_ano, directory, remover=False, force=False):
+    """Arquiva os anos até ate_ano da aba Lancamentos; devolve os anos arquivados
+
+    manager: GoogleSheetsManager (sheets.py). Cada arquivo é relido e
+    conferido linha a linha com a planilha antes de qualquer remoção.
+    """
+    from metrics import track_sheets
+
+    worksheet = manager.get_worksheet('Lancamentos')
+    if worksheet is None:
+        raise SystemExit('Aba Lancamentos não encontrada')
+
+    with track_sheets('get_all_values', 'Lancamentos'):
+        rows = worksheet.get_all_values()
+    records = Lancamento.decode(rows)
+
+    por_ano = {}
+    for posicao, record in enumerate(records):
+        if type(record.ano) is int and record.ano <= ate_ano:
+            por_ano.setdefault(record.ano, []).append(posicao)
+
+    arquivados = []
+    for ano, posicoes in sorted(por_ano.items()):
+        linhas = [records[posicao] for posicao in posicoes]
+        path = archive_path(directory, ano)
+        if os.path.exists(path) and not force:
+            # Ano já arquivado: só segue para a remoção se o arquivo confere
+            with open(path, 'rb') as f:
+                existente = ArchivedYear.decode(f.read())
+            if [r.values() for r in existente.records] != [r.values() for r in linhas]:
+                print(f"Ano {ano}: a planilha difere do arquivo existente; use --force para regravar")
+                continue
+        else:
+            write_year(directory, ano, linhas, force=force)
+
+        # Confere o arquivo gravado antes de qualquer remoção
+        with open(path, 'rb') as f:
+            conferido = ArchivedYear.decode(f.read())
+        if [r.values() for r in conferido.records] != [r.values() for r in linhas]:
+            raise SystemExit(f'Arquivo de {ano} não confere com a planilha')
+
+        arquivados.append(ano)
+        print(f"Ano {ano}: {len(linhas)} lançamentos em {path} ({os.path.getsize(path)} bytes)")
+
+    if remover and arquivados:
+        # Linhas na aba: cabeçalho na 1, registros a partir da 2. Remove as
+        # faixas contíguas de baixo para cima, para não deslocar as demais
+        linhas_aba = sorted(posicao + 2 for ano in arquivados for posicao in por_ano[ano])
+        faixas = []
+        for linha in linhas_aba:
+            if faixas and faixas[-1][1] == linha - 1:
+                faixas[-1][1] = linha
+            else:
+                faixas.append([linha, linha])
+        try:
+            for inicio, fim in reversed(faixas):
+                with track_sheets('delete_rows', 'Lancamentos'):
+                    worksheet.delete_rows(inicio, fim)
+        finally:
+            manager.invalidate('Lancamentos')
+        print(f"{len(linhas_aba)} linhas removidas da planilha")
+    elif arquivados:
+        manager.invalidate('Lancamentos')
+    return arquivados
+
+def main():
+    """Job de arquivamento dos anos fechados da aba Lancamentos"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Arquiva os anos fechados da aba Lancamentos')
+    parser.add_argument('--ate-ano', type=int, default=datetime.now().year - 1,
+                        help='Último ano a arquivar (padrão: o ano anterior)')
+    parser.add_argument('--remover', action='store_true',
+                        help='Remove da planilha as linhas dos anos arquivados')
+    parser.add_argument('--force', action='store_true', help='Regrava arquivos já existentes')
+    args = parser.parse_args()
+
+    # Só a planilha e o cache (para invalidar a aba nos workers pelo
+    # Redis), sem importar a aplicação web
+    from cache import create_cache
+    from sheets import GoogleSheetsManager
+
+    manager = GoogleSheetsManager(create_cache())
+    archive_sheet(manager, args.ate_ano, archive_dir(), remover=args.remover, force=args.force)
+
+if __name__ == '__main__':
+    main()
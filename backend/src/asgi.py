@@ -0,0 +1,93 @@
+"""
+Modo de serviço ASGI para muitas requisições simultâneas por processo
+
+No modo síncrono (gunicorn/Flask), cada requisição ocupa uma thread do
+começo ao fim, inclusive enquanto espera o Google Sheets: o número de
+requisições em andamento fica limitado ao número de threads. No modo ASGI
+as conexões ficam num event loop (uvicorn) e as views do Flask, que
+continuam síncronas, rodam num pool de ASGI_THREADS threads:
+
+1. o hook `prefetch` (no app.py, sheets_async.py) carrega de forma
+   assíncrona as abas que a rota vai ler e que não estão no cache; a
+   espera pela API não ocupa thread;
+2. a view roda no pool e encontra os dados no cache;
+3. a resposta é enviada pelo event loop.
+
+Assim um processo mantém centenas de requisições em andamento com poucas
+threads. A ponte entre ASGI e WSGI é o a2wsgi: o corpo da requisição é
+lido sob demanda pela view e a resposta é enviada ao cliente pedaço a
+pedaço, à medida que a view a produz (inclusive a compressão em streaming
+do compression.py), sem ser montada inteira na memória.
+
+Só o app.py (Google Sheets) é servido assim: nos apps SQL a view segura
+uma conexão do pool do banco do começo ao fim, e o número de requisições
+em andamento continua limitado pelo pool; neles, use o gunicorn.
+
+Uso:
+    uvicorn app:asgi_app --host 0.0.0.0 --port 5000
+"""
+
+import os
+import logging
+
+from a2wsgi import WSGIMiddleware
+
+logger = logging.getLogger(__name__)
+
+class ASGIBridge:
+    """Aplicação ASGI que executa uma aplicação WSGI num pool de threads
+
+    prefetch: corrotina opcional chamada com o scope antes da view (erros
+    são registrados e ignorados); se tiver aclose(), é chamada no desligamento.
+    """
+
+    def __init__(self, wsgi_app, threads=32, prefetch=None):
+        self.threads = threads
+        self.prefetch = prefetch
+        self.wsgi = WSGIMiddleware(wsgi_app, workers=threads)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                logger.info(f"Modo ASGI com {self.threads} threads para as views")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                aclose = getattr(self.prefetch, 'aclose', None)
+                if aclose is not None:
+                    await aclose()
+                self.wsgi.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        if self.prefetch is not None:
+            try:
+                await self.prefetch(scope)
+            except Exception as e:
+                logger.warning(f"Pré-carga de {scope['path']} falhou: {str(e)}")
+        await self.wsgi(join_cookies(scope), receive, send)
+
+def join_cookies(scope):
+    """Scope com um único cabeçalho Cookie
+
+    Clientes HTTP/2 mandam os cookies em vários cabeçalhos, que devem ser
+    unidos com '; ' (o a2wsgi uniria com ',', como os demais cabeçalhos).
+    """
+    cookies = [value for name, value in scope['headers'] if name == b'cookie']
+    if len(cookies) < 2:
+        return scope
+    headers = [(name, value) for name, value in scope['headers'] if name != b'cookie']
+    headers.append((b'cookie', b'; '.join(cookies)))
+    return {**scope, 'headers': headers}
+
+def create_asgi_app(wsgi_app, prefetch=None):
+    """ASGIBridge da aplicação Flask, com ASGI_THREADS threads para as views"""
+    threads = int(os.environ.get('ASGI_THREADS', 32))
+    return ASGIBridge(wsgi_app, threads=threads, prefetch=prefetch)
@@ -0,0 +1,505 @@
+"""
+Camada de cache da aplicação
+
+Cache em dois níveis: um LRU em memória por processo (L1) na frente de um
+Redis compartilhado (L2). As escritas invalidam o namespace afetado e
+publicam a invalidação via pub/sub, para que todos os workers do gunicorn
+descartem suas cópias locais e compartilhem um único cache aquecido.
+
+Cada entrada, no L1 e no Redis, guarda a versão do namespace com que foi
+carregada. O processo lembra a maior versão que já viu de cada namespace
+(leituras de version(), as próprias invalidações e as mensagens do
+pub/sub) e trata como ausente uma entrada mais antiga que ela. Assim, no
+intervalo entre o INCR da versão no Redis e a chegada da mensagem de
+invalidação, um carregamento feito já na versão nova não lê uma entrada
+velha do L1 e a regrava com a versão nova.
+
+Os valores do Redis são pickles (registros, colunas e catálogos não são
+JSON) assinados com HMAC-SHA256. A chave vem de CACHE_SIGNING_KEY ou, na
+falta dela, de SECRET_KEY; um valor com assinatura inválida é descartado
+sem ser desserializado, de modo que quem só consegue escrever no Redis não
+executa código nos workers. Sem chave, o Redis serve apenas às versões e
+às invalidações, e os valores ficam só no L1.
+"""
+
+import os
+import hmac
+import json
+import uuid
+import pickle
+import hashlib
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+try:
+    from redis.exceptions import WatchError
+except ImportError:
+    class WatchError(Exception):
+        """Substituto quando o pacote redis não está instalado (sem L2)"""
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'gi:cache:invalidate'
+
+_MISSING = object()
+
+class LRUCache:
+    """Cache LRU em memória com expiração por entrada"""
+
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        """Remove todas as chaves (tuplas) cujo primeiro elemento é o prefixo"""
+        with self._lock:
+            for key in [k for k in self._data if k[0] == prefix]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class TwoLevelCache:
+    """Cache L1 (LRU local) + L2 (Redis) com invalidação por pub/sub
+
+    Os valores são agrupados em namespaces (ex.: nome da aba da planilha ou
+    da tabela SQL). Invalidar um namespace remove as chaves no Redis,
+    incrementa o contador de versão do namespace e avisa os demais
+    processos pelo canal de invalidação.
+
+    signing_key: chave do HMAC dos valores no Redis; sem ela, os valores
+    não são gravados nem lidos do Redis.
+    """
+
+    def __init__(self, redis_client=None, maxsize=256, ttl=300, prefix='gi:', signing_key=None):
+        self.l1 = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+        if isinstance(signing_key, str):
+            signing_key = signing_key.encode('utf-8')
+        self._signing_key = signing_key or None
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_rejected = 0
+        self._versions = {}
+        self._seen = {}
+        self._seen_lock = threading.Lock()
+        self._modified = {}
+        self._epoch = uuid.uuid4().hex
+        self.created_at = time.time()
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+        self._key_locks = {}
+        self._key_locks_lock = threading.Lock()
+
+    # Chaves no Redis
+    def _data_key(self, namespace, key):
+        return f'{self.prefix}data:{namespace}:{key}'
+
+    def _keys_key(self, namespace):
+        return f'{self.prefix}keys:{namespace}'
+
+    def _version_key(self, namespace):
+        return f'{self.prefix}version:{namespace}'
+
+    def _modified_key(self, namespace):
+        return f'{self.prefix}modified:{namespace}'
+
+    def _epoch_key(self):
+        return f'{self.prefix}epoch'
+
+    def _observe(self, namespace, version):
+        """Registra uma versão vista do namespace (guarda a maior)"""
+        with self._seen_lock:
+            if version > self._seen.get(namespace, 0):
+                self._seen[namespace] = version
+
+    def _floor(self, namespace):
+        """Versão mínima de uma entrada válida do namespace"""
+        return self._seen.get(namespace, 0)
+
+    # Valores no Redis: HMAC-SHA256 (32 bytes) seguido do pickle de (versão, valor)
+    def _encode(self, version, value):
+        body = pickle.dumps((version, value), pickle.HIGHEST_PROTOCOL)
+        return hmac.new(self._signing_key, body, hashlib.sha256).digest() + body
+
+    def _decode(self, raw):
+        mac, body = raw[:32], raw[32:]
+        if not hmac.compare_digest(mac, hmac.new(self._signing_key, body, hashlib.sha256).digest()):
+            self.l2_rejected += 1
+            logger.warning("Valor do cache Redis com assinatura inválida descartado")
+            return None
+        return pickle.loads(body)
+
+    def get(self, namespace, key, default=None):
+        """Busca um valor no L1 e, se ausente, no Redis
+
+        Entradas de uma versão anterior à maior já vista contam como ausentes.
+        """
+        if self.redis is not None:
+            # Antes do L1: um worker com o L1 preenchido antes do fork (ou
+            # só com set()) também precisa receber as invalidações
+            self._ensure_listener()
+
+        entry = self.l1.get((namespace, key), _MISSING)
+        if entry is not _MISSING:
+            value, version = entry
+            if version >= self._floor(namespace):
+                return value
+            self.l1.delete((namespace, key))
+
+        if self.redis is None or self._signing_key is None:
+            return default
+
+        try:
+            raw = self.redis.get(self._data_key(namespace, key))
+        except Exception as e:
+            logger.warning(f"Falha ao ler cache Redis: {str(e)}")
+            return default
+
+        entry = self._decode(raw) if raw is not None else None
+        if entry is None or entry[0] < self._floor(namespace):
+            self.l2_misses += 1
+            return default
+
+        self.l2_hits += 1
+        version, value = entry
+        self._observe(namespace, version)
+        self.l1.set((namespace, key), (value, version))
+        return value
+
+    def set(self, namespace, key, value, ttl=None, version=None):
+        """Grava o valor nos dois níveis
+
+        version: versão do namespace lida antes de carregar o valor. Se uma
+        invalidação aconteceu no meio do carregamento, o valor é de antes da
+        escrita e não é gravado. Devolve se o valor foi gravado.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if self.redis is not None:
+            self._ensure_listener()
+
+        # Carregado numa versão já superada: não grava
+        if version is not None and version < self._floor(namespace):
+            return False
+        tag = self._floor(namespace) if version is None else version
+
+        # O L1 é gravado antes da conferência: uma invalidação que chegue
+        # depois dela apaga a entrada pelo listener (ou pelo próprio invalidate)
+        self.l1.set((namespace, key), (value, tag), ttl)
+
+        if self.redis is None:
+            if version is not None and self._versions.get(namespace, 0) != version:
+                self.l1.delete((namespace, key))
+                return False
+            return True
+
+        if self._signing_key is None:
+            # Sem L2: só confere a versão
+            if version is not None and self.version(namespace) != version:
+                self.l1.delete((namespace, key))
+                return False
+            return True
+
+        payload = self._encode(tag, value)
+        try:
+            with self.redis.pipeline() as pipe:
+                if version is not None:
+                    # WATCH: um INCR da versão entre a leitura e o EXEC aborta a gravação
+                    pipe.watch(self._version_key(namespace))
+                    if int(pipe.get(self._version_key(namespace)) or 0) != version:
+                        self.l1.delete((namespace, key))
+                        return False
+                    pipe.multi()
+                pipe.set(self._data_key(namespace, key), payload, ex=ttl or None)
+                pipe.sadd(self._keys_key(namespace), key)
+                pipe.execute()
+            return True
+        except WatchError:
+            self.l1.delete((namespace, key))
+            return False
+        except Exception as e:
+            logger.warning(f"Falha ao gravar cache Redis: {str(e)}")
+            return True
+
+    def get_or_set(self, namespace, key, loader, ttl=None):
+        """Retorna o valor em cache ou o calcula com `loader` e armazena
+
+        Threads do mesmo processo que pedem a mesma chave esperam por um só
+        carregamento.
+        """
+        value = self.get(namespace, key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self.key_lock(namespace, key):
+            value = self.get(namespace, key, _MISSING)
+            if value is _MISSING:
+                version = self.version(namespace)
+                value = loader()
+                self.set(namespace, key, value, ttl, version=version)
+        return value
+
+    def key_lock(self, namespace, key):
+        """Lock do carregamento de uma chave neste processo"""
+        with self._key_locks_lock:
+            lock = self._key_locks.get((namespace, key))
+            if lock is None:
+                lock = self._key_locks[(namespace, key)] = threading.Lock()
+            return lock
+
+    def invalidate(self, namespace):
+        """Invalida um namespace em todos os processos
+
+        A versão sobe antes de as chaves serem apagadas: uma gravação
+        condicionada à versão anterior que termine no meio é recusada ou
+        tem a chave apagada em seguida.
+        """
+        now = time.time()
+        self._versions[namespace] = self._versions.get(namespace, 0) + 1
+        self._modified[namespace] = now
+        self.l1.delete_prefix(namespace)
+
+        if self.redis is None:
+            self._observe(namespace, self._versions[namespace])
+            return
+
+        try:
+            pipe = self.redis.pipeline()
+            pipe.incr(self._version_key(namespace))
+            pipe.set(self._modified_key(namespace), now)
+            pipe.smembers(self._keys_key(namespace))
+            version, _, keys = pipe.execute()
+            self._observe(namespace, int(version))
+
+            pipe = self.redis.pipeline()
+            for key in keys:
+                if isinstance(key, bytes):
+                    key = key.decode('utf-8')
+                pipe.delete(self._data_key(namespace, key))
+            pipe.delete(self._keys_key(namespace))
+            pipe.publish(INVALIDATION_CHANNEL, json.dumps([namespace, int(version)]))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Falha ao invalidar cache Redis '{namespace}': {str(e)}")
+
+    def version(self, namespace):
+        """Versão atual do namespace (incrementada a cada invalidação)"""
+        if self.redis is None:
+            return self._versions.get(namespace, 0)
+
+        try:
+            version = int(self.redis.get(self._version_key(namespace)) or 0)
+        except Exception as e:
+            logger.warning(f"Falha ao ler versão do cache '{namespace}': {str(e)}")
+            return self._versions.get(namespace, 0)
+        self._observe(namespace, version)
+        return version
+
+    def versions(self, namespaces):
+        """Época do cache e (versão, última alteração) de cada namespace
+
+        A época identifica a "vida" dos contadores: muda quando o processo
+        reinicia (sem Redis) ou quando o Redis perde as chaves, para que uma
+        versão zerada não seja confundida com a de antes. A última alteração
+        é um timestamp epoch; sem invalidações, vale a criação do cache.
+        Com Redis, tudo é lido em um único MGET.
+        """
+        local = [
+            (self._versions.get(ns, 0), self._modified.get(ns, self.created_at))
+            for ns in namespaces
+        ]
+        if self.redis is None:
+            return self._epoch, local
+
+        try:
+            keys = [self._epoch_key()]
+            for ns in namespaces:
+                keys.append(self._version_key(ns))
+                keys.append(self._modified_key(ns))
+            values = self.redis.mget(keys)
+
+            epoch = values[0]
+            if epoch is None:
+                self.redis.set(self._epoch_key(), self._epoch, nx=True)
+                epoch = self.redis.get(self._epoch_key())
+            if isinstance(epoch, bytes):
+                epoch = epoch.decode('utf-8')
+
+            result = []
+            for i, namespace in enumerate(namespaces):
+                version, modified = int(values[1 + 2 * i] or 0), values[2 + 2 * i]
+                self._observe(namespace, version)
+                result.append((version, float(modified) if modified else self.created_at))
+            return epoch, result
+        except Exception as e:
+            logger.warning(f"Falha ao ler versões do cache: {str(e)}")
+            return self._epoch, local
+
+    def stats(self):
+        """Estatísticas de acerto por nível"""
+        l1_total = self.l1.hits + self.l1.misses
+        l2_total = self.l2_hits + self.l2_misses
+        return {
+            'backend': 'redis' if self.redis is not None else 'memory',
+            'l1_entries': len(self.l1),
+            'l1_hits': self.l1.hits,
+            'l1_misses': self.l1.misses,
+            'l1_hit_ratio': self.l1.hits / l1_total if l1_total else 0.0,
+            'l2_hits': self.l2_hits,
+            'l2_misses': self.l2_misses,
+            'l2_hit_ratio': self.l2_hits / l2_total if l2_total else 0.0,
+            'l2_rejected': self.l2_rejected
+        }
+
+    def _ensure_listener(self):
+        """Inicia (uma vez por processo) a thread que escuta invalidações
+
+        A verificação pelo PID garante que cada worker criado por fork tenha
+        o seu próprio listener, mesmo com `gunicorn --preload`.
+        """
+        if self._listener_pid == os.getpid():
+            return
+
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            self.l1.clear()
+            threading.Thread(
+                target=self._listen_invalidations,
+                name='cache-invalidation-listener',
+                daemon=True
+            ).start()
+
+    def _listen_invalidations(self):
+        backoff = 1
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                backoff = 1
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    try:
+                        namespace, version = json.loads(message['data'])
+                    except (ValueError, TypeError):
+                        logger.warning(f"Mensagem de invalidação inválida: {message['data']!r}")
+                        self.l1.clear()
+                        continue
+                    self._observe(namespace, version)
+                    self.l1.delete_prefix(namespace)
+            except Exception as e:
+                logger.warning(f"Listener de invalidação desconectado: {str(e)}")
+                # Sem o listener o L1 pode ficar desatualizado; limpa por segurança
+                self.l1.clear()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+def create_cache():
+    """Cria o cache a partir das variáveis de ambiente
+
+    REDIS_URL habilita o nível compartilhado; sem ele o cache fica apenas
+    em memória no processo. CACHE_SIGNING_KEY (ou SECRET_KEY) assina os
+    valores gravados no Redis.
+    """
+    maxsize = int(os.environ.get('CACHE_L1_MAXSIZE', 256))
+    ttl = int(os.environ.get('CACHE_TTL', 300))
+    redis_url = os.environ.get('REDIS_URL')
+    signing_key = os.environ.get('CACHE_SIGNING_KEY') or os.environ.get('SECRET_KEY')
+
+    redis_client = None
+    if redis_url:
+        try:
+            import redis
+            redis_client = redis.Redis.from_url(redis_url)
+            redis_client.ping()
+            logger.info("Cache compartilhado Redis habilitado")
+            if not signing_key:
+                logger.warning("Sem CACHE_SIGNING_KEY nem SECRET_KEY: valores do cache ficam só em memória")
+        except Exception as e:
+            logger.error(f"Erro ao conectar no Redis, usando apenas cache local: {str(e)}")
+            redis_client = None
+
+    return TwoLevelCache(redis_client=redis_client, maxsize=maxsize, ttl=ttl, signing_key=signing_key)
+
+def install_sqlalchemy_invalidation(db, cache, ignored_columns=None):
+    """Invalida os namespaces das tabelas alteradas após cada commit
+
+    Os namespaces SQL usam o nome da tabela (ex.: 'indicadores').
+    ignored_columns: {tabela: colunas} cuja alteração, sozinha, não
+    invalida a tabela (ex.: usuarios.ultimo_login, gravado a cada login).
+    """
+    from sqlalchemy import event, inspect
+
+    ignored_columns = {table: frozenset(columns) for table, columns in (ignored_columns or {}).items()}
+
+    def _only_ignored(obj, ignored):
+        # No after_flush o histórico dos atributos ainda é o do flush
+        return all(attr.key in ignored for attr in inspect(obj).attrs if attr.history.has_changes())
+
+    def _after_flush(session, flush_context):
+        tables = session.info.setdefault('cache_dirty_tables', set())
+        for obj in list(session.new) + list(session.deleted):
+            table = getattr(obj, '__tablename__', None)
+            if table:
+                tables.add(table)
+        for obj in session.dirty:
+            table = getattr(obj, '__tablename__', None)
+            if table and not (table in ignored_columns and _only_ignored(obj, ignored_columns[table])):
+                tables.add(table)
+
+    def _after_commit(session):
+        tables = session.info.pop('cache_dirty_tables', set())
+        for table in tables:
+            cache.invalidate(table)
+
+    def _after_soft_rollback(session, previous_transaction):
+        session.info.pop('cache_dirty_tables', None)
+
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_soft_rollback', _after_soft_rollback)
@@ -0,0 +1,159 @@
+"""
+Dicionário de indicadores compilado
+
+A aba Indicadores_Dicionario é lida uma vez e cada texto de Meta ("Zero",
+"<5%", ">=95", "≤ 2,5") é convertido em uma regra de comparação. O status
+dos resultados é então calculado em lote, sem interpretar a meta a cada
+linha:
+
+- green: meta atingida
+- yellow: meta não atingida, mas dentro da tolerância (META_TOLERANCE,
+  fração do valor da meta; padrão 10%)
+- red: meta não atingida
+- gray: sem resultado ou meta não interpretável
+"""
+
+import os
+import re
+import operator
+from collections import namedtuple
+
+_META_PATTERN = re.compile(r'^(<=|>=|≤|≥|<|>|=)?\s*(-?\d+(?:[.,]\d+)?)\s*%?$')
+
+_OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '≤': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '≥': operator.ge,
+    '=': operator.eq
+}
+
+Indicador = namedtuple('Indicador', 'nome descricao num_label den_label formula meta id', defaults=('',))
+
+class Meta:
+    """Meta de um indicador já interpretada"""
+
+    __slots__ = ('text', 'op', 'target', 'tolerance')
+
+    def __init__(self, text, op, target, tolerance):
+        self.text = text
+        self.op = op
+        self.target = target
+        self.tolerance = tolerance
+
+    def status(self, value):
+        """Status de um resultado (percentual) frente à meta"""
+        if value is None:
+            return 'gray'
+
+        target = self.target
+        if self.op == '=':
+            if value == target:
+                return 'green'
+            return 'yellow' if abs(value - target) <= abs(target) * self.tolerance else 'red'
+
+        if _OPERATORS[self.op](value, target):
+            return 'green'
+
+        margin = abs(target) * self.tolerance
+        if self.op in ('<', '<=', '≤'):
+            return 'yellow' if margin and value <= target + margin else 'red'
+        return 'yellow' if margin and value >= target - margin else 'red'
+
+    def rank_key(self, value):
+        """Chave de ordenação de um resultado: quanto menor, melhor"""
+        if self.op == '=':
+            return abs(value - self.target)
+        if self.op in ('<', '<=', '≤'):
+            return value
+        return -value
+
+    def __repr__(self):
+        return f'Meta({self.text!r})'
+
+def parse_meta(text, tolerance=0.1):
+    """Converte o texto da meta em Meta; None se não for interpretável
+
+    Um número sem operador é ambíguo (não diz se é máximo ou mínimo) e
+    não é interpretado.
+    """
+    text = '' if text is None else str(text).strip()
+    if not text:
+        return None
+
+    if text.lower() == 'zero':
+        return Meta(text, '=', 0.0, tolerance)
+
+    match = _META_PATTERN.match(text.replace(' ', ''))
+    if not match or not match.group(1):
+        return None
+
+    return Meta(text, match.group(1), float(match.group(2).replace(',', '.')), tolerance)
+
+class IndicatorCatalog:
+    """Indicadores por nome, com as metas já interpretadas"""
+
+    def __init__(self, indicadores, metas):
+        self.indicadores = indicadores
+        self.metas = metas
+        self.ids = {str(indicador.id): indicador for indicador in indicadores.values() if indicador.id != ''}
+
+    @classmethod
+    def from_records(cls, records, tolerance=None):
+        """Compila os registros da aba Indicadores_Dicionario"""
+        if tolerance is None:
+            tolerance = float(os.environ.get('META_TOLERANCE', 0.1))
+
+        indicadores = {}
+        metas = {}
+        for record in records:
+            nome = record.get('Indicador')
+            if not nome:
+                continue
+            indicadores[nome] = Indicador(
+                nome=nome,
+                descricao=record.get('O que Mede', ''),
+                num_label=record.get('Numerador', ''),
+                den_label=record.get('Denominador', ''),
+                formula=record.get('Fórmula', ''),
+                meta=record.get('Meta', ''),
+                id=record.get('ID', '')
+            )
+            meta = parse_meta(record.get('Meta', ''), tolerance)
+            if meta is not None:
+                metas[nome] = meta
+
+        return cls(indicadores, metas)
+
+    def get(self, nome):
+        return self.indicadores.get(nome)
+
+    def find(self, chave):
+        """Indicador pelo ID da aba ou, na falta dele, pelo nome"""
+        return self.ids.get(str(chave)) or self.indicadores.get(chave)
+
+    def statuses(self, nomes, valores):
+        """Status de vários resultados de uma vez
+
+        nomes e valores são sequências paralelas; valor None (sem
+        denominador) resulta em 'gray'.
+        """
+        metas = self.metas
+        resultado = []
+        for nome, valor in zip(nomes, valores):
+            meta = metas.get(nome)
+            resultado.append('gray' if meta is None or valor is None else meta.status(valor))
+        return resultado
+
+    def rank_key(self, nome):
+        """Função de ordenação dos resultados do indicador (menor é melhor)
+
+        Sem meta interpretável, vale "quanto maior, melhor".
+        """
+        meta = self.metas.get(nome)
+        return meta.rank_key if meta is not None else operator.neg
+
+    def __len__(self):
+        return len(self.indicadores)
@@ -0,0 +1,264 @@
+"""
+Log de alterações para sincronização incremental dos clientes
+
+Cada escrita da aplicação (lançamento gravado, foto de unidade, usuário
+cadastrado...) registra uma entrada com um número sequencial crescente.
+GET /api/changes?since=<cursor> devolve só as entradas depois do cursor e
+o cursor novo; sem alterações, a consulta é uma comparação de inteiros (ou
+um MGET no Redis), e o polling em regime fica praticamente de graça.
+
+Uso pelo cliente:
+
+1. pede /api/changes sem since para obter o cursor atual;
+2. carrega as listagens completas;
+3. daí em diante, pede /api/changes?since=<cursor> e aplica as entradas.
+
+Quando "recarregar" vem verdadeiro, o cursor é de outra vida do log (o
+processo reiniciou sem Redis, ou o Redis perdeu as chaves) ou é mais
+antigo que as entradas guardadas (CHANGELOG_MAXLEN): o cliente recarrega
+as listagens e continua do cursor devolvido.
+
+Com REDIS_URL o log fica no Redis e é único para todos os workers (o
+número sequencial e a entrada são gravados juntos num script Lua, para
+que um leitor nunca veja um número maior antes de um menor); sem Redis,
+cada processo tem o seu log em memória, com uma época própria. Com vários
+workers, cada consulta cairia num log diferente e viria sempre com
+"recarregar": sem REDIS_URL e com mais de um worker (WEB_CONCURRENCY, ou
+--workers/-w em GUNICORN_CMD_ARGS), o feed fica desativado (503) e um erro
+é registrado ao iniciar.
+
+No Redis as entradas são gravadas em JSON (os dados são os mesmos dicts
+das respostas da API), não em pickle: ler o log não executa código.
+"""
+
+import os
+import re
+import json
+import uuid
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 500
+
+# INCR + ZADD atômicos: a entrada é gravada como "<id>:<JSON>"
+_RECORD_SCRIPT = """
+redis.call('SET', KEYS[3], ARGV[3], 'NX')
+local id = redis.call('INCR', KEYS[1])
+redis.call('ZADD', KEYS[2], id, id .. ':' .. ARGV[1])
+redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -tonumber(ARGV[2]) - 1)
+return {id, redis.call('GET', KEYS[3])}
+"""
+
+class ChangeFeedError(ValueError):
+    """Parâmetros do feed de alterações inválidos (resposta 400)"""
+
+class ChangeFeedUnavailable(RuntimeError):
+    """Feed de alterações desativado (resposta 503)"""
+
+def _entry(id, entidade, acao, dados, unidade, em):
+    return {
+        'id': id,
+        'entidade': entidade,
+        'acao': acao,
+        'unidade': unidade,
+        'dados': dados,
+        'em': em
+    }
+
+class ChangeLog:
+    """Log de alterações com cursor crescente (memória ou Redis)
+
+    unavailable: motivo, se o feed está desativado; since() levanta
+    ChangeFeedUnavailable com ele.
+    """
+
+    def __init__(self, redis_client=None, maxlen=10000, prefix='gi:changes:', unavailable=None):
+        self.redis = redis_client
+        self.unavailable = unavailable
+        self.maxlen = maxlen
+        self.prefix = prefix
+        self._epoch = uuid.uuid4().hex
+        self._entries = deque(maxlen=maxlen)
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._script = redis_client.register_script(_RECORD_SCRIPT) if redis_client is not None else None
+
+    # Chaves no Redis
+    def _seq_key(self):
+        return f'{self.prefix}seq'
+
+    def _log_key(self):
+        return f'{self.prefix}log'
+
+    def _epoch_key(self):
+        return f'{self.prefix}epoch'
+
+    def subscribe(self, callback):
+        """Chama callback(entrada, cursor) a cada alteração registrada neste processo"""
+        self._listeners.append(callback)
+
+    def record(self, entidade, acao, dados, unidade=None):
+        """Registra uma alteração; devolve o id da entrada
+
+        entidade: nome da aba ou tabela (o mesmo namespace do cache)
+        unidade: unidade a que a alteração pertence (None = visível a todos)
+        """
+        em = datetime.now().isoformat()
+        if self.redis is not None:
+            try:
+                payload = json.dumps([entidade, acao, dados, unidade, em], ensure_ascii=False, separators=(',', ':'))
+                id, epoch = self._script(
+                    keys=[self._seq_key(), self._log_key(), self._epoch_key()],
+                    args=[payload, self.maxlen, self._epoch]
+                )
+            except Exception as e:
+                logger.warning(f"Falha ao registrar alteração no Redis: {str(e)}")
+                return None
+            id = int(id)
+            epoch = epoch.decode('utf-8') if isinstance(epoch, bytes) else epoch
+        else:
+            with self._lock:
+                self._last_id += 1
+                id, epoch = self._last_id, self._epoch
+                self._entries.append(_entry(id, entidade, acao, dados, unidade, em))
+
+        entry = _entry(id, entidade, acao, dados, unidade, em)
+        for callback in self._listeners:
+            try:
+                callback(entry, f'{epoch}.{id}')
+            except Exception as e:
+                logger.warning(f"Erro ao notificar alteração {id}: {str(e)}")
+        return id
+
+    def cursor(self):
+        """Cursor atual ("<época>.<id>")"""
+        epoch, last_id = self._head()
+        return f'{epoch}.{last_id}'
+
+    def _head(self):
+        if self.redis is None:
+            return self._epoch, self._last_id
+
+        epoch, last_id = self.redis.mget([self._epoch_key(), self._seq_key()])
+        if epoch is None:
+            self.redis.set(self._epoch_key(), self._epoch, nx=True)
+            epoch = self.redis.get(self._epoch_key())
+        if isinstance(epoch, bytes):
+            epoch = epoch.decode('utf-8')
+        return epoch, int(last_id or 0)
+
+    def _read(self, after, limit):
+        """(entradas com id > after, id da mais antiga guardada)"""
+        if self.redis is None:
+            with self._lock:
+                if not self._entries:
+                    return [], None
+                first_id = self._entries[0]['id']
+                start = max(after - first_id + 1, 0)
+                return list(islice(self._entries, start, start + limit)), first_id
+
+        pipe = self.redis.pipeline()
+        pipe.zrangebyscore(self._log_key(), f'({after}', '+inf', start=0, num=limit)
+        pipe.zrange(self._log_key(), 0, 0, withscores=True)
+        members, oldest = pipe.execute()
+
+        entries = []
+        for member in members:
+            id, _, payload = member.partition(b':')
+            entries.append(_entry(int(id), *json.loads(payload)))
+        return entries, int(oldest[0][1]) if oldest else None
+
+    def since(self, cursor, limit=DEFAULT_LIMIT, visible=None):
+        """Alterações depois do cursor
+
+        visible: função que recebe a entrada e diz se o usuário pode vê-la.
+        Devolve {"cursor", "alteracoes", "mais", "recarregar"}.
+        """
+        if self.unavailable:
+            raise ChangeFeedUnavailable(self.unavailable)
+        epoch, last_id = self._head()
+        current = f'{epoch}.{last_id}'
+        if cursor is None:
+            return {'cursor': current, 'alteracoes': [], 'mais': False, 'recarregar': False}
+
+        cursor_epoch, _, cursor_id = cursor.rpartition('.')
+        try:
+            after = int(cursor_id)
+        except ValueError:
+            raise ChangeFeedError('Cursor de alterações inválido')
+        if cursor_epoch != epoch or after > last_id:
+            return {'cursor': current, 'alteracoes': [], 'mais': False, 'recarregar': True}
+        if after == last_id:
+            return {'cursor': current, 'alteracoes': [], 'mais': False, 'recarregar': False}
+
+        entries, oldest = self._read(after, limit)
+        if oldest is None or oldest > after + 1:
+            # Entradas depois do cursor já foram descartadas
+            return {'cursor': current, 'alteracoes': [], 'mais': False, 'recarregar': True}
+
+        # O cursor avança até a última entrada lida, mesmo que invisível
+        next_id = entries[-1]['id'] if entries else after
+        alteracoes = [entry for entry in entries if visible is None or visible(entry)]
+        return {
+            'cursor': f'{epoch}.{next_id}',
+            'alteracoes': alteracoes,
+            'mais': next_id < last_id,
+            'recarregar': False
+        }
+
+def worker_count():
+    """Workers declarados ao gunicorn (WEB_CONCURRENCY ou GUNICORN_CMD_ARGS)"""
+    match = re.search(r'(?:^|\s)(?:-w\s*|--workers[=\s]\s*)(\d+)', os.environ.get('GUNICORN_CMD_ARGS', ''))
+    if match:
+        return int(match.group(1))
+    return int(os.environ.get('WEB_CONCURRENCY', 1))
+
+def create_changelog(cache=None):
+    """Cria o log usando o Redis do cache, quando houver (CHANGELOG_MAXLEN)
+
+    Sem Redis e com mais de um worker, o log é criado desativado.
+    """
+    maxlen = int(os.environ.get('CHANGELOG_MAXLEN', 10000))
+    redis_client = getattr(cache, 'redis', None)
+    unavailable = None
+    if redis_client is None and worker_count() > 1:
+        unavailable = 'Feed de alterações indisponível: com mais de um worker ele exige REDIS_URL'
+        logger.error(f"{unavailable} ({worker_count()} workers); /api/changes e o stream SSE desativados")
+    return ChangeLog(redis_client=redis_client, maxlen=maxlen, unavailable=unavailable)
+
+def visibility(unidade, todas_unidades=False, admin=False, restritas=()):
+    """Filtro `visible` de since() para um usuário
+
+    Entidades em `restritas` (ex.: usuários) só aparecem para admins; sem
+    todas_unidades, só as alterações da própria unidade e as que não
+    pertencem a nenhuma.
+    """
+    def visible(entry):
+        if admin:
+            return True
+        if entry['entidade'] in restritas:
+            return False
+        return todas_unidades or entry['unidade'] is None or entry['unidade'] == unidade
+    return visible
+
+def changes_request():
+    """Lê since e limit da query string (ChangeFeedError se inválidos)"""
+    since = request.args.get('since') or None
+    limit = request.args.get('limit')
+    if limit is None:
+        return since, DEFAULT_LIMIT
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ChangeFeedError('Parâmetro limit deve ser um número inteiro')
+    if limit < 1:
+        raise ChangeFeedError('Parâmetro limit deve ser maior que zero')
+    return since, min(limit, DEFAULT_LIMIT)
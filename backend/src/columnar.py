@@ -0,0 +1,197 @@
+"""
+Armazenamento colunar dos lançamentos da planilha
+
+Os registros da aba Lancamentos são reorganizados em colunas tipadas
+(array da biblioteca padrão), com textos codificados por dicionário:
+
+- indicadores e unidades viram códigos inteiros (posição no dicionário)
+- ano/mês viram um número de período (ano * 12 + mês - 1)
+- numerador e denominador viram floats
+
+As linhas ficam ordenadas por (indicador, período, unidade), e `offsets`
+guarda onde começa cada indicador. Uma consulta de um indicador num
+intervalo de meses lê só a fatia correspondente, localizada por busca
+binária, em vez de percorrer a aba inteira.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+def to_periodo(ano, mes):
+    """Número do período (meses desde o ano zero)"""
+    return ano * 12 + mes - 1
+
+def from_periodo(periodo):
+    """(ano, mes) de um número de período"""
+    ano, indice = divmod(periodo, 12)
+    return ano, indice + 1
+
+def format_periodo(periodo):
+    ano, mes = from_periodo(periodo)
+    return f'{ano:04d}-{mes:02d}'
+
+def parse_periodo(text):
+    """Converte 'AAAA-MM' em número de período (ValueError se inválido)"""
+    ano, _, mes = str(text).partition('-')
+    try:
+        ano, mes = int(ano), int(mes)
+    except ValueError:
+        raise ValueError(f'Período inválido (use AAAA-MM): {text}')
+    if not 1 <= mes <= 12:
+        raise ValueError(f'Período inválido (use AAAA-MM): {text}')
+    return to_periodo(ano, mes)
+
+def to_number(value):
+    """Valor numérico de uma célula (0.0 se vazia ou inválida)"""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+class ColumnarLancamentos:
+    """Lançamentos em colunas, agrupados por indicador"""
+
+    __slots__ = ('indicadores', 'unidades', 'indicador_codes', 'unidade_codes',
+                 'offsets', 'periodo', 'unidade', 'numerador', 'denominador')
+
+    def __init__(self, indicadores, unidades, offsets, periodo, unidade, numerador, denominador):
+        self.indicadores = indicadores
+        self.unidades = unidades
+        self.indicador_codes = {nome: code for code, nome in enumerate(indicadores)}
+        self.unidade_codes = {valor: code for code, valor in enumerate(unidades)}
+        self.offsets = offsets
+        self.periodo = periodo
+        self.unidade = unidade
+        self.numerador = numerador
+        self.denominador = denominador
+
+    @classmethod
+    def from_records(cls, records):
+        """Monta as colunas a partir de records.Lancamento
+
+        Linhas sem ano/mês numéricos válidos ficam de fora.
+        """
+        indicador_codes = {}
+        unidade_codes = {}
+        rows = []
+        for record in records:
+            ano, mes = record.ano, record.mes
+            if type(ano) is not int or type(mes) is not int or not 1 <= mes <= 12:
+                continue
+            indicador = indicador_codes.setdefault(record.indicador_nome, len(indicador_codes))
+            unidade = unidade_codes.setdefault(record.id_unidade, len(unidade_codes))
+            rows.append((indicador, to_periodo(ano, mes), unidade,
+                         to_number(record.valor_numerador), to_number(record.valor_denominador)))
+
+        rows.sort(key=itemgetter(0, 1, 2))
+
+        counts = [0] * len(indicador_codes)
+        for row in rows:
+            counts[row[0]] += 1
+        offsets = array('q', [0])
+        for count in counts:
+            offsets.append(offsets[-1] + count)
+
+        return cls(
+            indicadores=list(indicador_codes),
+            unidades=list(unidade_codes),
+            offsets=offsets,
+            periodo=array('l', [row[1] for row in rows]),
+            unidade=array('l', [row[2] for row in rows]),
+            numerador=array('d', [row[3] for row in rows]),
+            denominador=array('d', [row[4] for row in rows])
+        )
+
+    def __len__(self):
+        return len(self.periodo)
+
+    def rows(self):
+        """Itera (indicador, unidade, período, numerador, denominador)"""
+        indicadores, unidades = self.indicadores, self.unidades
+        offsets = self.offsets
+        for code, nome in enumerate(indicadores):
+            for i in range(offsets[code], offsets[code + 1]):
+                yield (nome, unidades[self.unidade[i]], self.periodo[i],
+                       self.numerador[i], self.denominador[i])
+
+    def _range(self, nome, inicio, fim):
+        """Fatia [lo, hi) das linhas do indicador entre os períodos inicio e fim"""
+        code = self.indicador_codes.get(nome)
+        if code is None:
+            return 0, 0
+        start, end = self.offsets[code], self.offsets[code + 1]
+        lo = bisect_left(self.periodo, inicio, start, end)
+        hi = bisect_right(self.periodo, fim, lo, end)
+        return lo, hi
+
+    def sums(self, nome, inicio, fim):
+        """Somas de numerador e denominador por (unidade, período)
+
+        Devolve {(código da unidade, período): [numerador, denominador]};
+        lançamentos repetidos no mesmo mês são somados.
+        """
+        lo, hi = self._range(nome, inicio, fim)
+        periodo, unidade = self.periodo, self.unidade
+        numerador, denominador = self.numerador, self.denominador
+
+        somas = {}
+        for i in range(lo, hi):
+            key = (unidade[i], periodo[i])
+            soma = somas.get(key)
+            if soma is None:
+                somas[key] = [numerador[i], denominador[i]]
+            else:
+                soma[0] += numerador[i]
+                soma[1] += denominador[i]
+        return somas
+
+    def period_sums(self, periodo):
+        """Somas de numerador e denominador de todos os indicadores num mês
+
+        Devolve {indicador: {unidade: [numerador, denominador]}}, com uma
+        busca binária por indicador.
+        """
+        unidades = self.unidades
+        resultado = {}
+        for nome in self.indicadores:
+            resultado[nome] = {
+                unidades[code]: soma
+                for (code, _), soma in self.sums(nome, periodo, periodo).items()
+            }
+        return resultado
+
+    def series(self, nome, inicio, fim, unidades=None, geral=False):
+        """Séries mensais de um indicador, alinhadas aos períodos inicio..fim
+
+        unidades: valores de ID_Unidade (os inexistentes vêm vazios)
+        geral: inclui a soma de todas as unidades, com a chave None
+
+        Devolve {unidade: (numeradores, denominadores)}, com None nos meses
+        sem lançamento.
+        """
+        tamanho = fim - inicio + 1
+        somas = self.sums(nome, inicio, fim)
+
+        codes = {}
+        for valor in unidades or ():
+            codes[valor] = self.unidade_codes.get(valor)
+
+        resultado = {valor: ([None] * tamanho, [None] * tamanho) for valor in codes}
+        if geral:
+            resultado[None] = ([None] * tamanho, [None] * tamanho)
+        por_codigo = {code: resultado[valor] for valor, code in codes.items() if code is not None}
+
+        total = resultado.get(None)
+        for (code, periodo), (num, den) in somas.items():
+            posicao = periodo - inicio
+            serie = por_codigo.get(code)
+            if serie is not None:
+                serie[0][posicao] = num
+                serie[1][posicao] = den
+            if total is not None:
+                total[0][posicao] = (total[0][posicao] or 0.0) + num
+                total[1][posicao] = (total[1][posicao] or 0.0) + den
+        return resultado
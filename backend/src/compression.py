@@ -0,0 +1,166 @@
+"""
+Compressão das respostas (gzip e brotli)
+
+As respostas JSON do dashboard são grandes e muito repetitivas, e chegam às
+unidades por redes lentas. O hook instalado por `init_compression`
+comprime as respostas de tipos textuais acima de um tamanho mínimo, com a
+codificação aceita pelo cliente (Accept-Encoding):
+
+- br, se o pacote Brotli estiver instalado
+- gzip, sempre disponível
+
+Respostas em streaming são comprimidas pedaço a pedaço, sem juntar o corpo
+em memória; o compressor é esvaziado a cada STREAM_FLUSH_BYTES de entrada,
+para que o cliente receba o corpo aos poucos sem que pedaços pequenos
+estraguem a taxa de compressão. Event streams (text/event-stream) não são
+comprimidos.
+
+Variáveis de ambiente:
+- COMPRESSION_ENABLED: liga/desliga (padrão true; desligue se um proxy já
+  comprime)
+- COMPRESSION_MIN_SIZE: bytes mínimos para comprimir (padrão 1024)
+- COMPRESSION_LEVEL: nível do gzip, 1 a 9 (padrão 6)
+- BROTLI_QUALITY: qualidade do brotli, 0 a 11 (padrão 5)
+"""
+
+import os
+import time
+import zlib
+import logging
+
+from flask import request
+
+from profiling import add_time, is_profiling
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Entrada acumulada antes de esvaziar o compressor num streaming
+STREAM_FLUSH_BYTES = 16 * 1024
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'image/svg+xml'
+})
+
+def available_encodings():
+    """Codificações suportadas, em ordem de preferência"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+class Compressor:
+    """Compressor incremental com a mesma interface para gzip e brotli"""
+
+    def __init__(self, encoding, level=6, quality=5):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._obj = brotli.Compressor(quality=quality)
+        else:
+            # wbits=31: formato gzip (cabeçalho e CRC), não zlib puro
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self):
+        """Esvazia o que está pendente sem encerrar o fluxo"""
+        if self.encoding == 'br':
+            return self._obj.flush()
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush(zlib.Z_FINISH)
+
+def compress(data, encoding, level=6, quality=5):
+    """Comprime um corpo completo"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=quality)
+    compressor = Compressor(encoding, level, quality)
+    return compressor.compress(data) + compressor.finish()
+
+def _stream(iterable, compressor):
+    """Comprime um corpo em streaming, sem juntá-lo em memória"""
+    pending = 0
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk)
+            pending += len(chunk)
+            if pending >= STREAM_FLUSH_BYTES:
+                data += compressor.flush()
+                pending = 0
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+
+def _choose_encoding():
+    return request.accept_encodings.best_match(available_encodings())
+
+def init_compression(app):
+    """Instala a compressão das respostas
+
+    Deve ser chamado depois de init_profiling, para que o tempo de
+    compressão entre no Server-Timing da requisição.
+    """
+    if os.environ.get('COMPRESSION_ENABLED', 'true').lower() != 'true':
+        logger.info("Compressão de respostas desabilitada")
+        return
+
+    min_size = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    level = int(os.environ.get('COMPRESSION_LEVEL', 6))
+    quality = int(os.environ.get('BROTLI_QUALITY', 5))
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.status_code < 200
+                or response.status_code in (204, 206, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+
+        # O corpo varia com o Accept-Encoding, mesmo quando fica sem compressão
+        response.vary.add('Accept-Encoding')
+
+        encoding = _choose_encoding()
+        if not encoding:
+            return response
+
+        if response.is_streamed:
+            response.response = _stream(response.response, Compressor(encoding, level, quality))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+
+            start = time.perf_counter()
+            response.set_data(compress(data, encoding, level, quality))
+            if is_profiling():
+                add_time('compression', time.perf_counter() - start)
+
+        response.headers['Content-Encoding'] = encoding
+
+        # O corpo comprimido não é byte a byte o mesmo: ETag forte vira fraco
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
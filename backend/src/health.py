@@ -0,0 +1,121 @@
+"""
+Verificações de saúde (liveness e readiness)
+
+Liveness só indica que o processo responde. Readiness mede a latência real
+até as dependências (Google Sheets ou banco), com o resultado em cache por
+alguns segundos, para que as sondagens do balanceador não gerem carga
+extra nas dependências.
+"""
+
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class DependencyProbe:
+    """Sonda de uma dependência com resultado em cache
+
+    Apenas uma thread executa a verificação por vez; as demais recebem o
+    último resultado conhecido enquanto a verificação está em andamento.
+    """
+
+    def __init__(self, name, check, ttl=None, max_latency_ms=None):
+        self.name = name
+        self.check = check
+        self.ttl = float(os.environ.get('HEALTH_PROBE_TTL', 5)) if ttl is None else ttl
+        self.max_latency_ms = (
+            float(os.environ.get('HEALTH_MAX_LATENCY_MS', 2000)) if max_latency_ms is None else max_latency_ms
+        )
+        self._result = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def result(self):
+        """Retorna o resultado em cache ou executa uma nova verificação"""
+        if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self._result
+
+        if not self._lock.acquire(blocking=self._result is None):
+            return self._result
+
+        try:
+            if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._result
+            self._result = self._run()
+            self._checked_at = time.monotonic()
+            return self._result
+        finally:
+            self._lock.release()
+
+    def _run(self):
+        start = time.perf_counter()
+        error = None
+        try:
+            self.check()
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"Sonda '{self.name}' falhou: {error}")
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        return {
+            'ok': error is None and latency_ms <= self.max_latency_ms,
+            'latency_ms': round(latency_ms, 1),
+            'checked_at': datetime.utcnow().isoformat(),
+            'error': error
+        }
+
+def liveness():
+    """Corpo da resposta de liveness"""
+    return {
+        'status': 'alive',
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+def readiness(probes, pools=None, cache=None, extras=None):
+    """Monta o relatório de readiness
+
+    probes: lista de DependencyProbe
+    pools: dict nome -> estatísticas com a chave 'saturation' (0 a 1)
+    cache: instância de TwoLevelCache (para as taxas de acerto)
+    extras: informações adicionais que não afetam o estado (ex.: pool de senhas)
+
+    Retorna (corpo, status_http); 503 se alguma dependência falhou, está
+    lenta ou algum pool está saturado.
+    """
+    dependencies = {probe.name: probe.result() for probe in probes}
+    pools = pools or {}
+
+    ready = all(d['ok'] for d in dependencies.values())
+    ready = ready and all(p.get('saturation', 0) < 1 for p in pools.values())
+
+    body = {
+        'status': 'ready' if ready else 'unavailable',
+        'timestamp': datetime.utcnow().isoformat(),
+        'dependencies': dependencies,
+        'pools': pools
+    }
+    if cache is not None:
+        body['cache'] = cache.stats()
+    if extras:
+        body.update(extras)
+
+    return body, 200 if ready else 503
+
+def sqlalchemy_pool_stats(engine):
+    """Estatísticas do pool de conexões do SQLAlchemy"""
+    pool = engine.pool
+    size = pool.size() if hasattr(pool, 'size') else 0
+    checked_out = pool.checkedout() if hasattr(pool, 'checkedout') else 0
+    overflow = max(pool.overflow(), 0) if hasattr(pool, 'overflow') else 0
+    max_overflow = max(getattr(pool, '_max_overflow', 0), 0)
+    capacity = size + max_overflow
+
+    return {
+        'size': size,
+        'checked_out': checked_out,
+        'overflow': overflow,
+        'saturation': round(checked_out / capacity, 3) if capacity else 0.0
+    }
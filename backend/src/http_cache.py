@@ -0,0 +1,93 @@
+"""
+Cache HTTP das respostas de dados de referência
+
+Unidades e dicionário de indicadores mudam raramente, mas o frontend os
+baixa a cada carregamento de página. Os endpoints decorados com
+`conditional` respondem com ETag e Last-Modified calculados a partir das
+versões dos namespaces do cache (incrementadas a cada escrita), sem ler a
+planilha nem o banco. Quando o cliente reenvia o ETag (If-None-Match) e a
+versão não mudou, a resposta é um 304 vazio.
+
+HTTP_CACHE_MAX_AGE define por quantos segundos o navegador pode reutilizar
+a resposta sem revalidar (padrão 0: revalida sempre, o que custa só o 304).
+"""
+
+import os
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import request, make_response
+
+def cache_control_header(max_age=None):
+    """Valor do Cache-Control das respostas condicionais"""
+    if max_age is None:
+        max_age = int(os.environ.get('HTTP_CACHE_MAX_AGE', 0))
+    if max_age <= 0:
+        return 'private, no-cache'
+    return f'private, max-age={max_age}, must-revalidate'
+
+def compute_validators(cache, namespaces, scope=None):
+    """ETag e Last-Modified dos namespaces, sem tocar nos dados
+
+    scope diferencia respostas que dependem do usuário (ex.: o id do
+    usuário quando a lista é filtrada pelo perfil).
+    """
+    epoch, versions = cache.versions(namespaces)
+    parts = [epoch, repr(scope)]
+    parts.extend(f'{ns}:{version}' for ns, (version, _) in zip(namespaces, versions))
+    etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:20]
+
+    modified = max(modified for _, modified in versions)
+    last_modified = datetime.fromtimestamp(int(modified), tz=timezone.utc)
+    return etag, last_modified
+
+def _not_modified(etag, last_modified):
+    """O cliente já tem a versão atual? (If-None-Match tem precedência)"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return request.if_modified_since >= last_modified
+    return False
+
+def conditional(cache, namespaces, scope=None, fresh=None):
+    """Decorator de GET com ETag/Last-Modified derivados das versões do cache
+
+    cache: TwoLevelCache da aplicação
+    namespaces: namespaces cujos dados compõem a resposta
+    scope: função sem argumentos que identifica a variação da resposta
+        por usuário (entra no ETag e adiciona Vary: Authorization)
+    fresh: função que recebe os namespaces e diz se os dados em cache
+        refletem a fonte. Para a planilha, que pode ser editada fora da
+        aplicação, o 304 só é dado enquanto a aba está em cache; depois
+        disso a view relê a aba e a versão muda se o conteúdo mudou
+        (o cliente recebe a resposta completa uma vez a mais).
+    """
+    namespaces = list(namespaces)
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Validadores calculados antes da view: se houver uma escrita no
+            # meio, o ETag fica mais antigo que os dados, nunca o contrário
+            etag, last_modified = compute_validators(
+                cache, namespaces, scope() if scope else None
+            )
+            if (fresh is None or fresh(namespaces)) and _not_modified(etag, last_modified):
+                response = make_response('', 304)
+                _set_headers(response, etag, last_modified, scope is not None)
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                _set_headers(response, etag, last_modified, scope is not None)
+            return response
+        return decorated_function
+    return decorator
+
+def _set_headers(response, etag, last_modified, per_user):
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control_header()
+    if per_user:
+        response.vary.add('Authorization')
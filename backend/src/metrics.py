@@ -0,0 +1,259 @@
+"""
+Instrumentação da aplicação no formato de texto do Prometheus
+
+Registra histogramas de latência por endpoint, por chamada à API do Google
+Sheets (por planilha) e por consulta SQL (via eventos do SQLAlchemy), além
+das taxas de acerto do cache. Tudo é exposto em /metrics.
+
+Os valores são mantidos por processo; cada série leva o rótulo `worker`
+com o PID para que as séries de workers diferentes não se misturem.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+from flask import request, g, Response
+
+from profiling import add_time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+class Counter:
+    """Contador monotônico com rótulos"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, list(zip(self.label_names, key)), value
+
+class Histogram:
+    """Histograma com buckets cumulativos, soma e contagem por rótulos"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()]
+        for key, (counts, total, count) in items:
+            labels = list(zip(self.label_names, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', labels + [('le', repr(float(bound)))], cumulative
+            yield f'{self.name}_bucket', labels + [('le', '+Inf')], count
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+class CallbackMetric:
+    """Métrica cujos valores são calculados no momento da coleta"""
+
+    def __init__(self, name, documentation, collect, type_name='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+        self.type_name = type_name
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield self.name, sorted(labels.items()), value
+
+class MetricsRegistry:
+    """Conjunto de métricas e renderização no formato do Prometheus"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, label_names=()):
+        return self.register(Counter(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def callback(self, name, documentation, collect, type_name='gauge'):
+        return self.register(CallbackMetric(name, documentation, collect, type_name))
+
+    def render(self):
+        worker = [('worker', str(os.getpid()))]
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            for sample_name, labels, value in metric.samples():
+                lines.append(f'{sample_name}{_format_labels(worker + list(labels))} {value}')
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds',
+    'Latência das requisições HTTP por endpoint',
+    ['method', 'endpoint', 'status']
+)
+
+SHEETS_CALLS = registry.histogram(
+    'sheets_api_call_duration_seconds',
+    'Duração das chamadas à API do Google Sheets por operação e planilha',
+    ['operation', 'sheet']
+)
+
+SHEETS_ERRORS = registry.counter(
+    'sheets_api_errors_total',
+    'Chamadas à API do Google Sheets que falharam',
+    ['operation', 'sheet']
+)
+
+SQL_QUERIES = registry.histogram(
+    'sql_query_duration_seconds',
+    'Duração das consultas SQL por tipo de comando',
+    ['statement']
+)
+
+@contextmanager
+def track_sheets(operation, sheet=''):
+    """Mede uma chamada à API do Google Sheets"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        SHEETS_ERRORS.inc(operation=operation, sheet=sheet)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        SHEETS_CALLS.observe(elapsed, operation=operation, sheet=sheet)
+        add_time('sheets', elapsed)
+
+def instrument_sqlalchemy():
+    """Registra a duração de todas as consultas de todos os engines"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if getattr(instrument_sqlalchemy, 'installed', False):
+        return
+    instrument_sqlalchemy.installed = True
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        SQL_QUERIES.observe(elapsed, statement=kind)
+        add_time('db', elapsed)
+
+    @event.listens_for(Engine, 'handle_error')
+    def _error(context):
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+def register_cache(cache):
+    """Expõe as estatísticas do cache"""
+    def _hits():
+        stats = cache.stats()
+        yield {'level': 'l1', 'result': 'hit'}, stats['l1_hits']
+        yield {'level': 'l1', 'result': 'miss'}, stats['l1_misses']
+        yield {'level': 'l2', 'result': 'hit'}, stats['l2_hits']
+        yield {'level': 'l2', 'result': 'miss'}, stats['l2_misses']
+
+    def _ratio():
+        stats = cache.stats()
+        yield {'level': 'l1'}, stats['l1_hit_ratio']
+        yield {'level': 'l2'}, stats['l2_hit_ratio']
+
+    registry.callback('cache_lookups_total', 'Consultas ao cache por nível e resultado', _hits, 'counter')
+    registry.callback('cache_hit_ratio', 'Taxa de acerto do cache por nível', _ratio)
+
+def init_metrics(app, cache=None):
+    """Instala a medição de latência e a rota /metrics na aplicação
+
+    Se METRICS_TOKEN estiver definido, /metrics exige
+    `Authorization: Bearer <token>`.
+    """
+    if cache is not None:
+        register_cache(cache)
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_latency(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            endpoint = request.url_rule.rule if request.url_rule else 'sem_rota'
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                method=request.method,
+                endpoint=endpoint,
+                status=response.status_code
+            )
+        return response
+
+    token = os.environ.get('METRICS_TOKEN')
+
+    def metrics_view():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Não autorizado\n', status=401, mimetype='text/plain')
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view, methods=['GET'])
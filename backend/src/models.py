@@ -72,6 +72,12 @@ class Usuario(db.Model):
             return Unidade.query.filter_by(ativo=True).all()
         return [self.unidade]
     
+    def accessible_unidades_query(self):
+        """Query das unidades que o usuário pode acessar (para paginação)"""
+        if self.role in ['admin', 'gestor']:
+            return Unidade.query.filter_by(ativo=True)
+        return Unidade.query.filter_by(id=self.unidade_id)
+    
     def to_dict(self, include_sensitive=False):
         data = {
             'id': self.id,
@@ -138,10 +144,12 @@ class Lancamento(db.Model):
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
     atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Constraint única para evitar duplicatas
+    # Constraint única para evitar duplicatas. No PostgreSQL a tabela é
+    # particionada por ano (database/schema.sql), com chave primária (id, ano)
     __table_args__ = (
         db.UniqueConstraint('indicador_id', 'unidade_id', 'ano', 'mes', 
                           name='unique_lancamento_periodo'),
+        db.Index('idx_lancamentos_periodo', 'ano', 'mes'),
     )
     
     def to_dict(self):
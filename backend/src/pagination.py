@@ -0,0 +1,198 @@
+"""
+Paginação por cursor (keyset) das listagens
+
+As listagens aceitam os parâmetros:
+
+- limit: tamanho da página (de 1 a PAGE_MAX_LIMIT, que por padrão é 500)
+- after: cursor devolvido pela página anterior
+
+O cursor codifica os valores da chave de ordenação da última linha enviada,
+e a página seguinte começa na primeira linha com chave maior (WHERE
+(a, b) > (:a, :b) ORDER BY a, b LIMIT n+1 no banco, busca binária em
+listas já ordenadas). Ao contrário de OFFSET, o custo não cresce com o
+número da página e a paginação não pula nem repete linhas quando há
+inserções entre uma página e outra.
+
+Listagens paginadas pela posição da linha (abas em que só se acrescentam
+linhas) passam um `scope` que muda quando as posições podem mudar (ex.: a
+assinatura dos arquivos de anos do archive.py, que tira linhas da aba). O
+cursor leva o scope, e um cursor de outro scope é recusado (400) em vez de
+pular ou repetir linhas.
+
+Sem limit e sem after a listagem é completa, como antes, exceto se
+PAGE_DEFAULT_LIMIT for configurado; com after e sem limit, vale
+PAGE_MAX_LIMIT. A página seguinte é indicada nos cabeçalhos X-Next-Cursor
+e Link (rel="next"), e o total de linhas em X-Total-Count; respostas em
+objeto também trazem a chave "paginacao".
+"""
+
+import os
+import json
+import base64
+import binascii
+from urllib.parse import urlencode
+
+from flask import request
+
+# Cabeçalhos que o frontend (outra origem) precisa ler: CORS expose_headers
+EXPOSED_HEADERS = ['X-Total-Count', 'X-Next-Cursor', 'Link']
+
+class PaginationError(ValueError):
+    """Parâmetros de paginação inválidos (resposta 400)"""
+
+def encode_cursor(values):
+    """Cursor opaco (base64 URL-safe de uma lista JSON)"""
+    raw = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).rstrip(b'=').decode('ascii')
+
+def decode_cursor(text):
+    try:
+        padded = text + '=' * (-len(text) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise PaginationError('Cursor de paginação inválido')
+    if not isinstance(values, list) or not values:
+        raise PaginationError('Cursor de paginação inválido')
+    return values
+
+class PageRequest:
+    """Parâmetros de paginação de uma requisição"""
+
+    __slots__ = ('limit', 'after')
+
+    def __init__(self, limit=None, after=None):
+        self.limit = limit
+        self.after = after
+
+    @property
+    def active(self):
+        return self.limit is not None or self.after is not None
+
+def page_request():
+    """Lê limit e after da query string"""
+    max_limit = int(os.environ.get('PAGE_MAX_LIMIT', 500))
+    default_limit = int(os.environ.get('PAGE_DEFAULT_LIMIT', 0)) or None
+
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+
+    if limit is None:
+        limit = default_limit if default_limit is None else min(default_limit, max_limit)
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PaginationError('Parâmetro limit deve ser um número inteiro')
+        if limit < 1:
+            raise PaginationError('Parâmetro limit deve ser maior que zero')
+        limit = min(limit, max_limit)
+
+    if after is not None:
+        after = decode_cursor(after)
+        if limit is None:
+            limit = max_limit
+
+    return PageRequest(limit, after)
+
+class Page:
+    """Uma página de resultados"""
+
+    __slots__ = ('items', 'next_cursor', 'total', 'limit')
+
+    def __init__(self, items, next_cursor, total, limit):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.total = total
+        self.limit = limit
+
+    def metadata(self):
+        """Chave "paginacao" das respostas em objeto"""
+        return {
+            'limite': self.limit,
+            'proximo': self.next_cursor,
+            'total': self.total
+        }
+
+def paginate_sequence(items, sort_key, page, total=None, scope=None):
+    """Pagina uma sequência já ordenada (crescente) por sort_key
+
+    sort_key: função que devolve a tupla de ordenação de um item
+    scope: opcional; texto que identifica o estado em que as chaves valem
+    """
+    start = 0
+    if page.after is not None:
+        after = tuple(page.after)
+        if scope is not None:
+            if after[0] != scope:
+                raise PaginationError('Cursor de paginação expirado: recomece a listagem')
+            after = after[1:]
+        lo, hi = 0, len(items)
+        try:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if tuple(sort_key(items[mid])) <= after:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        except TypeError:
+            raise PaginationError('Cursor de paginação inválido')
+        start = lo
+
+    if page.limit is None:
+        chunk = items[start:]
+        next_cursor = None
+    else:
+        end = start + page.limit
+        chunk = items[start:end]
+        next_cursor = None
+        if chunk and end < len(items):
+            key = tuple(sort_key(chunk[-1]))
+            next_cursor = encode_cursor(key if scope is None else (scope,) + key)
+
+    if not page.active:
+        total = None
+    elif total is None:
+        total = len(items)
+    return Page(list(chunk), next_cursor, total, page.limit)
+
+def paginate_query(query, columns, page, count=None):
+    """Pagina uma query SQLAlchemy ordenada pelas colunas dadas
+
+    As colunas devem formar uma chave única (a última costuma ser a PK) e
+    estar cobertas por um índice. count é uma função sem argumentos que
+    devolve o total (em geral, lido do cache); só é chamada quando a
+    paginação foi pedida.
+    """
+    from sqlalchemy import tuple_, literal
+
+    if page.after is not None:
+        if len(page.after) != len(columns):
+            raise PaginationError('Cursor de paginação inválido')
+        query = query.filter(tuple_(*columns) > tuple_(*[literal(v) for v in page.after]))
+
+    query = query.order_by(*columns)
+
+    if page.limit is None:
+        rows = query.all()
+        next_cursor = None
+    else:
+        rows = query.limit(page.limit + 1).all()
+        has_more = len(rows) > page.limit
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns]) if has_more else None
+
+    total = count() if count is not None and page.active else None
+    return Page(rows, next_cursor, total, page.limit)
+
+def set_page_headers(response, page):
+    """Cabeçalhos X-Total-Count, X-Next-Cursor e Link da página"""
+    if page.total is not None:
+        response.headers['X-Total-Count'] = str(page.total)
+    if page.next_cursor:
+        response.headers['X-Next-Cursor'] = page.next_cursor
+        args = request.args.to_dict()
+        args['after'] = page.next_cursor
+        if page.limit is not None:
+            args['limit'] = str(page.limit)
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
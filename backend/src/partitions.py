@@ -0,0 +1,56 @@
+"""
+Partições anuais de lancamentos no PostgreSQL
+
+Com a tabela particionada por ano (database/schema.sql), um lançamento num
+ano sem partição é rejeitado pelo banco. Antes de gravar, a aplicação chama
+`ensure_partition`, que cria a partição com criar_particao_lancamentos()
+na primeira vez que o processo vê o ano; depois disso a verificação é só
+uma consulta a um set em memória.
+
+A partição é criada numa conexão à parte, confirmada na hora: não depende
+do commit do lançamento. Como criar a partição bloqueia lancamentos, a
+chamada deve vir antes de a requisição consultar a tabela.
+
+Em SQLite, ou num PostgreSQL com a tabela ainda não particionada (sem a
+função), a chamada não faz nada.
+"""
+
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PartitionManager:
+    """Anos com partição já garantida neste processo"""
+
+    def __init__(self, db):
+        self.db = db
+        self._anos = set()
+        self._available = None
+        self._lock = threading.Lock()
+
+    def ensure_partition(self, ano):
+        """Garante a partição do ano"""
+        if ano in self._anos or self._available is False:
+            return
+
+        from sqlalchemy import text
+
+        with self._lock:
+            if ano in self._anos:
+                return
+            if self._available is None and self.db.engine.dialect.name != 'postgresql':
+                self._available = False
+                return
+
+            with self.db.engine.begin() as conn:
+                if self._available is None:
+                    self._available = bool(conn.execute(
+                        text("SELECT to_regprocedure('criar_particao_lancamentos(integer)') IS NOT NULL")
+                    ).scalar())
+                    if not self._available:
+                        logger.info("lancamentos não é particionada; partições anuais desativadas")
+                        return
+                nome = conn.execute(text("SELECT criar_particao_lancamentos(:ano)"), {'ano': int(ano)}).scalar()
+            self._anos.add(ano)
+        logger.info(f"Partição {nome} disponível")
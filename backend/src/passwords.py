@@ -0,0 +1,133 @@
+"""
+Hashing de senhas fora da thread da requisição
+
+O bcrypt custa centenas de milissegundos de CPU por chamada. Aqui as
+chamadas vão para um pool de processos limitado, com controle de admissão:
+quando a fila está cheia a requisição é recusada rapidamente
+(PasswordHasherBusy) em vez de travar os demais endpoints durante picos de
+login (ex.: troca de plantão).
+
+Hashes antigos do werkzeug (pbkdf2:/scrypt:, gerados por models.py) também
+são verificados no pool; needs_rehash os aponta para troca por bcrypt no
+próximo login.
+"""
+
+import os
+import re
+import time
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from profiling import add_time
+
+logger = logging.getLogger(__name__)
+
+_COST_PATTERN = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+_WERKZEUG_PREFIXES = ('pbkdf2:', 'scrypt:')
+
+class PasswordHasherBusy(Exception):
+    """Fila de hashing cheia; o cliente deve tentar novamente"""
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+def _check_werkzeug(password, hashed):
+    from werkzeug.security import check_password_hash
+    return check_password_hash(hashed, password)
+
+class PasswordHasher:
+    """Executa bcrypt em um pool de processos com admissão limitada"""
+
+    def __init__(self, rounds=12, workers=2, max_pending=8, admission_timeout=2.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.admission_timeout = admission_timeout
+        self.max_pending = max_pending
+        self.in_flight = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        """Cria o pool sob demanda, um por processo (seguro após fork)"""
+        if self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor_pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.admission_timeout):
+            self.rejected += 1
+            raise PasswordHasherBusy('Fila de verificação de senha cheia')
+
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            add_time('bcrypt', time.perf_counter() - start)
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def hash(self, password):
+        """Gera o hash bcrypt da senha com o custo configurado"""
+        return self._run(_hashpw, password.encode('utf-8'), self.rounds)
+
+    def check(self, password, hashed):
+        """Verifica a senha contra o hash armazenado"""
+        if not hashed:
+            return False
+        if hashed.startswith(_WERKZEUG_PREFIXES):
+            return self._run(_check_werkzeug, password, hashed)
+        try:
+            return self._run(_checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+        except ValueError:
+            # Hash armazenado inválido
+            return False
+
+    def stats(self):
+        """Ocupação do pool de hashing"""
+        return {
+            'workers': self.workers,
+            'in_flight': self.in_flight,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+            'saturation': round(self.in_flight / self.max_pending, 3) if self.max_pending else 0.0
+        }
+
+    def needs_rehash(self, hashed):
+        """Indica se o hash foi gerado com um custo diferente do atual"""
+        match = _COST_PATTERN.match(hashed or '')
+        return not match or int(match.group(1)) != self.rounds
+
+def create_password_hasher():
+    """Cria o hasher a partir das variáveis de ambiente
+
+    BCRYPT_ROUNDS: custo do bcrypt (padrão 12)
+    PASSWORD_WORKERS: processos do pool (0 executa na própria thread)
+    PASSWORD_MAX_PENDING: hashes simultâneos admitidos (em execução + fila)
+    PASSWORD_ADMISSION_TIMEOUT: segundos de espera por uma vaga antes de recusar
+    """
+    workers = int(os.environ.get('PASSWORD_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    hasher = PasswordHasher(
+        rounds=int(os.environ.get('BCRYPT_ROUNDS', 12)),
+        workers=workers,
+        max_pending=int(os.environ.get('PASSWORD_MAX_PENDING', max(1, workers) * 4)),
+        admission_timeout=float(os.environ.get('PASSWORD_ADMISSION_TIMEOUT', 2.0))
+    )
+    logger.info(f"Hashing de senhas: custo {hasher.rounds}, {workers} processo(s)")
+    return hasher
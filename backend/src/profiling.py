@@ -0,0 +1,119 @@
+"""
+Perfil de uma requisição específica, sob demanda, para administradores
+
+Quando um administrador envia o cabeçalho `X-Profile`, a requisição tem o
+tempo separado por categoria (Google Sheets, banco, serialização JSON,
+compressão, bcrypt e o restante em Python) e devolvido no cabeçalho
+`Server-Timing`, visível no DevTools do navegador.
+
+Com `X-Profile: cprofile` a requisição também é rastreada com cProfile e o
+arquivo .prof é salvo em PROFILE_DIR (nome no cabeçalho `X-Profile-Artifact`).
+
+Sem o cabeçalho nada é medido: as funções de registro só consultam uma
+ContextVar vazia.
+"""
+
+import os
+import time
+import cProfile
+import logging
+from contextvars import ContextVar
+from datetime import datetime
+
+from flask import request, g
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ('sheets', 'db', 'serialization', 'compression', 'bcrypt')
+
+_active_profile = ContextVar('active_profile', default=None)
+
+def add_time(category, seconds):
+    """Soma tempo a uma categoria, se a requisição atual estiver sendo perfilada"""
+    profile = _active_profile.get()
+    if profile is not None:
+        profile[category] = profile.get(category, 0.0) + seconds
+        profile[f'{category}_calls'] = profile.get(f'{category}_calls', 0) + 1
+
+def is_profiling():
+    return _active_profile.get() is not None
+
+def server_timing(profile, total):
+    """Monta o valor do cabeçalho Server-Timing (durações em ms)"""
+    parts = []
+    accounted = 0.0
+    for category in CATEGORIES:
+        seconds = profile.get(category, 0.0)
+        accounted += seconds
+        calls = profile.get(f'{category}_calls', 0)
+        parts.append(f'{category};dur={seconds * 1000:.1f};desc="{calls} chamada(s)"')
+    parts.append(f'app;dur={max(total - accounted, 0.0) * 1000:.1f}')
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+def init_profiling(app, is_admin):
+    """Instala o perfil por requisição
+
+    is_admin: função sem argumentos, chamada só quando o cabeçalho está
+    presente, que indica se o usuário da requisição é administrador.
+    """
+    header = os.environ.get('PROFILE_HEADER', 'X-Profile')
+    profile_dir = os.environ.get('PROFILE_DIR', os.path.join(os.getcwd(), 'profiles'))
+
+    @app.before_request
+    def _start_profile():
+        mode = request.headers.get(header)
+        if not mode:
+            return
+
+        try:
+            allowed = is_admin()
+        except Exception as e:
+            logger.warning(f"Perfil recusado: {str(e)}")
+            allowed = False
+        if not allowed:
+            return
+
+        g._profile_token = _active_profile.set({})
+        g._profile_start = time.perf_counter()
+
+        if mode.lower() == 'cprofile':
+            g._profiler = cProfile.Profile()
+            g._profiler.enable()
+
+    @app.after_request
+    def _finish_profile(response):
+        token = g.pop('_profile_token', None)
+        if token is None:
+            return response
+
+        total = time.perf_counter() - g.pop('_profile_start')
+        profiler = g.pop('_profiler', None)
+        profile = _active_profile.get()
+        _active_profile.reset(token)
+
+        response.headers['Server-Timing'] = server_timing(profile, total)
+
+        if profiler is not None:
+            profiler.disable()
+            try:
+                os.makedirs(profile_dir, exist_ok=True)
+                endpoint = (request.endpoint or 'sem_rota').replace('.', '_')
+                filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{endpoint}.prof"
+                profiler.dump_stats(os.path.join(profile_dir, filename))
+                response.headers['X-Profile-Artifact'] = filename
+            except OSError as e:
+                logger.error(f"Erro ao salvar perfil: {str(e)}")
+
+        logger.info(f"Perfil {request.method} {request.path}: {response.headers['Server-Timing']}")
+        return response
+
+    @app.teardown_request
+    def _discard_profile(exc):
+        # Requisições que terminaram em exceção não passam pelo after_request
+        token = g.pop('_profile_token', None)
+        if token is not None:
+            _active_profile.reset(token)
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            profiler.disable()
@@ -0,0 +1,108 @@
+"""
+Ranking das unidades por indicador (/api/indicadores/ranking)
+
+Para um mês (parâmetro periodo, AAAA-MM; padrão: mês atual), cada unidade
+com resultado recebe:
+
+- posicao: 1 + quantidade de unidades com resultado melhor (empates
+  dividem a posição)
+- percentil: percentual das demais unidades com resultado pior (100 é a
+  melhor, 0 a pior)
+- desvio: diferença para a média do hospital, na unidade do resultado
+
+Os resultados de todos os indicadores saem de uma passada só: uma
+consulta agrupada por indicador e unidade nos backends SQL, ou uma busca
+binária por indicador no armazenamento colunar da planilha. Cada
+indicador é ordenado uma vez e posições e percentis vêm de busca binária
+na lista ordenada. O ranking de cada mês fica em cache até a próxima
+escrita nos lançamentos.
+
+Operadores recebem só a linha da própria unidade (com a posição e o total
+de unidades ranqueadas), sem os resultados das demais.
+"""
+
+import operator
+from bisect import bisect_left, bisect_right
+
+from columnar import from_periodo, format_periodo
+
+def rank_units(valores, rank_key=operator.neg, media=None):
+    """Posição, percentil e desvio de cada unidade
+
+    valores: {unidade: resultado}, com None para unidades sem resultado
+    rank_key: função do resultado em que menor é melhor (padrão: quanto
+        maior o resultado, melhor)
+    media: referência do desvio (padrão: média simples dos resultados)
+
+    Devolve (media, linhas), com as linhas na ordem do ranking e as
+    unidades sem resultado no fim.
+    """
+    ordenados = sorted(
+        ((rank_key(valor), str(unidade), unidade, valor) for unidade, valor in valores.items() if valor is not None),
+        key=operator.itemgetter(0, 1)
+    )
+    chaves = [item[0] for item in ordenados]
+    total = len(ordenados)
+
+    if media is None and total:
+        media = sum(item[3] for item in ordenados) / total
+
+    linhas = []
+    for chave, _, unidade, valor in ordenados:
+        piores = total - bisect_right(chaves, chave)
+        linhas.append({
+            'unidade': unidade,
+            'resultado': valor,
+            'posicao': bisect_left(chaves, chave) + 1,
+            'percentil': round(piores / (total - 1) * 100, 1) if total > 1 else 100.0,
+            'desvio': round(valor - media, 4)
+        })
+
+    for unidade in sorted((u for u, valor in valores.items() if valor is None), key=str):
+        linhas.append({'unidade': unidade, 'resultado': None, 'posicao': None, 'percentil': None, 'desvio': None})
+
+    return (round(media, 4) if media is not None else None), linhas
+
+def for_unit(ranking, unidade):
+    """Ranking só com a linha de uma unidade (resposta dos operadores)"""
+    indicadores = []
+    for item in ranking['indicadores']:
+        item = dict(item)
+        item['unidades'] = [linha for linha in item['unidades'] if linha['unidade'] == unidade]
+        indicadores.append(item)
+    return dict(ranking, indicadores=indicadores)
+
+def sql_ranking(db, Lancamento, indicadores, periodo, rank_key=operator.neg):
+    """Ranking dos backends SQL, de uma única consulta agrupada
+
+    indicadores: dicionários de Indicador.to_dict(), na ordem da resposta.
+    O resultado de cada unidade é a soma dos seus lançamentos no mês.
+    """
+    from sqlalchemy import func
+
+    ano, mes = from_periodo(periodo)
+    query = db.session.query(
+        Lancamento.indicador_id,
+        Lancamento.unidade_id,
+        func.sum(Lancamento.valor)
+    ).filter(
+        Lancamento.ano == ano,
+        Lancamento.mes == mes
+    ).group_by(Lancamento.indicador_id, Lancamento.unidade_id)
+
+    valores = {}
+    for indicador_id, unidade_id, soma in query:
+        valores.setdefault(indicador_id, {})[unidade_id] = float(soma) if soma is not None else None
+
+    resposta = []
+    for indicador in indicadores:
+        unidades = valores.get(indicador['id'], {})
+        media, linhas = rank_units(unidades, rank_key)
+        resposta.append({
+            'indicador': indicador,
+            'media': media,
+            'unidades_ranqueadas': sum(1 for linha in linhas if linha['posicao'] is not None),
+            'unidades': linhas
+        })
+
+    return {'periodo': format_periodo(periodo), 'indicadores': resposta}
@@ -0,0 +1,164 @@
+"""
+Registros compactos das abas do Google Sheets
+
+get_all_records devolve um dict por linha, com as chaves repetidas em cada
+um. Aqui as linhas de get_all_values são decodificadas em objetos com
+__slots__ (sem __dict__ por instância) a partir de um cabeçalho
+compartilhado; o dict só é montado na hora de serializar a resposta.
+
+Os valores passam pela mesma conversão do gspread (números viram int ou
+float), de modo que o JSON produzido tem os mesmos valores de
+get_all_records. Colunas da aba fora de COLUMNS são mantidas em `extra` e
+vão para o dict depois das conhecidas (a ordem das chaves pode diferir da
+planilha); os arquivos de anos do archive.py guardam só COLUMNS.
+"""
+
+# Primeiros caracteres ASCII possíveis de um texto que int() ou float()
+# aceitam (os demais caracteres ASCII descartam o texto sem tentar)
+_NUMERIC_START = frozenset('0123456789+-. \t\n\r\x0b\x0c\x1c\x1d\x1e\x1fnNiI')
+
+def numericise(value):
+    """Converte texto numérico em int ou float, como o gspread
+
+    Mesmas regras de gspread.utils.numericise com os padrões de
+    get_all_records: textos com "_" ficam como estão e as vírgulas de
+    milhar são removidas antes da conversão.
+    """
+    if not isinstance(value, str) or '_' in value:
+        return value
+    cleaned = value.replace(',', '') if ',' in value else value
+    if cleaned == '' or (cleaned[0].isascii() and cleaned[0] not in _NUMERIC_START):
+        return value
+    try:
+        return int(cleaned)
+    except ValueError:
+        pass
+    try:
+        return float(cleaned)
+    except ValueError:
+        return value
+
+def records_as_dicts(rows):
+    """Mesmo resultado de get_all_records a partir das linhas da API
+
+    A API omite as células vazias no fim de cada linha; como no gspread, as
+    linhas são completadas até a largura da maior e os cabeçalhos precisam
+    ser únicos.
+    """
+    if not rows:
+        return []
+
+    width = max(len(row) for row in rows)
+    keys = list(rows[0]) + [''] * (width - len(rows[0]))
+    if len(set(keys)) != len(keys):
+        raise ValueError('Cabeçalhos repetidos na aba')
+    records = []
+    for row in rows[1:]:
+        if len(row) < width:
+            row = list(row) + [''] * (width - len(row))
+        records.append(dict(zip(keys, (numericise(value) for value in row))))
+    return records
+
+class SheetRecord:
+    """Base dos registros: COLUMNS liga cada cabeçalho da aba a um atributo
+
+    extra: dict das colunas da aba fora de COLUMNS, ou None se não há
+    """
+
+    __slots__ = ('extra',)
+    COLUMNS = ()
+
+    @classmethod
+    def decode(cls, rows):
+        """Decodifica o resultado de get_all_values (cabeçalho na primeira linha)"""
+        if not rows:
+            return ()
+
+        header = rows[0]
+        width = len(header)
+        positions = [
+            (attr, header.index(column) if column in header else None)
+            for column, attr in cls.COLUMNS
+        ]
+
+        known = {column for column, _ in cls.COLUMNS}
+        extras = [(column, index) for index, column in enumerate(header)
+                  if column and column not in known]
+
+        # Descritores dos slots: mais rápidos que setattr por campo
+        setters = [(getattr(cls, attr).__set__, index) for attr, index in positions]
+        set_extra = cls.extra.__set__
+
+        records = []
+        new = cls.__new__
+        for row in rows[1:]:
+            if len(row) < width:
+                row = list(row) + [''] * (width - len(row))
+            record = new(cls)
+            for setter, index in setters:
+                setter(record, numericise(row[index]) if index is not None else '')
+            set_extra(record, {column: numericise(row[index]) for column, index in extras} if extras else None)
+            records.append(record)
+        return tuple(records)
+
+    def values(self):
+        """Valores de COLUMNS, na ordem"""
+        return tuple(getattr(self, attr) for _, attr in self.COLUMNS)
+
+    def to_dict(self):
+        """Dict com os nomes das colunas da planilha (para o JSON)"""
+        data = {column: getattr(self, attr) for column, attr in self.COLUMNS}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __getstate__(self):
+        values = self.values()
+        return values + (self.extra,) if self.extra else values
+
+    def __setstate__(self, state):
+        for (_, attr), value in zip(self.COLUMNS, state):
+            setattr(self, attr, value)
+        self.extra = state[len(self.COLUMNS)] if len(state) > len(self.COLUMNS) else None
+
+    def __repr__(self):
+        fields = ', '.join(f'{attr}={getattr(self, attr)!r}' for _, attr in self.COLUMNS)
+        return f'{type(self).__name__}({fields})'
+
+class Lancamento(SheetRecord):
+    """Linha da aba Lancamentos"""
+
+    __slots__ = ('timestamp', 'email_usuario', 'id_unidade', 'indicador_nome',
+                 'mes', 'ano', 'valor_numerador', 'valor_denominador')
+    COLUMNS = (
+        ('Timestamp', 'timestamp'),
+        ('Email_Usuario', 'email_usuario'),
+        ('ID_Unidade', 'id_unidade'),
+        ('Indicador_Nome', 'indicador_nome'),
+        ('Mes', 'mes'),
+        ('Ano', 'ano'),
+        ('Valor_Numerador', 'valor_numerador'),
+        ('Valor_Denominador', 'valor_denominador')
+    )
+
+class LancamentoAgregado(SheetRecord):
+    """Soma de um indicador em todas as unidades ("Média Geral")"""
+
+    __slots__ = ('indicador_nome', 'id_unidade', 'mes', 'ano', 'valor_numerador', 'valor_denominador')
+    COLUMNS = (
+        ('Indicador_Nome', 'indicador_nome'),
+        ('ID_Unidade', 'id_unidade'),
+        ('Mes', 'mes'),
+        ('Ano', 'ano'),
+        ('Valor_Numerador', 'valor_numerador'),
+        ('Valor_Denominador', 'valor_denominador')
+    )
+
+    def __init__(self, indicador_nome, mes, ano):
+        self.indicador_nome = indicador_nome
+        self.id_unidade = 'Média Geral'
+        self.mes = mes
+        self.ano = ano
+        self.valor_numerador = 0
+        self.valor_denominador = 0
+        self.extra = None
@@ -0,0 +1,275 @@
+"""
+Acumulados móveis por indicador: últimos 12 meses e no ano (YTD)
+
+Para cada (indicador, unidade), e para (indicador, None) com a soma de
+todas as unidades, são guardadas as somas acumuladas de numerador e
+denominador mês a mês (prefix sums), em arrays densos a partir do primeiro
+mês com lançamento. Qualquer janela vira uma subtração:
+
+- mês p:            C[p] - C[p-1]
+- 12 meses até p:   C[p] - C[p-12]
+- no ano até p:     C[p] - C[dezembro do ano anterior]
+
+As leituras são O(1). Uma escrita soma o delta aos acumulados do mês
+lançado em diante; como os lançamentos são quase sempre do mês corrente,
+isso costuma ser uma ou poucas posições.
+
+Os acumulados são somas de numerador e denominador (a taxa é a razão das
+somas, não a média dos percentuais). Nos backends SQL, que guardam um
+único valor por lançamento, o numerador é o valor e o denominador é 1
+(a razão é a média dos valores na janela).
+
+Na API (/api/indicadores/acumulados) os parâmetros são periodo (AAAA-MM;
+padrão: mês atual) e unidade (padrão: todas as unidades somadas).
+
+Cada processo mantém a sua cópia em RollingStore, marcada com a versão do
+namespace do cache. O processo que grava aplica os deltas da escrita; os
+demais percebem a versão nova e reconstroem a partir da fonte. Os deltas
+só entram na cópia que existia antes da escrita: se ela foi reconstruída
+no meio (talvez já com a escrita), a cópia é descartada.
+"""
+
+import threading
+import logging
+from array import array
+from datetime import datetime
+
+from flask import request
+
+from columnar import to_periodo, from_periodo, format_periodo, parse_periodo
+
+logger = logging.getLogger(__name__)
+
+class _Acumulado:
+    """Somas acumuladas de numerador e denominador de uma série mensal"""
+
+    __slots__ = ('inicio', 'num', 'den')
+
+    def __init__(self, inicio):
+        self.inicio = inicio
+        self.num = array('d')
+        self.den = array('d')
+
+    def add(self, periodo, num, den):
+        if periodo < self.inicio:
+            # Lançamento anterior ao primeiro mês: desloca a série (raro)
+            shift = self.inicio - periodo
+            self.num = array('d', [0.0] * shift) + self.num
+            self.den = array('d', [0.0] * shift) + self.den
+            self.inicio = periodo
+
+        index = periodo - self.inicio
+        size = len(self.num)
+        if index >= size:
+            last_num = self.num[-1] if size else 0.0
+            last_den = self.den[-1] if size else 0.0
+            self.num.extend([last_num] * (index - size + 1))
+            self.den.extend([last_den] * (index - size + 1))
+
+        cum_num, cum_den = self.num, self.den
+        for i in range(index, len(cum_num)):
+            cum_num[i] += num
+            cum_den[i] += den
+
+    def at(self, periodo):
+        """(numerador, denominador) acumulados até o período, inclusive"""
+        index = periodo - self.inicio
+        if index < 0:
+            return 0.0, 0.0
+        if index >= len(self.num):
+            index = len(self.num) - 1
+        return self.num[index], self.den[index]
+
+    def window(self, inicio, fim):
+        """Somas entre os períodos inicio e fim, inclusive"""
+        num_fim, den_fim = self.at(fim)
+        num_antes, den_antes = self.at(inicio - 1)
+        return num_fim - num_antes, den_fim - den_antes
+
+class RollingWindows:
+    """Acumulados de todas as séries (indicador, unidade)"""
+
+    def __init__(self):
+        self._series = {}
+
+    def add(self, indicador, unidade, periodo, num, den):
+        """Soma um lançamento (ou delta) à unidade e à soma geral"""
+        for key in ((indicador, unidade), (indicador, None)):
+            serie = self._series.get(key)
+            if serie is None:
+                serie = self._series[key] = _Acumulado(periodo)
+            serie.add(periodo, num, den)
+
+    def get(self, indicador, unidade, periodo):
+        """Mês, últimos 12 meses e acumulado no ano até o período
+
+        unidade None é a soma de todas as unidades. Devolve None se a série
+        não tem lançamentos.
+        """
+        serie = self._series.get((indicador, unidade))
+        if serie is None:
+            return None
+        ano, _ = from_periodo(periodo)
+        return {
+            'mes': serie.window(periodo, periodo),
+            'ultimos_12_meses': serie.window(periodo - 11, periodo),
+            'ano': serie.window(to_periodo(ano, 1), periodo)
+        }
+
+    def indicadores(self):
+        return sorted({indicador for indicador, _ in self._series}, key=str)
+
+    def __len__(self):
+        return len(self._series)
+
+class RollingStore:
+    """Acumulados do processo, sincronizados pela versão do namespace
+
+    loader: função sem argumentos que devolve tuplas
+        (indicador, unidade, periodo, numerador, denominador)
+    signature: opcional; função sem argumentos com o que mais, além da
+        versão, muda a fonte (ex.: os arquivos de anos do archive.py)
+    """
+
+    def __init__(self, cache, namespace, loader, signature=None):
+        self.cache = cache
+        self.namespace = namespace
+        self.loader = loader
+        self.signature = signature or (lambda: None)
+        self._windows = None
+        self._version = None
+        self._signature = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Acumulados em dia com a versão atual (reconstrói se preciso)"""
+        version = self.cache.version(self.namespace)
+        signature = self.signature()
+        with self._lock:
+            if self._windows is not None and self._version == version and self._signature == signature:
+                return self._windows
+
+        windows = RollingWindows()
+        for indicador, unidade, periodo, num, den in self.loader():
+            windows.add(indicador, unidade, periodo, num, den)
+
+        with self._lock:
+            self._windows = windows
+            self._version = version
+            self._signature = signature
+            self._generation += 1
+        logger.info(f"Acumulados de '{self.namespace}' reconstruídos ({len(windows)} séries)")
+        return windows
+
+    def current(self):
+        """Acumulados em memória, se em dia com a versão atual; senão None
+
+        Não reconstrói: serve a quem só quer os acumulados se já estiverem
+        prontos (ex.: o push de alterações do stream.py).
+        """
+        version = self.cache.version(self.namespace)
+        signature = self.signature()
+        with self._lock:
+            if self._windows is not None and self._version == version and self._signature == signature:
+                return self._windows
+        return None
+
+    def begin_write(self):
+        """Marca lida antes de uma escrita, a ser passada a apply()
+
+        Guarda a versão do namespace e a cópia em memória no momento.
+        """
+        version = self.cache.version(self.namespace)
+        with self._lock:
+            return version, self._generation
+
+    def apply(self, mark, deltas):
+        """Aplica os deltas de uma escrita já confirmada e invalidada
+
+        mark: o retorno de begin_write() antes da escrita. Os deltas só são
+        aplicados se a cópia é a mesma de antes da escrita, na versão de
+        então, e a escrita foi a única no meio (versão + 1). Senão a cópia é
+        descartada e a próxima leitura reconstrói: uma reconstrução no meio
+        pode já ter lido a escrita, e somar os deltas a contaria duas vezes.
+        """
+        version_before, generation = mark
+        version_after = self.cache.version(self.namespace)
+        signature = self.signature()
+        with self._lock:
+            if self._windows is None:
+                return
+            if (self._generation != generation or self._version != version_before
+                    or version_after != version_before + 1 or self._signature != signature):
+                self._windows = None
+                self._version = None
+                return
+            for indicador, unidade, periodo, num, den in deltas:
+                self._windows.add(indicador, unidade, periodo, num, den)
+            self._version = version_after
+
+def changed_windows(windows, indicador, unidade, periodo):
+    """Janelas da unidade e da soma geral no período de um lançamento"""
+    return {
+        'indicador': indicador,
+        'unidade': unidade,
+        'periodo': format_periodo(periodo),
+        'janelas': windows.get(indicador, unidade, periodo),
+        'geral': windows.get(indicador, None, periodo)
+    }
+
+def periodo_param():
+    """Lê o parâmetro periodo (ValueError se inválido)"""
+    periodo = request.args.get('periodo')
+    if periodo:
+        return parse_periodo(periodo)
+    hoje = datetime.now()
+    return to_periodo(hoje.year, hoje.month)
+
+def sql_rows(db, Lancamento):
+    """Loader dos backends SQL: uma consulta agrupada por série e mês
+
+    O numerador é a soma dos valores e o denominador, a quantidade de
+    lançamentos (a razão é a média). As linhas vêm em ordem de período,
+    como os acumulados esperam (sem deslocar as séries).
+    """
+    from sqlalchemy import func
+
+    query = db.session.query(
+        Lancamento.indicador_id,
+        Lancamento.unidade_id,
+        Lancamento.ano,
+        Lancamento.mes,
+        func.sum(Lancamento.valor),
+        func.count(Lancamento.id)
+    ).group_by(
+        Lancamento.indicador_id, Lancamento.unidade_id, Lancamento.ano, Lancamento.mes
+    ).order_by(Lancamento.ano, Lancamento.mes)
+
+    for indicador_id, unidade_id, ano, mes, soma, quantidade in query:
+        yield indicador_id, unidade_id, to_periodo(ano, mes), float(soma or 0), quantidade
+
+def sql_acumulados_response(acumulados, indicadores, unidade_id, periodo):
+    """Corpo da resposta dos backends SQL
+
+    indicadores: dicionários de Indicador.to_dict(), na ordem da resposta
+    """
+    resposta = []
+    for indicador in indicadores:
+        janelas = acumulados.get(indicador['id'], unidade_id, periodo)
+        if janelas is None:
+            continue
+        item = {'indicador': indicador}
+        for chave, (soma, quantidade) in janelas.items():
+            item[chave] = {
+                'soma': round(soma, 4),
+                'quantidade': int(quantidade),
+                'media': round(soma / quantidade, 4) if quantidade else None
+            }
+        resposta.append(item)
+
+    return {
+        'periodo': format_periodo(periodo),
+        'unidade': 'Média Geral' if unidade_id is None else unidade_id,
+        'indicadores': resposta
+    }
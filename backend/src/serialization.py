@@ -0,0 +1,96 @@
+"""
+Serialização JSON das respostas
+
+Provider JSON do Flask que usa o orjson quando instalado (várias vezes mais
+rápido que o módulo json em listas grandes) e o json da biblioteca padrão
+como alternativa. Nos dois casos:
+
+- Decimal vira número e datetime/date viram ISO 8601 (rede de segurança;
+  os to_dict() dos modelos já convertem, pois os dicts também vão para o
+  changelog, as séries e o json da biblioteca padrão)
+- a saída é compacta e as chaves não são ordenadas
+- o tempo de serialização entra no perfil por requisição (X-Profile)
+
+JSON_ENCODER escolhe o codificador: auto (padrão), orjson ou stdlib.
+"""
+
+import os
+import json
+import time
+import uuid
+import dataclasses
+import logging
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+from profiling import add_time, is_profiling
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(obj):
+    """Tipos que nenhum dos codificadores trata nativamente"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date, dt_time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Objeto do tipo {type(obj).__name__} não é serializável em JSON')
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Provider JSON com orjson (ou json) e registro do tempo de serialização"""
+
+    sort_keys = False
+    compact = True
+
+    def __init__(self, app, encoder=None):
+        super().__init__(app)
+        encoder = (encoder or os.environ.get('JSON_ENCODER', 'auto')).lower()
+        if encoder == 'orjson' and orjson is None:
+            logger.warning("JSON_ENCODER=orjson, mas o orjson não está instalado; usando json")
+        self.use_orjson = orjson is not None and encoder in ('auto', 'orjson')
+
+    def _encode(self, obj, **kwargs):
+        """Serializa para bytes UTF-8"""
+        if self.use_orjson and not kwargs:
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=_default, option=option)
+
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', False)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, **kwargs).encode('utf-8')
+
+    def _timed_encode(self, obj, **kwargs):
+        if not is_profiling():
+            return self._encode(obj, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return self._encode(obj, **kwargs)
+        finally:
+            add_time('serialization', time.perf_counter() - start)
+
+    def dumps(self, obj, **kwargs):
+        return self._timed_encode(obj, **kwargs).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        """Resposta JSON sem a conversão intermediária para str"""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._timed_encode(obj) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,165 @@
+"""
+Séries mensais de um indicador (/api/indicadores/<id>/serie)
+
+Um gráfico de tendência de 12 ou 24 meses sai de uma única requisição, em
+vez de uma chamada a /api/lancamentos por mês. Parâmetros aceitos pelos
+três backends:
+
+- unidades: IDs separados por vírgula; "geral" inclui a Média Geral
+- fim: último mês da série (AAAA-MM; padrão: mês atual)
+- meses: quantidade de meses até fim (padrão 12, máximo SERIE_MAX_MESES)
+- inicio: primeiro mês (AAAA-MM), alternativa a meses
+
+Na planilha a série sai do armazenamento colunar (columnar.py); nos
+backends SQL, de uma única consulta agrupada por unidade e mês que usa o
+índice (ano, mes) de lancamentos.
+
+Nos três backends, cada série traz numerador e denominador do mês, e a
+Média Geral é a razão das somas de todas as unidades (Σnumerador /
+Σdenominador), não a média dos resultados das unidades. Nos backends SQL,
+como em rolling.py, o numerador é a soma dos valores e o denominador, a
+quantidade de lançamentos: o valor do mês é a média dos lançamentos, e a
+Média Geral, a média de todos os lançamentos do mês.
+"""
+
+import os
+from datetime import datetime
+
+from flask import request
+
+from columnar import to_periodo, from_periodo, format_periodo, parse_periodo
+
+GERAL = 'geral'
+
+class SerieRequest:
+    """Intervalo e unidades pedidos"""
+
+    __slots__ = ('inicio', 'fim', 'unidades', 'geral')
+
+    def __init__(self, inicio, fim, unidades, geral):
+        self.inicio = inicio
+        self.fim = fim
+        self.unidades = unidades
+        self.geral = geral
+
+    def periodos(self):
+        return [format_periodo(periodo) for periodo in range(self.inicio, self.fim + 1)]
+
+def serie_request(default_unidades=(GERAL,), parse_unidade=str):
+    """Lê os parâmetros da série (ValueError se inválidos)
+
+    parse_unidade converte cada ID recebido no tipo usado pelo backend.
+    """
+    max_meses = int(os.environ.get('SERIE_MAX_MESES', 120))
+
+    hoje = datetime.now()
+    fim = request.args.get('fim')
+    fim = parse_periodo(fim) if fim else to_periodo(hoje.year, hoje.month)
+
+    inicio = request.args.get('inicio')
+    if inicio:
+        inicio = parse_periodo(inicio)
+    else:
+        try:
+            meses = int(request.args.get('meses', 12))
+        except ValueError:
+            raise ValueError('Parâmetro meses deve ser um número inteiro')
+        if meses < 1:
+            raise ValueError('Parâmetro meses deve ser maior que zero')
+        inicio = fim - meses + 1
+
+    if inicio > fim:
+        raise ValueError('Parâmetro inicio deve ser anterior a fim')
+    if fim - inicio + 1 > max_meses:
+        raise ValueError(f'Série limitada a {max_meses} meses')
+
+    texto = request.args.get('unidades')
+    valores = [v.strip() for v in texto.split(',') if v.strip()] if texto else list(default_unidades)
+
+    geral = GERAL in valores
+    unidades = []
+    for valor in valores:
+        if valor == GERAL:
+            continue
+        try:
+            unidades.append(parse_unidade(valor))
+        except ValueError:
+            raise ValueError(f'Unidade inválida: {valor}')
+
+    return SerieRequest(inicio, fim, unidades, geral)
+
+def resultado(numerador, denominador):
+    """Percentual do mês (None sem denominador)"""
+    if numerador is None or not denominador:
+        return None
+    return round(numerador / denominador * 100, 2)
+
+def sql_series(db, Lancamento, indicador_id, pedido):
+    """Somas mensais por unidade, de uma única consulta agrupada
+
+    Devolve {unidade_id: (somas, quantidades)} com None nos meses sem
+    lançamento. Com pedido.geral, a consulta inclui todas as unidades e a
+    chave None traz as somas de todas elas em cada mês.
+    """
+    from sqlalchemy import func, tuple_, literal
+
+    ano_inicio, mes_inicio = from_periodo(pedido.inicio)
+    ano_fim, mes_fim = from_periodo(pedido.fim)
+
+    query = db.session.query(
+        Lancamento.unidade_id,
+        Lancamento.ano,
+        Lancamento.mes,
+        func.sum(Lancamento.valor),
+        func.count(Lancamento.id)
+    ).filter(
+        Lancamento.indicador_id == indicador_id,
+        # O intervalo de anos usa o índice (ano, mes); as comparações de
+        # tupla cortam os meses das pontas
+        Lancamento.ano.between(ano_inicio, ano_fim),
+        tuple_(Lancamento.ano, Lancamento.mes) >= tuple_(literal(ano_inicio), literal(mes_inicio)),
+        tuple_(Lancamento.ano, Lancamento.mes) <= tuple_(literal(ano_fim), literal(mes_fim))
+    )
+    if not pedido.geral:
+        query = query.filter(Lancamento.unidade_id.in_(pedido.unidades))
+    query = query.group_by(Lancamento.unidade_id, Lancamento.ano, Lancamento.mes)
+
+    tamanho = pedido.fim - pedido.inicio + 1
+    series = {unidade_id: ([None] * tamanho, [None] * tamanho) for unidade_id in pedido.unidades}
+    total = ([None] * tamanho, [None] * tamanho) if pedido.geral else None
+
+    for unidade_id, ano, mes, soma, quantidade in query:
+        posicao = to_periodo(ano, mes) - pedido.inicio
+        soma = float(soma or 0)
+        serie = series.get(unidade_id)
+        if serie is not None:
+            serie[0][posicao] = soma
+            serie[1][posicao] = quantidade
+        if total is not None:
+            total[0][posicao] = (total[0][posicao] or 0.0) + soma
+            total[1][posicao] = (total[1][posicao] or 0) + quantidade
+
+    if total is not None:
+        series[None] = total
+    return series
+
+def sql_serie_response(indicador, pedido, series):
+    """Corpo da resposta dos backends SQL"""
+    return {
+        'indicador': indicador.to_dict(),
+        'inicio': format_periodo(pedido.inicio),
+        'fim': format_periodo(pedido.fim),
+        'periodos': pedido.periodos(),
+        'series': [
+            {
+                'unidade': 'Média Geral' if unidade_id is None else unidade_id,
+                'numerador': somas,
+                'denominador': quantidades,
+                'valor': [
+                    round(soma / quantidade, 4) if quantidade else None
+                    for soma, quantidade in zip(somas, quantidades)
+                ]
+            }
+            for unidade_id, (somas, quantidades) in series.items()
+        ]
+    }
@@ -0,0 +1,172 @@
+"""
+Backends de sessão da aplicação
+
+SESSION_BACKEND escolhe onde a sessão fica guardada:
+
+- cookie: sessão assinada no próprio cookie (padrão do Flask, sem estado no servidor)
+- memory: store LRU em memória com expiração deslizante (um único worker)
+- redis: Flask-Session com Redis (compartilhado entre workers)
+- filesystem: Flask-Session em disco (comportamento antigo)
+"""
+
+import os
+import threading
+import time
+import secrets
+import logging
+from collections import OrderedDict
+from datetime import timedelta
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import Signer, BadSignature
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger(__name__)
+
+class MemorySession(CallbackDict, SessionMixin):
+    """Sessão mantida no store em memória"""
+
+    def __init__(self, initial=None, sid=None):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.modified = False
+
+class MemorySessionStore:
+    """Store LRU com expiração deslizante
+
+    As entradas ficam em ordem de último acesso, então as expiradas estão
+    sempre no início e a varredura para no primeiro item ainda válido.
+    """
+
+    def __init__(self, maxsize=10000, lifetime=86400):
+        self.maxsize = maxsize
+        self.lifetime = lifetime
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            self._sweep()
+            item = self._data.get(sid)
+            if item is None:
+                return None
+            data, _ = item
+            self._data[sid] = (data, time.monotonic() + self.lifetime)
+            self._data.move_to_end(sid)
+            return data
+
+    def set(self, sid, data):
+        with self._lock:
+            self._data[sid] = (data, time.monotonic() + self.lifetime)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def _sweep(self):
+        now = time.monotonic()
+        while self._data:
+            sid, (_, expires_at) = next(iter(self._data.items()))
+            if expires_at > now:
+                break
+            del self._data[sid]
+
+    def __len__(self):
+        return len(self._data)
+
+class MemorySessionInterface(SessionInterface):
+    """Interface de sessão que guarda os dados em um MemorySessionStore
+
+    O cookie carrega apenas o id da sessão assinado; nenhum acesso a disco
+    é feito por requisição.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or MemorySessionStore()
+
+    def _get_signer(self, app):
+        return Signer(app.secret_key, salt='memory-session', key_derivation='hmac')
+
+    def open_session(self, app, request):
+        signed_sid = request.cookies.get(self.get_cookie_name(app))
+        if not signed_sid:
+            return MemorySession(sid=secrets.token_urlsafe(32))
+
+        try:
+            sid = self._get_signer(app).unsign(signed_sid).decode('utf-8')
+        except BadSignature:
+            return MemorySession(sid=secrets.token_urlsafe(32))
+
+        data = self.store.get(sid)
+        if data is None:
+            return MemorySession(sid=secrets.token_urlsafe(32))
+        return MemorySession(dict(data), sid=sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        # Só regrava quando algo mudou; leituras não custam escrita
+        if not session.modified:
+            return
+
+        self.store.set(session.sid, dict(session))
+        signed_sid = self._get_signer(app).sign(session.sid.encode('utf-8')).decode('utf-8')
+        response.set_cookie(
+            name,
+            signed_sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+def configure_sessions(app):
+    """Configura o backend de sessão a partir de SESSION_BACKEND
+
+    Sem SESSION_BACKEND, usa Redis quando REDIS_URL existe e cookie
+    assinado caso contrário.
+    """
+    backend = os.environ.get('SESSION_BACKEND')
+    if not backend:
+        backend = 'redis' if os.environ.get('REDIS_URL') else 'cookie'
+    backend = backend.lower()
+
+    lifetime = app.config.get('PERMANENT_SESSION_LIFETIME', timedelta(hours=24))
+
+    if backend == 'cookie':
+        # SecureCookieSessionInterface padrão do Flask
+        pass
+    elif backend == 'memory':
+        store = MemorySessionStore(
+            maxsize=int(os.environ.get('SESSION_MEMORY_MAXSIZE', 10000)),
+            lifetime=lifetime.total_seconds()
+        )
+        app.session_interface = MemorySessionInterface(store)
+    elif backend in ('redis', 'filesystem'):
+        from flask_session import Session
+
+        app.config['SESSION_TYPE'] = backend
+        if backend == 'redis':
+            import redis
+            app.config['SESSION_REDIS'] = redis.Redis.from_url(os.environ['REDIS_URL'])
+        Session(app)
+    else:
+        raise ValueError(f"SESSION_BACKEND inválido: {backend}")
+
+    logger.info(f"Backend de sessão: {backend}")
+    return backend
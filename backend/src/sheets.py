@@ -0,0 +1,360 @@
+"""
+Acesso à planilha do Google Sheets
+
+GoogleSheetsManager lê e grava as abas com cache (cache.py). Fica fora do
+app.py para que jobs como o archive.py usem a planilha sem montar a
+aplicação web (rotas, hashing de senhas, stream).
+"""
+
+import os
+import json
+import logging
+import threading
+import zlib
+
+from metrics import track_sheets
+from records import records_as_dicts
+from warmstart import SheetDiskCache, marker_from_records, marker_from_rows
+
+logger = logging.getLogger(__name__)
+
+# Configurações do Google Sheets
+GOOGLE_SHEETS_CONFIG = {
+    'SPREADSHEET_ID': os.environ.get('GOOGLE_SPREADSHEET_ID', '1RXm-9-K_1H8GZjvNjnhpBvNnDQCejDMkBUPEKF26Too'),
+    'SCOPES': [
+        'https://www.googleapis.com/auth/spreadsheets',
+        'https://www.googleapis.com/auth/drive.file'
+    ]
+}
+
+
+class GoogleSheetsManager:
+    """Gerenciador de conexão com Google Sheets
+    
+    cache: o TwoLevelCache do processo (cache.py), onde ficam as abas lidas
+    
+    O cliente é criado no primeiro uso (ou pelo aquecimento em segundo
+    plano), e os módulos do Google só são importados nesse momento, para que
+    o servidor responda ao health check sem esperar a autorização.
+    
+    Com SHEETS_CACHE_DIR, as abas lidas também vão para o disco
+    (warmstart.py), e o aquecimento de um restart as reaproveita.
+    
+    No modo ASGI, as abas também chegam pela leitura assíncrona de
+    sheets_async.py, que as entrega a store_rows.
+    """
+    
+    def __init__(self, cache):
+        self.cache = cache
+        self._client = None
+        self._spreadsheet = None
+        self._lock = threading.Lock()
+        self._fingerprints = {}
+        directory = os.environ.get('SHEETS_CACHE_DIR')
+        self.disk_cache = SheetDiskCache(directory) if directory else None
+    
+    @property
+    def client(self):
+        if self._client is None:
+            self._initialize_client()
+        return self._client
+    
+    @property
+    def spreadsheet(self):
+        if self._spreadsheet is None:
+            self._initialize_client()
+        return self._spreadsheet
+    
+    @property
+    def is_ready(self):
+        """Indica se o cliente já foi inicializado, sem inicializá-lo"""
+        return self._spreadsheet is not None
+    
+    def _initialize_client(self):
+        """Inicializa o cliente Google Sheets"""
+        with self._lock:
+            if self._spreadsheet is not None:
+                return
+            
+            try:
+                # Importações pesadas adiadas para o primeiro uso
+                import gspread
+
+                # Servidor compatível com a API (ex.: planilha falsa local), sem credenciais
+                base_url = os.environ.get('SHEETS_API_BASE_URL')
+                if base_url:
+                    from sheets_api import BaseURLSession
+
+                    with track_sheets('open'):
+                        self._client = gspread.Client(None, session=BaseURLSession(base_url))
+                        self._spreadsheet = self._client.open_by_key(GOOGLE_SHEETS_CONFIG['SPREADSHEET_ID'])
+
+                    logger.info(f"Cliente Google Sheets inicializado em {base_url}")
+                    return
+
+                # Inicializa cliente
+                with track_sheets('open'):
+                    self._client = gspread.authorize(self._load_credentials())
+                    self._spreadsheet = self._client.open_by_key(GOOGLE_SHEETS_CONFIG['SPREADSHEET_ID'])
+                
+                logger.info("Cliente Google Sheets inicializado com sucesso")
+                
+            except Exception as e:
+                logger.error(f"Erro ao inicializar Google Sheets: {str(e)}")
+                self._client = None
+                self._spreadsheet = None
+    
+    def _load_credentials(self):
+        """Credenciais da conta de serviço (GOOGLE_CREDENTIALS_JSON ou arquivo)"""
+        from google.oauth2.service_account import Credentials
+
+        # Obtém credenciais do ambiente
+        credentials_json = os.environ.get('GOOGLE_CREDENTIALS_JSON')
+
+        if credentials_json:
+            # Parse das credenciais JSON
+            credentials_data = json.loads(credentials_json)
+            return Credentials.from_service_account_info(
+                credentials_data,
+                scopes=GOOGLE_SHEETS_CONFIG['SCOPES']
+            )
+
+        # Fallback para arquivo de credenciais
+        credentials_file = os.environ.get('GOOGLE_CREDENTIALS_FILE', 'credentials.json')
+        if os.path.exists(credentials_file):
+            return Credentials.from_service_account_file(
+                credentials_file,
+                scopes=GOOGLE_SHEETS_CONFIG['SCOPES']
+            )
+        raise Exception("Credenciais do Google não encontradas")
+    
+    def async_reader(self):
+        """Leitor assíncrono da mesma planilha (sheets_async.py), para o modo ASGI"""
+        from sheets_async import AsyncSheetsReader
+
+        base_url = os.environ.get('SHEETS_API_BASE_URL')
+        if base_url:
+            return AsyncSheetsReader(GOOGLE_SHEETS_CONFIG['SPREADSHEET_ID'], base_url=base_url)
+        return AsyncSheetsReader(GOOGLE_SHEETS_CONFIG['SPREADSHEET_ID'], credentials=self._load_credentials())
+    
+    def warm_up(self, sheet_names=()):
+        """Inicializa o cliente e pré-carrega planilhas no cache"""
+        if not self.spreadsheet:
+            return
+        
+        self.restore_from_disk()
+        for sheet_name in sheet_names:
+            self.get_all_records(sheet_name)
+        
+        logger.info("Aquecimento do Google Sheets concluído")
+    
+    def start_warm_up(self, sheet_names=()):
+        """Executa o aquecimento em segundo plano, sem bloquear o servidor"""
+        threading.Thread(
+            target=self.warm_up,
+            args=(sheet_names,),
+            name='sheets-warm-up',
+            daemon=True
+        ).start()
+    
+    def restore_from_disk(self):
+        """Põe no cache as abas gravadas em disco que continuam válidas"""
+        if self.disk_cache is None:
+            return
+        
+        entries = self.disk_cache.load()
+        if not entries:
+            return
+        with track_sheets('values_batch_get'):
+            valid = self.disk_cache.revalidate(self.spreadsheet, entries)
+        
+        for sheet_name, key, _, records in valid:
+            if key == 'records':
+                self._fingerprints[sheet_name] = zlib.crc32(repr(records).encode('utf-8'))
+            if self.cache.get(sheet_name, key) is None:
+                self.cache.set(sheet_name, key, records)
+        
+        stale = {entry[0] for entry in entries} - {entry[0] for entry in valid}
+        for sheet_name in stale:
+            self.disk_cache.discard(sheet_name)
+        logger.info(f"Cache em disco: {len(valid)} leitura(s) reaproveitada(s), "
+                    f"{len(stale)} aba(s) desatualizada(s)")
+    
+    def _save_to_disk(self, sheet_name, key, records, marker):
+        if self.disk_cache is not None:
+            self.disk_cache.save(sheet_name, key, records, marker)
+    
+    def ping(self):
+        """Chamada mínima à API, usada para medir a latência real"""
+        spreadsheet = self.spreadsheet
+        if not spreadsheet:
+            raise Exception("Google Sheets não inicializado")
+        with track_sheets('metadata'):
+            spreadsheet.fetch_sheet_metadata({'fields': 'spreadsheetId'})
+    
+    def get_worksheet(self, sheet_name):
+        """Obtém uma planilha específica"""
+        try:
+            spreadsheet = self.spreadsheet
+            if not spreadsheet:
+                return None
+            
+            with track_sheets('worksheet', sheet_name):
+                return spreadsheet.worksheet(sheet_name)
+        except Exception as e:
+            logger.error(f"Erro ao acessar planilha '{sheet_name}': {str(e)}")
+            return None
+    
+    def get_all_records(self, sheet_name):
+        """Obtém todos os registros de uma planilha (com cache)"""
+        try:
+            return self._load_once(sheet_name, 'records', lambda version: self._read_records(sheet_name, version)) or []
+        except Exception as e:
+            logger.error(f"Erro ao obter registros de '{sheet_name}': {str(e)}")
+            return []
+    
+    def get_records(self, sheet_name, record_type):
+        """Obtém as linhas de uma planilha como registros compactos (com cache)
+        
+        record_type: subclasse de records.SheetRecord
+        """
+        try:
+            key = f'records:{record_type.__name__}'
+            return self._load_once(sheet_name, key, lambda version: self._read_typed(sheet_name, record_type, version)) or ()
+        except Exception as e:
+            logger.error(f"Erro ao obter registros de '{sheet_name}': {str(e)}")
+            return ()
+    
+    def _load_once(self, sheet_name, key, reader):
+        """Valor em cache ou lido da planilha por uma só thread do processo
+        
+        As demais threads que pedem a mesma aba esperam a leitura em
+        andamento e encontram o resultado no cache. reader recebe a versão
+        do namespace lida antes da chamada à API.
+        """
+        records = self.cache.get(sheet_name, key)
+        if records is not None:
+            return records
+        
+        with self.cache.key_lock(sheet_name, key):
+            records = self.cache.get(sheet_name, key)
+            if records is not None:
+                return records
+            return reader(self.cache.version(sheet_name))
+    
+    def _read_records(self, sheet_name, version):
+        worksheet = self.get_worksheet(sheet_name)
+        if not worksheet:
+            return None
+        with track_sheets('get_all_records', sheet_name):
+            records = worksheet.get_all_records()
+        self._store_records(sheet_name, records, version)
+        return records
+    
+    def _read_typed(self, sheet_name, record_type, version):
+        worksheet = self.get_worksheet(sheet_name)
+        if not worksheet:
+            return None
+        with track_sheets('get_all_values', sheet_name):
+            rows = worksheet.get_all_values()
+        return self._store_typed(sheet_name, rows, record_type, version)
+    
+    def _store_records(self, sheet_name, records, version):
+        """Grava no cache uma leitura iniciada na versão `version` da aba
+        
+        Se uma escrita da aplicação invalidou a aba durante a leitura, as
+        linhas são de antes dela: são devolvidas a quem pediu, mas não vão
+        para o cache nem para o disco.
+        """
+        if self.cache.version(sheet_name) != version:
+            return
+        if self._detect_external_change(sheet_name, records):
+            # A própria detecção invalidou: as linhas lidas são as novas
+            version = self.cache.version(sheet_name)
+        if self.cache.set(sheet_name, 'records', records, version=version):
+            self._save_to_disk(sheet_name, 'records', records, marker_from_records(records))
+    
+    def _store_typed(self, sheet_name, rows, record_type, version):
+        key = f'records:{record_type.__name__}'
+        records = record_type.decode(rows)
+        if self.cache.set(sheet_name, key, records, version=version):
+            self._save_to_disk(sheet_name, key, records, marker_from_rows(rows))
+        return records
+    
+    def cache_version(self, sheet_name):
+        """Versão do cache da aba, lida antes de uma leitura feita fora do gspread"""
+        return self.cache.version(sheet_name)
+    
+    def store_rows(self, sheet_name, rows, record_type=None, version=None):
+        """Põe no cache uma aba lida fora do gspread (linhas da API, cabeçalho incluso)
+        
+        Sem record_type, como get_all_records; com ele, como get_records.
+        version: cache_version() lida antes da leitura.
+        """
+        if version is None:
+            version = self.cache.version(sheet_name)
+        if record_type is None:
+            self._store_records(sheet_name, records_as_dicts(rows), version)
+        else:
+            self._store_typed(sheet_name, rows, record_type, version)
+    
+    def is_cached(self, sheet_names):
+        """Indica se todas as abas estão em cache (sem consultar a API)"""
+        return all(self.cache.get(name, 'records') is not None for name in sheet_names)
+    
+    def is_cached_as(self, sheet_name, record_type=None):
+        """Indica se a aba está em cache na forma de get_all_records ou get_records"""
+        key = 'records' if record_type is None else f'records:{record_type.__name__}'
+        return self.cache.get(sheet_name, key) is not None
+    
+    def _detect_external_change(self, sheet_name, records):
+        """Invalida a aba se o conteúdo relido difere do da última leitura
+        
+        A planilha pode ser editada direto no Google Sheets; assim a versão
+        do namespace (e o ETag das respostas) acompanha essas edições.
+        Devolve se invalidou.
+        """
+        fingerprint = zlib.crc32(repr(records).encode('utf-8'))
+        previous = self._fingerprints.get(sheet_name)
+        self._fingerprints[sheet_name] = fingerprint
+        if previous is not None and previous != fingerprint:
+            logger.info(f"Aba '{sheet_name}' alterada fora da aplicação")
+            self.cache.invalidate(sheet_name)
+            return True
+        return False
+    
+    def invalidate(self, sheet_name):
+        """Descarta o cache de uma planilha em todos os workers"""
+        # A escrita já muda a versão; a próxima leitura não precisa comparar
+        self._fingerprints.pop(sheet_name, None)
+        if self.disk_cache is not None:
+            self.disk_cache.discard(sheet_name)
+        self.cache.invalidate(sheet_name)
+    
+    def append_row(self, sheet_name, row_data):
+        """Adiciona uma linha à planilha"""
+        try:
+            worksheet = self.get_worksheet(sheet_name)
+            if worksheet:
+                with track_sheets('append_row', sheet_name):
+                    worksheet.append_row(row_data)
+                self.invalidate(sheet_name)
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao adicionar linha em '{sheet_name}': {str(e)}")
+            return False
+    
+    def update_cell(self, sheet_name, row, col, value):
+        """Atualiza uma célula específica"""
+        try:
+            worksheet = self.get_worksheet(sheet_name)
+            if worksheet:
+                with track_sheets('update_cell', sheet_name):
+                    worksheet.update_cell(row, col, value)
+                self.invalidate(sheet_name)
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao atualizar célula em '{sheet_name}': {str(e)}")
+            return False
@@ -0,0 +1,24 @@
+"""
+Sessão HTTP do gspread apontada para outro servidor da API do Sheets
+
+Com SHEETS_API_BASE_URL definido, as chamadas que o gspread faria para
+https://sheets.googleapis.com vão para o endereço configurado, por exemplo
+o servidor local de benchmarks/fake_sheets_server.py. O servidor local não
+exige credenciais.
+"""
+
+import requests
+
+GOOGLE_SHEETS_BASE_URL = 'https://sheets.googleapis.com'
+
+class BaseURLSession(requests.Session):
+    """requests.Session que reescreve o endereço da API do Google Sheets"""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, url, *args, **kwargs):
+        if url.startswith(GOOGLE_SHEETS_BASE_URL):
+            url = self.base_url + url[len(GOOGLE_SHEETS_BASE_URL):]
+        return super().request(method, url, *args, **kwargs)
@@ -0,0 +1,214 @@
+"""
+Leitura assíncrona das abas do Google Sheets (modo ASGI)
+
+No modo ASGI (asgi.py), as abas que uma rota vai ler e que não estão no
+cache são buscadas aqui, com um cliente HTTP assíncrono (httpx), antes de
+a view rodar numa thread. Enquanto a API do Google responde, a requisição
+espera no event loop sem ocupar thread; a view encontra tudo no cache e só
+faz o trabalho de CPU.
+
+- As abas que faltam a uma requisição vêm numa única chamada
+  values.batchGet.
+- Requisições simultâneas que precisam da mesma aba esperam pela mesma
+  leitura (uma só chamada à API).
+- Os registros vão para o cache pelo GoogleSheetsManager, com a mesma
+  detecção de edição externa e o mesmo cache em disco da leitura síncrona.
+
+Se a leitura assíncrona falhar (cota, rede), a requisição segue mesmo assim
+e a view lê a aba pelo gspread, como no modo síncrono.
+
+Dependência opcional: httpx. Sem ela, o modo ASGI continua funcionando,
+mas as abas são lidas pelas views.
+"""
+
+import re
+import asyncio
+import logging
+from urllib.parse import quote
+
+from metrics import track_sheets
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_SHEETS_BASE_URL = 'https://sheets.googleapis.com'
+
+def range_title(range_name):
+    """Título da aba em uma faixa A1 ("'Aba X'!A1:H30" -> "Aba X")"""
+    title = range_name.rpartition('!')[0] if '!' in range_name else range_name
+    if len(title) >= 2 and title[0] == title[-1] == "'":
+        title = title[1:-1].replace("''", "'")
+    return title
+
+class AsyncSheetsReader:
+    """values.batchGet da API REST v4 com cliente HTTP assíncrono"""
+
+    def __init__(self, spreadsheet_id, base_url=GOOGLE_SHEETS_BASE_URL, credentials=None,
+                 timeout=30.0, max_connections=20):
+        self.spreadsheet_id = spreadsheet_id
+        self.base_url = base_url.rstrip('/')
+        self.credentials = credentials
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections)
+        )
+        self._refresh_lock = asyncio.Lock()
+
+    async def _headers(self):
+        if self.credentials is None:
+            return {}
+        # O refresh do google-auth é síncrono: roda numa thread
+        async with self._refresh_lock:
+            if not self.credentials.valid:
+                from google.auth.transport.requests import Request
+                await asyncio.to_thread(self.credentials.refresh, Request())
+        return {'Authorization': f'Bearer {self.credentials.token}'}
+
+    async def batch_get(self, sheet_names):
+        """Linhas de cada aba ({aba: linhas}), como em get_all_values"""
+        ranges = [f"'{name.replace(chr(39), chr(39) * 2)}'" for name in sheet_names]
+        url = f'{self.base_url}/v4/spreadsheets/{quote(self.spreadsheet_id)}/values:batchGet'
+
+        with track_sheets('values_batch_get', ','.join(sheet_names)):
+            response = await self._client.get(url, params=[('ranges', r) for r in ranges],
+                                              headers=await self._headers())
+            response.raise_for_status()
+
+        # Cada valueRange é ligado à aba pelo título em "range", nunca pela
+        # posição: uma resposta incompleta não pode virar uma aba vazia no cache
+        result = {}
+        for value_range in response.json().get('valueRanges', []):
+            result[range_title(value_range.get('range', ''))] = value_range.get('values', [])
+        missing = [name for name in sheet_names if name not in result]
+        if missing:
+            raise ValueError(f"Resposta do batchGet sem as abas {', '.join(missing)}")
+        return {name: result[name] for name in sheet_names}
+
+    async def aclose(self):
+        await self._client.aclose()
+
+class AsyncSheetsLoader:
+    """Garante no cache as abas de uma requisição, sem leituras repetidas
+
+    manager: GoogleSheetsManager (is_cached_as, cache_version e store_rows)
+    reader_factory: função sem argumentos que cria o AsyncSheetsReader
+    """
+
+    def __init__(self, manager, reader_factory):
+        self.manager = manager
+        self.reader_factory = reader_factory
+        self._reader = None
+        self._pending = {}
+        self._tasks = set()
+
+    def _missing(self, wanted):
+        return [(name, record_type) for name, record_type in wanted
+                if not self.manager.is_cached_as(name, record_type)]
+
+    async def ensure(self, wanted):
+        """Carrega as abas de `wanted` (pares (aba, record_type)) que faltam"""
+        # A consulta ao cache pode ir ao Redis: fora do event loop
+        missing = await asyncio.to_thread(self._missing, wanted)
+        if not missing:
+            return
+
+        loop = asyncio.get_running_loop()
+        to_fetch = []
+        futures = []
+        for name, record_type in missing:
+            if name not in self._pending:
+                self._pending[name] = (loop.create_future(), set())
+                to_fetch.append(name)
+            future, record_types = self._pending[name]
+            record_types.add(record_type)
+            futures.append((name, record_type, future))
+        if to_fetch:
+            task = loop.create_task(self._fetch(to_fetch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        for name, record_type, future in futures:
+            try:
+                # shield: a desconexão de um cliente não cancela a leitura dos outros
+                rows, version, stored = await asyncio.shield(future)
+            except Exception:
+                # A view lê a aba pelo gspread
+                continue
+            if record_type not in stored:
+                # Pedido depois que a leitura já estava sendo gravada no cache
+                await asyncio.to_thread(self._store, name, rows, record_type, version)
+
+    def _store(self, name, rows, record_type, version):
+        if not self.manager.is_cached_as(name, record_type):
+            self.manager.store_rows(name, rows, record_type, version=version)
+
+    def _store_all(self, result, versions, record_types):
+        for name, types in record_types.items():
+            for record_type in types:
+                self._store(name, result[name], record_type, versions[name])
+
+    def _versions(self, names):
+        return {name: self.manager.cache_version(name) for name in names}
+
+    async def _fetch(self, names):
+        try:
+            if self._reader is None:
+                self._reader = await asyncio.to_thread(self.reader_factory)
+            # Versões lidas antes da chamada: uma escrita no meio descarta a leitura
+            versions = await asyncio.to_thread(self._versions, names)
+            result = await self._reader.batch_get(names)
+            # Os registros entram no cache antes de liberar as requisições
+            record_types = {name: frozenset(self._pending[name][1]) for name in names}
+            await asyncio.to_thread(self._store_all, result, versions, record_types)
+        except Exception as e:
+            logger.warning(f"Leitura assíncrona de {', '.join(names)} falhou: {str(e)}")
+            result = e
+        for name in names:
+            future, _ = self._pending.pop(name)
+            if isinstance(result, Exception):
+                future.set_exception(result)
+                # Evita o aviso de exceção não consumida quando ninguém espera
+                future.exception()
+            else:
+                future.set_result((result[name], versions[name], record_types[name]))
+
+    async def aclose(self):
+        if self._reader is not None:
+            await self._reader.aclose()
+            self._reader = None
+
+class RoutePrefetch:
+    """Hook `prefetch` do asgi.py: carrega as abas que a rota vai ler
+
+    routes: pares (regex do caminho, [(aba, record_type)])
+    authenticated: abas lidas por toda requisição com Authorization
+    """
+
+    def __init__(self, loader, routes, authenticated=()):
+        self.loader = loader
+        self.routes = [(re.compile(pattern), sheets) for pattern, sheets in routes]
+        self.authenticated = list(authenticated)
+
+    async def __call__(self, scope):
+        wanted = []
+        for pattern, sheets in self.routes:
+            if pattern.match(scope['path']):
+                wanted.extend(sheets)
+        if self.authenticated and any(name == b'authorization' for name, _ in scope.get('headers', [])):
+            wanted.extend(self.authenticated)
+        if wanted:
+            await self.loader.ensure(list(dict.fromkeys(wanted)))
+
+    async def aclose(self):
+        await self.loader.aclose()
+
+def create_route_prefetch(manager, routes, authenticated=()):
+    """RoutePrefetch sobre o GoogleSheetsManager; None sem httpx"""
+    if httpx is None:
+        logger.info("httpx não instalado: no modo ASGI as abas são lidas pelas views")
+        return None
+    return RoutePrefetch(AsyncSheetsLoader(manager, manager.async_reader), routes, authenticated)
@@ -0,0 +1,238 @@
+"""
+Snapshot do armazenamento colunar em arquivo mapeado em memória
+
+Sem snapshot, cada worker do gunicorn monta e guarda a sua cópia dos
+lançamentos em colunas (columnar.py), e a memória cresce com o número de
+workers. Com SNAPSHOT_DIR configurado, as colunas são gravadas uma vez num
+arquivo e cada worker o mapeia somente leitura (mmap): as colunas viram
+memoryviews sobre as páginas do arquivo, sem cópia, e todos os workers
+compartilham as mesmas páginas do cache do sistema operacional. Um worker
+novo (ou um restart) mapeia o arquivo existente e já começa aquecido.
+
+Formato (nativo da máquina, não portável):
+
+- MAGIC e 4 bytes com o tamanho do cabeçalho JSON
+- cabeçalho: chave de validade, dicionários de indicadores e unidades
+  (os textos) e a posição/tipo de cada coluna
+- colunas numéricas cruas, alinhadas em 8 bytes
+
+A chave de validade é a época e a versão do namespace Lancamentos no cache,
+mais a assinatura dos anos arquivados: quando uma escrita invalida o
+namespace, o primeiro worker que precisar das colunas reconstrói o arquivo
+(com um lock de arquivo, para não reconstruírem todos ao mesmo tempo), e
+os demais passam a mapeá-lo. A troca é atômica (os.replace): quem ainda
+lê o arquivo anterior continua com as páginas dele até soltar o mapa.
+
+O compartilhamento entre workers depende de uma época comum, ou seja, do
+Redis (REDIS_URL); sem ele cada processo tem a sua época e o snapshot
+serve só ao próprio processo.
+
+Um arquivo ilegível (truncado, cabeçalho corrompido) é reconstruído. Se
+ainda assim não for possível gravá-lo ou mapeá-lo (disco cheio, diretório
+somente leitura), o processo usa uma cópia das colunas em memória até a
+próxima mudança de chave.
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+import logging
+import threading
+from array import array
+
+from columnar import ColumnarLancamentos
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'GICOL\x01\n\x00'
+SNAPSHOT_FILE = 'lancamentos.colsnap'
+
+# Coluna: typecode do array gravado
+_COLUMNS = (
+    ('offsets', 'q'),
+    ('periodo', 'i'),
+    ('unidade', 'i'),
+    ('numerador', 'd'),
+    ('denominador', 'd')
+)
+
+def _align(value, size=8):
+    return (value + size - 1) // size * size
+
+def write_snapshot(path, columnar, chave):
+    """Grava as colunas num arquivo novo e o troca atomicamente pelo atual"""
+    blocos = []
+    colunas = {}
+    posicao = 0
+    for nome, typecode in _COLUMNS:
+        data = array(typecode, getattr(columnar, nome)).tobytes()
+        colunas[nome] = {'tipo': typecode, 'inicio': posicao, 'bytes': len(data)}
+        blocos.append(data + b'\x00' * (_align(len(data)) - len(data)))
+        posicao += _align(len(data))
+
+    header = json.dumps({
+        'chave': chave,
+        'byteorder': sys.byteorder,
+        'indicadores': columnar.indicadores,
+        'unidades': columnar.unidades,
+        'colunas': colunas
+    }, ensure_ascii=False).encode('utf-8')
+    prefixo = MAGIC + struct.pack('<I', len(header)) + header
+    prefixo += b'\x00' * (_align(len(prefixo)) - len(prefixo))
+
+    temp = f'{path}.{os.getpid()}.tmp'
+    with open(temp, 'wb') as f:
+        f.write(prefixo)
+        for bloco in blocos:
+            f.write(bloco)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+class Snapshot:
+    """Um arquivo de snapshot mapeado, com as colunas como memoryviews"""
+
+    __slots__ = ('chave', 'columnar', 'identity', '_mmap')
+
+    def __init__(self, chave, columnar, identity, mapped):
+        self.chave = chave
+        self.columnar = columnar
+        self.identity = identity
+        self._mmap = mapped
+
+    @classmethod
+    def open(cls, path):
+        """Mapeia o arquivo (ValueError se inválido, truncado ou de outra arquitetura)"""
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            columnar, chave = cls._parse(mapped)
+        except ValueError:
+            mapped.close()
+            raise
+        except (KeyError, TypeError, struct.error) as e:
+            mapped.close()
+            raise ValueError(f'Snapshot inválido: {str(e)}')
+        return cls(chave, columnar, (stat.st_dev, stat.st_ino), mapped)
+
+    @staticmethod
+    def _parse(mapped):
+        if mapped[:len(MAGIC)] != MAGIC:
+            raise ValueError('Snapshot inválido')
+        (size,) = struct.unpack('<I', mapped[len(MAGIC):len(MAGIC) + 4])
+        inicio = len(MAGIC) + 4
+        if inicio + size > len(mapped):
+            raise ValueError('Snapshot truncado')
+        header = json.loads(mapped[inicio:inicio + size].decode('utf-8'))
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError('Snapshot gravado em outra arquitetura')
+        base = _align(inicio + size)
+
+        view = memoryview(mapped)
+        colunas = {}
+        for nome, typecode in _COLUMNS:
+            info = header['colunas'][nome]
+            start = base + info['inicio']
+            if info['tipo'] != typecode or start + info['bytes'] > len(mapped):
+                raise ValueError('Snapshot truncado')
+            colunas[nome] = view[start:start + info['bytes']].cast(typecode)
+
+        columnar = ColumnarLancamentos(
+            indicadores=header['indicadores'],
+            unidades=header['unidades'],
+            **colunas
+        )
+        return columnar, header['chave']
+
+class SnapshotStore:
+    """Snapshot do processo, trocado quando o arquivo ou a chave mudam
+
+    builder: função sem argumentos que devolve um ColumnarLancamentos novo
+    """
+
+    def __init__(self, directory, builder):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, SNAPSHOT_FILE)
+        self.builder = builder
+        self._current = None
+        self._fallback = None
+        self._lock = threading.Lock()
+
+    def _disk_identity(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_dev, stat.st_ino)
+
+    def _map_disk(self):
+        """Mapeia o arquivo em disco, se for outro que não o atual"""
+        identity = self._disk_identity()
+        if identity is None:
+            return None
+        current = self._current
+        if current is not None and current.identity == identity:
+            return current
+        try:
+            snapshot = Snapshot.open(self.path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Snapshot colunar ilegível: {str(e)}")
+            return None
+        self._current = snapshot
+        return snapshot
+
+    def get(self, chave):
+        """Colunas válidas para a chave, mapeando ou reconstruindo o arquivo
+
+        Sem arquivo utilizável, devolve (e guarda) uma cópia em memória.
+        """
+        current = self._current
+        if current is not None and current.chave == chave:
+            return current.columnar
+        fallback = self._fallback
+        if fallback is not None and fallback[0] == chave:
+            return fallback[1]
+
+        with self._lock:
+            snapshot = self._map_disk()
+            if snapshot is not None and snapshot.chave == chave:
+                return snapshot.columnar
+
+            columnar = None
+            try:
+                # Um worker reconstrói; os demais esperam no lock e mapeiam
+                with open(f'{self.path}.lock', 'w') as lock_file:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        snapshot = self._map_disk()
+                        if snapshot is None or snapshot.chave != chave:
+                            columnar = self.builder()
+                            write_snapshot(self.path, columnar, chave)
+                            logger.info(f"Snapshot colunar reconstruído ({chave})")
+                            snapshot = self._map_disk()
+                    finally:
+                        if fcntl is not None:
+                            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            except OSError as e:
+                logger.warning(f"Erro ao gravar o snapshot colunar: {str(e)}")
+                snapshot = None
+
+            if snapshot is not None and snapshot.chave == chave:
+                self._fallback = None
+                return snapshot.columnar
+
+            logger.warning("Snapshot colunar indisponível, usando cópia em memória")
+            if columnar is None:
+                columnar = self.builder()
+            self._fallback = (chave, columnar)
+            return columnar
@@ -0,0 +1,367 @@
+"""
+Push das alterações para os dashboards abertos (Server-Sent Events)
+
+Sem push, um dashboard só vê lançamentos novos chamando a listagem de novo.
+GET /api/stream é uma rota da própria API (mesma porta, mesmo CORS): cada
+dashboard conectado recebe as alterações do log (changes.py) que ele pode
+ver, filtradas por unidade e período:
+
+    GET /api/stream?token=<token do stream>[&unidade=3][&periodo=2025-03][&since=<cursor>]
+
+O EventSource do navegador não envia cabeçalhos, por isso o token vai na
+query string, que acaba em logs de acesso e de proxies. Ali só vale um
+token curto do stream (escopo STREAM_SCOPE, SSE_TOKEN_TTL segundos), pedido
+numa rota autenticada da API (/api/stream/token) logo antes de conectar; o
+JWT da sessão é recusado na query string e não serve mais que isso. Clientes
+fora do navegador podem mandar o JWT da sessão em Authorization: Bearer.
+
+Eventos:
+
+- conectado: cursor atual do log (id do evento)
+- alteracao: uma entrada do log; lançamentos levam também, em
+  "agregados", o mês, os últimos 12 meses e o ano do indicador na unidade
+  e na soma geral (com o status do mês), quando os acumulados já estão em
+  memória no processo que gravou (rolling.py)
+- recarregar: o cursor pedido não está mais no log; recarregue as listagens
+
+O id de cada evento é o cursor do log: ao reconectar, o navegador manda
+Last-Event-ID e as alterações perdidas no meio são reenviadas do log antes
+das novas.
+
+Cada conexão aberta ocupa uma thread do servidor (worker gthread do
+gunicorn, ou uma thread do pool no modo ASGI) enquanto durar: o número de
+conexões por processo é limitado por SSE_MAX_CLIENTS, que deve ficar bem
+abaixo das threads disponíveis para a API. Cada assinante tem uma fila de
+QUEUE_SIZE eventos; cada evento é serializado uma vez e posto na fila de
+todos os assinantes. Um cliente que não consome (fila cheia) é
+desconectado e recupera o atraso pelo Last-Event-ID ao reconectar.
+
+Nada é aberto ao importar o módulo: scripts (archive.py) e o processo
+mestre do gunicorn --preload não criam threads nem sockets. Com REDIS_URL,
+as alterações são repassadas em JSON pelo canal STREAM_CHANNEL, e cada
+processo entrega aos seus assinantes as alterações gravadas em qualquer
+worker; a thread que escuta o canal só é criada na primeira conexão. Sem
+Redis, só com um worker: com mais de um, o log fica desativado
+(changes.py) e o stream responde 503.
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from datetime import timedelta
+
+from flask import Response, request
+
+from columnar import to_periodo, parse_periodo
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHANNEL = 'gi:stream'
+QUEUE_SIZE = 1000
+REPLAY_LIMIT = 500
+
+# Claim dos tokens do stream: só valem para conectar ao stream
+STREAM_SCOPE_CLAIM = 'escopo'
+STREAM_SCOPE = 'stream'
+
+class StreamError(ValueError):
+    """Parâmetros do stream inválidos (resposta 400)"""
+
+class StreamUnauthorized(PermissionError):
+    """Token do stream inválido ou ausente (resposta 401)"""
+
+class StreamUnavailable(RuntimeError):
+    """Stream desativado ou sem vagas (resposta 503)"""
+
+def stream_token_claims():
+    """Claims adicionais e validade do token do stream (create_access_token)"""
+    return {STREAM_SCOPE_CLAIM: STREAM_SCOPE}, timedelta(seconds=int(os.environ.get('SSE_TOKEN_TTL', 60)))
+
+def is_stream_token(claims):
+    """Se as claims decodificadas são de um token do stream"""
+    return claims.get(STREAM_SCOPE_CLAIM) == STREAM_SCOPE
+
+def entry_periodo(entry):
+    """Período (to_periodo) de uma alteração com ano e mês, ou None"""
+    dados = entry.get('dados') or {}
+    ano = dados.get('ano', dados.get('Ano'))
+    mes = dados.get('mes', dados.get('Mes'))
+    if type(ano) is int and type(mes) is int and 1 <= mes <= 12:
+        return to_periodo(ano, mes)
+    return None
+
+def _event(name, data, id=None):
+    lines = []
+    if id is not None:
+        lines.append(f'id: {id}')
+    lines.append(f'event: {name}')
+    lines.append(f'data: {data}')
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+class Subscriber:
+    """Um dashboard conectado, os seus filtros e a sua fila de eventos"""
+
+    __slots__ = ('visible', 'unidade', 'periodo', 'queue', 'dropped')
+
+    def __init__(self, visible, unidade, periodo, queue_size=QUEUE_SIZE):
+        self.visible = visible
+        self.unidade = unidade
+        self.periodo = periodo
+        # (id da entrada, evento) das alterações ao vivo
+        self.queue = queue.Queue(queue_size)
+        self.dropped = False
+
+    def accepts(self, entry, periodo):
+        if self.unidade is not None and entry['unidade'] not in (None, self.unidade):
+            return False
+        if self.periodo is not None and periodo not in (None, self.periodo):
+            return False
+        return self.visible(entry)
+
+class EventStream:
+    """Corpo da resposta de um assinante; close() o desconecta
+
+    O servidor WSGI chama close() ao fim da resposta, inclusive quando o
+    cliente cai antes do primeiro evento (o finally de um gerador que nunca
+    rodou não é executado).
+    """
+
+    def __init__(self, hub, subscriber, since):
+        self.hub = hub
+        self.subscriber = subscriber
+        self._events = hub._events(subscriber, since)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._events)
+
+    def close(self):
+        self._events.close()
+        self.hub._disconnect(self.subscriber)
+
+class StreamHub:
+    """Assinantes do stream no processo e difusão das alterações do log
+
+    authenticate(token, params, query): devolve (visible, unidade) do
+        usuário, ou None se o token não vale. query indica que o token veio
+        na query string: aí só vale um token do stream (is_stream_token).
+        visible é o filtro de changes.visibility; unidade é a unidade a
+        filtrar (None = todas), já restrita à do usuário quando ele não
+        pode ver as demais.
+    encode: serializa em JSON (str), ex.: app.json.dumps
+    enrich: opcional; acrescenta chaves à entrada antes do envio. Roda no
+        processo e na thread que gravou a alteração.
+    """
+
+    def __init__(self, changelog, authenticate, encode, enrich=None, redis_client=None,
+                 heartbeat=25, max_clients=50, queue_size=QUEUE_SIZE):
+        self.changelog = changelog
+        self.authenticate = authenticate
+        self.encode = encode
+        self.enrich = enrich
+        self.redis = redis_client
+        self.heartbeat = heartbeat
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._listener = None
+        self.sent = 0
+        self.dropped = 0
+        changelog.subscribe(self.publish)
+
+    @property
+    def unavailable(self):
+        """Motivo, se o stream está desativado (None = disponível)"""
+        if self.changelog.unavailable:
+            return self.changelog.unavailable
+        if self.max_clients < 1:
+            return 'Stream de alterações desativado'
+        return None
+
+    def stats(self):
+        return {'clients': len(self._clients), 'max_clients': self.max_clients,
+                'sent': self.sent, 'dropped': self.dropped}
+
+    # Lado de quem grava
+
+    def publish(self, entry, cursor):
+        """Listener do ChangeLog: difunde a alteração a todos os processos"""
+        if self.enrich is not None:
+            try:
+                self.enrich(entry)
+            except Exception as e:
+                logger.warning(f"Erro ao completar alteração para o stream: {str(e)}")
+
+        if self.redis is not None:
+            try:
+                self.redis.publish(STREAM_CHANNEL, self.encode([entry, cursor]))
+                return
+            except Exception as e:
+                logger.warning(f"Falha ao publicar alteração no Redis: {str(e)}")
+        self._broadcast(entry, cursor)
+
+    def _broadcast(self, entry, cursor):
+        with self._lock:
+            clients = list(self._clients)
+        if not clients:
+            return
+        periodo = entry_periodo(entry)
+        data = None
+        for subscriber in clients:
+            if not subscriber.accepts(entry, periodo):
+                continue
+            if data is None:
+                data = _event('alteracao', self.encode(entry), cursor)
+            try:
+                subscriber.queue.put_nowait((entry['id'], data))
+            except queue.Full:
+                # Cliente lento: desconecta; ele reconecta com Last-Event-ID
+                if not subscriber.dropped:
+                    subscriber.dropped = True
+                    self.dropped += 1
+                    self._disconnect(subscriber)
+
+    def _start_listener(self):
+        """Escuta o canal do Redis (uma thread por processo, na primeira conexão)"""
+        if self.redis is None or self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen_redis, name='sse-stream-redis', daemon=True)
+                self._listener.start()
+
+    def _listen_redis(self):
+        backoff = 1
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(STREAM_CHANNEL)
+                backoff = 1
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    try:
+                        entry, cursor = json.loads(message['data'])
+                    except (ValueError, TypeError):
+                        logger.warning("Mensagem inválida no canal do stream")
+                        continue
+                    self._broadcast(entry, cursor)
+            except Exception as e:
+                logger.warning(f"Stream SSE desconectado do Redis: {str(e)}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    # Lado do assinante (thread da requisição)
+
+    def connect(self, token, params, query, since=None):
+        """Registra um assinante e devolve o corpo da resposta (EventStream)
+
+        Levanta StreamUnavailable, StreamError ou StreamUnauthorized se a
+        conexão é recusada.
+        """
+        if self.unavailable:
+            raise StreamUnavailable(self.unavailable)
+        try:
+            periodo = parse_periodo(params['periodo']) if params.get('periodo') else None
+        except ValueError as e:
+            raise StreamError(str(e))
+        if since and not since.rpartition('.')[2].isdigit():
+            raise StreamError('Cursor de alterações inválido')
+
+        user = self.authenticate(token, params, query) if token else None
+        if user is None:
+            raise StreamUnauthorized('Token inválido ou ausente')
+        visible, unidade = user
+
+        # Registra antes de reenviar o log: o que chegar no meio fica na fila
+        subscriber = Subscriber(visible, unidade, periodo, self.queue_size)
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                raise StreamUnavailable('Limite de conexões do stream atingido')
+            self._clients.add(subscriber)
+        self._start_listener()
+        return EventStream(self, subscriber, since)
+
+    def _disconnect(self, subscriber):
+        with self._lock:
+            self._clients.discard(subscriber)
+
+    def _events(self, subscriber, since):
+        try:
+            yield b'retry: 3000\n\n'
+            ultimo = yield from self._replay(subscriber, since)
+            while not subscriber.dropped:
+                try:
+                    id, data = subscriber.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield b': ping\n\n'
+                    continue
+                # Entradas que chegaram durante o reenvio já foram enviadas
+                if id > ultimo:
+                    self.sent += 1
+                    yield data
+        except Exception as e:
+            logger.warning(f"Erro no stream SSE: {str(e)}")
+
+    def _replay(self, subscriber, since):
+        """Eventos das alterações depois de `since`
+
+        Devolve o id da última entrada reenviada, para descartar da fila o
+        que já foi enviado.
+        """
+        if not since:
+            cursor = self.changelog.cursor()
+            yield _event('conectado', json.dumps({'cursor': cursor}), cursor)
+            return int(cursor.rpartition('.')[2])
+
+        while True:
+            resultado = self.changelog.since(since, REPLAY_LIMIT, subscriber.visible)
+            if resultado['recarregar']:
+                cursor = resultado['cursor']
+                yield _event('recarregar', json.dumps({'cursor': cursor}), cursor)
+                return int(cursor.rpartition('.')[2])
+
+            for entry in resultado['alteracoes']:
+                if subscriber.accepts(entry, entry_periodo(entry)):
+                    cursor = f"{resultado['cursor'].rpartition('.')[0]}.{entry['id']}"
+                    self.sent += 1
+                    yield _event('alteracao', self.encode(entry), cursor)
+            since = resultado['cursor']
+            if not resultado['mais']:
+                return int(since.rpartition('.')[2])
+
+def stream_response(hub):
+    """Resposta de GET /api/stream na requisição atual
+
+    O token vem na query string (token do stream) ou em Authorization:
+    Bearer; o cursor, em since ou no Last-Event-ID da reconexão. Levanta as
+    exceções de StreamHub.connect se a conexão é recusada.
+    """
+    params = request.args.to_dict()
+    token = params.get('token')
+    query = bool(token)
+    authorization = request.headers.get('Authorization', '')
+    if not token and authorization.startswith('Bearer '):
+        token = authorization[7:]
+    since = params.get('since') or request.headers.get('Last-Event-ID')
+
+    body = hub.connect(token, params, query, since)
+    return Response(body, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def create_stream_hub(changelog, authenticate, encode, enrich=None, cache=None):
+    """Cria o hub com as variáveis de ambiente; nada é aberto até a primeira conexão"""
+    return StreamHub(
+        changelog, authenticate, encode, enrich=enrich,
+        redis_client=getattr(cache, 'redis', None),
+        heartbeat=int(os.environ.get('SSE_HEARTBEAT', 25)),
+        max_clients=int(os.environ.get('SSE_MAX_CLIENTS', 50))
+    )
@@ -0,0 +1,195 @@
+"""
+Cache das abas em disco para o aquecimento após um restart
+
+Sem ele, cada restart (deploy, reciclagem de worker) relê todas as abas da
+planilha: o primeiro acesso fica lento e as leituras se concentram num pico
+que esbarra na cota da API. Com SHEETS_CACHE_DIR configurado, cada aba lida
+da API é gravada em disco junto com a sua marca de revisão; no boot, o
+aquecimento confere as marcas de todas as abas numa única chamada
+(values.batchGet) e põe no cache as que continuam válidas, sem relê-las.
+
+Formato de <aba>.<chave>.cache: MAGIC seguido de um bloco zlib com um
+JSON de aba, chave, marca e registros. Os registros de get_all_records vão
+como dicts; os de get_records (records.py), como o tipo e a lista de
+valores de cada registro. O arquivo é gravado em segundo plano, de forma
+atômica. O formato é só de dados (sem pickle): um arquivo adulterado no
+diretório não executa código ao ser lido.
+
+A marca de revisão é o número de linhas da aba e um CRC da última linha:
+a conferência lê só a última linha conhecida e a seguinte, o que detecta
+linhas acrescentadas ou removidas. Uma edição no meio da aba feita direto
+no Google Sheets não é vista no boot; ela aparece na próxima releitura da
+aba (expiração do cache), como antes. As escritas da própria aplicação
+descartam o arquivo da aba.
+"""
+
+import os
+import re
+import json
+import zlib
+import logging
+import threading
+
+from records import SheetRecord, numericise
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'GIWARM\x02\n'
+FILE_SUFFIX = '.cache'
+
+def _safe(name):
+    return re.sub(r'[^\w-]', '_', name)
+
+def _row_crc(values):
+    values = list(values)
+    while values and values[-1] == '':
+        values.pop()
+    return zlib.crc32(repr(values).encode('utf-8'))
+
+def _record_types():
+    types = {}
+    pending = [SheetRecord]
+    while pending:
+        for subclass in pending.pop().__subclasses__():
+            types[subclass.__name__] = subclass
+            pending.append(subclass)
+    return types
+
+def encode_entry(sheet_name, key, marker, records):
+    """Conteúdo do arquivo de uma aba (bytes)"""
+    if records and isinstance(records[0], SheetRecord):
+        tipo = type(records[0]).__name__
+        registros = [record.__getstate__() for record in records]
+    else:
+        tipo = None
+        registros = list(records)
+    payload = json.dumps({
+        'aba': sheet_name,
+        'chave': key,
+        'marca': list(marker),
+        'tipo': tipo,
+        'registros': registros
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return MAGIC + zlib.compress(payload, 1)
+
+def decode_entry(data):
+    """(aba, chave, marca, registros) de um arquivo (ValueError se inválido)"""
+    if not data.startswith(MAGIC):
+        raise ValueError('cabeçalho inválido')
+    entry = json.loads(zlib.decompress(data[len(MAGIC):]).decode('utf-8'))
+
+    registros = entry['registros']
+    tipo = entry['tipo']
+    if tipo is not None:
+        record_type = _record_types().get(tipo)
+        if record_type is None:
+            raise ValueError(f'tipo de registro desconhecido: {tipo}')
+        new = record_type.__new__
+        records = []
+        for state in registros:
+            record = new(record_type)
+            record.__setstate__(state)
+            records.append(record)
+        registros = tuple(records)
+    return entry['aba'], entry['chave'], tuple(entry['marca']), registros
+
+def marker_from_rows(rows):
+    """Marca de revisão de uma leitura get_all_values (cabeçalho incluso)"""
+    if not rows:
+        return None
+    return (len(rows), _row_crc(numericise(value) for value in rows[-1]))
+
+def marker_from_records(records):
+    """Marca de revisão de uma leitura get_all_records (dicts por cabeçalho)"""
+    if not records:
+        return None
+    return (len(records) + 1, _row_crc(records[-1].values()))
+
+class SheetDiskCache:
+    """Registros das abas gravados em disco, com a marca de revisão de cada uma"""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def _path(self, sheet_name, key):
+        return os.path.join(self.directory, f'{_safe(sheet_name)}.{_safe(key)}{FILE_SUFFIX}')
+
+    def _write(self, sheet_name, key, marker, records):
+        path = self._path(sheet_name, key)
+        temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            data = encode_entry(sheet_name, key, marker, records)
+            with open(temp, 'wb') as f:
+                f.write(data)
+            os.replace(temp, path)
+        except Exception as e:
+            logger.warning(f"Erro ao gravar cache em disco de '{sheet_name}': {str(e)}")
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+    def save(self, sheet_name, key, records, marker):
+        """Grava os registros em segundo plano (sem marca, não grava)"""
+        if marker is None:
+            return
+        threading.Thread(
+            target=self._write,
+            args=(sheet_name, key, marker, records),
+            name='sheets-disk-cache',
+            daemon=True
+        ).start()
+
+    def discard(self, sheet_name):
+        """Remove os arquivos de uma aba (após uma escrita da aplicação)"""
+        prefix = f'{_safe(sheet_name)}.'
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(prefix) and entry.name.endswith(FILE_SUFFIX):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def load(self):
+        """Lista de (aba, chave, marca, registros) gravados"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(FILE_SUFFIX):
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    entries.append(decode_entry(f.read()))
+            except Exception as e:
+                logger.warning(f"Cache em disco ilegível ({entry.name}): {str(e)}")
+                os.remove(entry.path)
+        return entries
+
+    def revalidate(self, spreadsheet, entries):
+        """Entradas cuja marca confere com a planilha, numa única chamada à API
+
+        Para cada aba lê a última linha conhecida e a seguinte: a primeira
+        precisa ter o mesmo CRC e a segunda precisa estar vazia.
+        """
+        if not entries:
+            return []
+
+        markers = sorted({(sheet_name, marker) for sheet_name, _, marker, _ in entries})
+        ranges = []
+        for sheet_name, (linhas, _) in markers:
+            title = sheet_name.replace("'", "''")
+            ranges.append(f"'{title}'!{linhas}:{linhas + 1}")
+
+        try:
+            response = spreadsheet.values_batch_get(ranges)
+        except Exception as e:
+            logger.warning(f"Não foi possível conferir o cache em disco: {str(e)}")
+            return []
+
+        valid = set()
+        for (sheet_name, marker), value_range in zip(markers, response.get('valueRanges', [])):
+            values = value_range.get('values', [])
+            if len(values) == 1 and _row_crc(numericise(value) for value in values[0]) == marker[1]:
+                valid.add((sheet_name, marker))
+
+        return [entry for entry in entries if (entry[0], entry[2]) in valid]
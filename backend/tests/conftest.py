@@ -0,0 +1,6 @@
+"""Configuração dos testes: os módulos da aplicação ficam em backend/src"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
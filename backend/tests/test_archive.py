@@ -0,0 +1,103 @@
+"""Testes do arquivo dos anos fechados (archive.py)"""
+
+import os
+
+import pytest
+
+from archive import ArchiveStore, ArchivedYear, archive_path, archive_sheet, encode_year, write_year
+from records import Lancamento
+
+HEADER = ['Timestamp', 'Email_Usuario', 'ID_Unidade', 'Indicador_Nome', 'Mes', 'Ano',
+          'Valor_Numerador', 'Valor_Denominador']
+
+def linha(ano, mes, unidade='1', indicador='Taxa', num='4', den='10'):
+    return [f'{ano}-{mes:02d}-05T08:00:00', 'ana@hospital.com', unidade, indicador, str(mes), str(ano), num, den]
+
+class FakeWorksheet:
+    def __init__(self, rows):
+        self.rows = [list(row) for row in rows]
+
+    def get_all_values(self):
+        return [list(row) for row in self.rows]
+
+    def delete_rows(self, inicio, fim):
+        del self.rows[inicio - 1:fim]
+
+class FakeManager:
+    def __init__(self, rows):
+        self.worksheet = FakeWorksheet(rows)
+        self.invalidated = []
+
+    def get_worksheet(self, sheet_name):
+        return self.worksheet
+
+    def invalidate(self, sheet_name):
+        self.invalidated.append(sheet_name)
+
+def test_arquivo_devolve_os_valores_da_planilha():
+    rows = [HEADER, linha(2024, 1, num='1,5'), linha(2024, 2, unidade='Média Geral', num='2.5', den=''),
+            linha(2024, 2, indicador='Satisfação', num='abc')]
+    records = Lancamento.decode(rows)
+
+    ano = ArchivedYear.decode(encode_year(2024, records))
+
+    assert ano.ano == 2024
+    assert [record.values() for record in ano.records] == [record.values() for record in records]
+    somas = {(ind, uni, mes): (num, den) for ind, uni, mes, num, den in ano.aggregates}
+    assert somas[('Taxa', 1, 1)] == (15.0, 10.0)
+    assert somas[('Taxa', 'Média Geral', 2)] == (2.5, 0.0)
+
+def test_arquivo_corrompido_e_recusado():
+    with pytest.raises(ValueError):
+        ArchivedYear.decode(b'outro formato')
+
+def test_remover_apaga_so_os_anos_arquivados(tmp_path):
+    rows = [HEADER, linha(2023, 12), linha(2025, 1), linha(2024, 1), linha(2024, 2), linha(2025, 2)]
+    manager = FakeManager(rows)
+
+    arquivados = archive_sheet(manager, 2024, str(tmp_path), remover=True)
+
+    assert arquivados == [2023, 2024]
+    assert manager.worksheet.rows == [HEADER, linha(2025, 1), linha(2025, 2)]
+    assert manager.invalidated == ['Lancamentos']
+
+    store = ArchiveStore(str(tmp_path))
+    assert store.years() == [2023, 2024]
+    assert [record.mes for record in store.get(2024).records] == [1, 2]
+    assert store.get(2025) is None
+
+def test_arquivo_existente_diferente_nao_e_removido(tmp_path):
+    write_year(str(tmp_path), 2024, Lancamento.decode([HEADER, linha(2024, 1)]))
+    rows = [HEADER, linha(2024, 1, num='9'), linha(2025, 1)]
+    manager = FakeManager(rows)
+
+    arquivados = archive_sheet(manager, 2024, str(tmp_path), remover=True)
+
+    assert arquivados == []
+    assert manager.worksheet.rows == rows
+    assert manager.invalidated == []
+
+def test_arquivo_gravado_que_nao_confere_impede_a_remocao(tmp_path, monkeypatch):
+    import archive
+
+    # Simula um arquivo gravado com uma linha a menos
+    original = archive.encode_year
+    monkeypatch.setattr(archive, 'encode_year', lambda ano, records: original(ano, records[:-1]))
+    rows = [HEADER, linha(2024, 1), linha(2024, 2)]
+    manager = FakeManager(rows)
+
+    with pytest.raises(SystemExit):
+        archive_sheet(manager, 2024, str(tmp_path), remover=True)
+    assert manager.worksheet.rows == rows
+
+def test_assinatura_muda_com_os_arquivos(tmp_path):
+    store = ArchiveStore(str(tmp_path / 'arquivo'))
+    assert store.signature() == '0'
+
+    write_year(str(tmp_path / 'arquivo'), 2024, Lancamento.decode([HEADER, linha(2024, 1)]))
+    assinatura = store.signature()
+    assert assinatura != '0'
+    assert os.path.exists(archive_path(str(tmp_path / 'arquivo'), 2024))
+
+    write_year(str(tmp_path / 'arquivo'), 2023, Lancamento.decode([HEADER, linha(2023, 1)]))
+    assert store.signature() != assinatura
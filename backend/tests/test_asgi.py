@@ -0,0 +1,216 @@
+"""Testes do modo ASGI (asgi.py) e da leitura assíncrona das abas (sheets_async.py)"""
+
+import asyncio
+import importlib
+import threading
+
+import httpx
+import pytest
+from flask import Flask, Response, jsonify, request
+
+from asgi import ASGIBridge
+from sheets_async import AsyncSheetsReader, RoutePrefetch, range_title
+
+def http_scope(path, method='GET', query=b'', headers=(), root_path=''):
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': root_path + path, 'raw_path': (root_path + path).encode(),
+        'root_path': root_path, 'query_string': query, 'headers': list(headers),
+        'server': ('testserver', 80), 'client': ('10.0.0.7', 51000)
+    }
+
+async def call(asgi_app, scope, chunks=(b'',), on_send=None):
+    """Executa uma requisição; o corpo chega em `chunks`"""
+    pending = list(chunks)
+    messages = []
+
+    async def receive():
+        if pending:
+            body = pending.pop(0)
+            return {'type': 'http.request', 'body': body, 'more_body': bool(pending)}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        messages.append(message)
+        if on_send is not None:
+            on_send(message)
+
+    await asyncio.wait_for(asgi_app(scope, receive, send), timeout=10)
+    return messages
+
+def body_of(messages):
+    return b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+
+def test_resposta_e_enviada_em_pedacos():
+    app = Flask(__name__)
+    primeiro_enviado = threading.Event()
+
+    @app.route('/stream')
+    def stream():
+        def generate():
+            yield b'primeiro;'
+            # Só continua depois que o primeiro pedaço saiu para o cliente
+            assert primeiro_enviado.wait(5)
+            yield b'segundo'
+        return Response(generate(), mimetype='text/plain')
+
+    def on_send(message):
+        if message.get('body') == b'primeiro;':
+            primeiro_enviado.set()
+
+    messages = asyncio.run(call(ASGIBridge(app, threads=2), http_scope('/stream'), on_send=on_send))
+
+    assert messages[0]['type'] == 'http.response.start' and messages[0]['status'] == 200
+    corpos = [m['body'] for m in messages[1:] if m['body']]
+    assert corpos == [b'primeiro;', b'segundo']
+    assert messages[-1].get('more_body', False) is False
+
+def test_environ_da_requisicao():
+    app = Flask(__name__)
+
+    @app.route('/api/eco', methods=['POST'])
+    def eco():
+        return jsonify({
+            'script': request.script_root,
+            'path': request.path,
+            'args': request.args.to_dict(),
+            'cookies': request.cookies.to_dict(),
+            'tipo': request.content_type,
+            'accept': request.headers.get('Accept'),
+            'remoto': request.remote_addr,
+            'json': request.get_json()
+        })
+
+    corpo = ['{"valor": '.encode(), '"ação"}'.encode()]
+    scope = http_scope('/api/eco', method='POST', query=b'ano=2025&q=%C3%A1', root_path='/backend', headers=[
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(b''.join(corpo))).encode()),
+        (b'accept', b'text/html'),
+        (b'accept', b'application/json'),
+        (b'cookie', b'a=1'),
+        (b'cookie', b'b=2'),
+    ])
+    # O corpo chega em dois pedaços
+    messages = asyncio.run(call(ASGIBridge(app, threads=2), scope, chunks=corpo))
+
+    assert messages[0]['status'] == 200
+    dados = Flask(__name__).json.loads(body_of(messages))
+    assert dados == {
+        'script': '/backend',
+        'path': '/api/eco',
+        'args': {'ano': '2025', 'q': 'á'},
+        'cookies': {'a': '1', 'b': '2'},
+        'tipo': 'application/json',
+        'accept': 'text/html,application/json',
+        'remoto': '10.0.0.7',
+        'json': {'valor': 'ação'}
+    }
+
+def test_prefetch_antes_da_view_e_erro_ignorado():
+    app = Flask(__name__)
+    ordem = []
+
+    @app.route('/api/unidades')
+    def unidades():
+        ordem.append('view')
+        return jsonify([])
+
+    async def prefetch(scope):
+        ordem.append(('prefetch', scope['path']))
+        raise RuntimeError('cota')
+
+    messages = asyncio.run(call(ASGIBridge(app, threads=1, prefetch=prefetch), http_scope('/api/unidades')))
+
+    assert messages[0]['status'] == 200
+    assert ordem == [('prefetch', '/api/unidades'), 'view']
+
+class FakeLoader:
+    def __init__(self):
+        self.wanted = []
+
+    async def ensure(self, wanted):
+        self.wanted.append(wanted)
+
+@pytest.fixture(scope='module')
+def sheets_app():
+    import os
+
+    anterior = os.environ.get('SHEETS_WARM_UP')
+    os.environ['SHEETS_WARM_UP'] = 'false'
+    try:
+        yield importlib.import_module('app')
+    finally:
+        if anterior is None:
+            os.environ.pop('SHEETS_WARM_UP', None)
+        else:
+            os.environ['SHEETS_WARM_UP'] = anterior
+
+@pytest.mark.parametrize('method, path, abas', [
+    ('POST', '/api/auth/login', ['Usuarios']),
+    ('GET', '/api/unidades', ['Unidades']),
+    ('GET', '/api/indicadores/dicionario', ['Indicadores_Dicionario']),
+    ('GET', '/api/indicadores/acumulados', ['Lancamentos', 'Indicadores_Dicionario']),
+    ('GET', '/api/indicadores/ranking', ['Lancamentos', 'Indicadores_Dicionario']),
+    ('GET', '/api/indicadores/7/serie', ['Lancamentos', 'Indicadores_Dicionario']),
+    ('GET', '/api/lancamentos', ['Lancamentos', 'Indicadores_Dicionario']),
+    ('GET', '/api/health', []),
+])
+def test_rotas_da_pre_carga(sheets_app, method, path, abas):
+    # A rota existe no app (as regexes acompanham as rotas)
+    sheets_app.app.url_map.bind('testserver').match(path, method=method)
+
+    loader = FakeLoader()
+    prefetch = RoutePrefetch(loader, sheets_app.ASGI_PREFETCH_ROUTES)
+    asyncio.run(prefetch(http_scope(path, method=method)))
+
+    assert [name for wanted in loader.wanted for name, _ in wanted] == abas
+
+def test_pre_carga_com_authorization_le_usuarios_uma_vez(sheets_app):
+    loader = FakeLoader()
+    prefetch = RoutePrefetch(loader, sheets_app.ASGI_PREFETCH_ROUTES, authenticated=[('Usuarios', None)])
+
+    asyncio.run(prefetch(http_scope('/api/auth/login', headers=[(b'authorization', b'Bearer x')])))
+    asyncio.run(prefetch(http_scope('/api/indicadores/7/serie/extra', headers=[(b'authorization', b'Bearer x')])))
+
+    assert [[name for name, _ in wanted] for wanted in loader.wanted] == [['Usuarios'], ['Usuarios']]
+
+def test_range_title():
+    assert range_title("'Aba X'!A1:H30") == 'Aba X'
+    assert range_title("'Dona''s'!A1:B2") == "Dona's"
+    assert range_title('Usuarios!A1:Z1000') == 'Usuarios'
+    assert range_title('Usuarios') == 'Usuarios'
+
+def batch_get(value_ranges, sheet_names):
+    pedidos = []
+
+    def handler(request):
+        pedidos.append(request)
+        return httpx.Response(200, json={'spreadsheetId': 'planilha', 'valueRanges': value_ranges})
+
+    async def run():
+        reader = AsyncSheetsReader('planilha', base_url='http://sheets.test')
+        await reader._client.aclose()
+        reader._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await reader.batch_get(sheet_names)
+        finally:
+            await reader.aclose()
+
+    return asyncio.run(run()), pedidos
+
+def test_batch_get_liga_as_abas_pelo_titulo():
+    value_ranges = [
+        {'range': "'Dona''s'!A1:B2", 'values': [['a', 'b']]},
+        {'range': 'Usuarios!A1:Z1000', 'values': [['Email'], ['ana@hospital.com']]},
+        {'range': "'Aba Vazia'!A1:Z1000"},
+    ]
+
+    result, pedidos = batch_get(value_ranges, ['Usuarios', "Dona's", 'Aba Vazia'])
+
+    assert result == {'Usuarios': [['Email'], ['ana@hospital.com']], "Dona's": [['a', 'b']], 'Aba Vazia': []}
+    assert list(result) == ['Usuarios', "Dona's", 'Aba Vazia']
+    assert pedidos[0].url.params.get_list('ranges') == ["'Usuarios'", "'Dona''s'", "'Aba Vazia'"]
+
+def test_batch_get_sem_uma_das_abas_falha():
+    with pytest.raises(ValueError):
+        batch_get([{'range': 'Usuarios!A1:Z1000', 'values': [['Email']]}], ['Usuarios', 'Unidades'])
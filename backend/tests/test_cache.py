@@ -0,0 +1,270 @@
+"""Testes do cache em dois níveis (cache.py) com um Redis falso (fakeredis)"""
+
+import time
+import threading
+
+import fakeredis
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from cache import LRUCache, TwoLevelCache, install_sqlalchemy_invalidation
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+def make_cache(server, **kwargs):
+    kwargs.setdefault('signing_key', 'chave-de-teste')
+    return TwoLevelCache(redis_client=fakeredis.FakeRedis(server=server), **kwargs)
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+def test_l1_hit_nao_consulta_redis(server):
+    cache = make_cache(server)
+    cache.set('Unidades', 'records', [1, 2])
+    cache.redis.flushall()
+
+    assert cache.get('Unidades', 'records') == [1, 2]
+    assert cache.l1.hits == 1
+
+def test_l2_preenche_l1(server):
+    writer = make_cache(server)
+    reader = make_cache(server)
+    writer.set('Unidades', 'records', [1, 2])
+
+    assert reader.get('Unidades', 'records') == [1, 2]
+    assert reader.l2_hits == 1
+    assert reader.l1.get(('Unidades', 'records')) == ([1, 2], 0)
+
+def test_lru_descarta_a_menos_usada():
+    lru = LRUCache(maxsize=2, ttl=0)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    lru.get('a')
+    lru.set('c', 3)
+
+    assert lru.get('a') == 1
+    assert lru.get('b') is None
+    assert lru.get('c') == 3
+
+def test_lru_expira_pelo_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('cache.time.monotonic', lambda: now[0])
+    lru = LRUCache(maxsize=10, ttl=5)
+    lru.set('a', 1)
+
+    now[0] += 4
+    assert lru.get('a') == 1
+    now[0] += 2
+    assert lru.get('a') is None
+
+def test_invalidate_incrementa_versao(server):
+    cache = make_cache(server)
+    cache.set('Lancamentos', 'records', [1])
+    antes = cache.version('Lancamentos')
+
+    cache.invalidate('Lancamentos')
+
+    assert cache.version('Lancamentos') == antes + 1
+    assert cache.get('Lancamentos', 'records') is None
+    assert cache.version('Unidades') == 0
+
+def test_invalidate_sem_redis_incrementa_versao():
+    cache = TwoLevelCache()
+    cache.set('Lancamentos', 'records', [1])
+    cache.invalidate('Lancamentos')
+
+    assert cache.version('Lancamentos') == 1
+    assert cache.get('Lancamentos', 'records') is None
+
+def test_listener_descarta_l1_de_outra_instancia(server):
+    worker_a = make_cache(server)
+    worker_b = make_cache(server)
+    worker_a.set('Unidades', 'records', [1])
+    assert worker_b.get('Unidades', 'records') == [1]
+    # O listener do worker B já está inscrito
+    assert wait_until(lambda: worker_b.redis.pubsub_numsub('gi:cache:invalidate')[0][1] >= 1)
+
+    worker_a.invalidate('Unidades')
+
+    assert wait_until(lambda: worker_b.l1.get(('Unidades', 'records')) is None)
+
+def test_listener_iniciado_por_set(server):
+    worker_a = make_cache(server)
+    worker_b = make_cache(server)
+    # O worker B só grava; o L1 dele também precisa acompanhar invalidações
+    worker_b.set('Unidades', 'records', [1])
+    assert wait_until(lambda: worker_b.redis.pubsub_numsub('gi:cache:invalidate')[0][1] >= 1)
+
+    worker_a.invalidate('Unidades')
+
+    assert wait_until(lambda: worker_b.l1.get(('Unidades', 'records')) is None)
+
+def test_set_recusa_valor_carregado_antes_de_uma_invalidacao(server):
+    cache = make_cache(server)
+    version = cache.version('Lancamentos')
+    # Escrita concorrente durante a leitura da aba
+    cache.invalidate('Lancamentos')
+
+    assert cache.set('Lancamentos', 'records', ['antigo'], version=version) is False
+    assert cache.get('Lancamentos', 'records') is None
+    assert cache.set('Lancamentos', 'records', ['novo'], version=cache.version('Lancamentos')) is True
+    assert cache.get('Lancamentos', 'records') == ['novo']
+
+def test_set_sem_redis_recusa_versao_antiga():
+    cache = TwoLevelCache()
+    version = cache.version('Lancamentos')
+    cache.invalidate('Lancamentos')
+
+    assert cache.set('Lancamentos', 'records', ['antigo'], version=version) is False
+    assert cache.get('Lancamentos', 'records') is None
+
+def test_get_or_set_carrega_uma_vez_por_chave(server):
+    cache = make_cache(server)
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'valor'
+
+    def worker():
+        barrier.wait()
+        assert cache.get_or_set('Lancamentos', 'columnar', loader) == 'valor'
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+
+def test_commit_sqlalchemy_invalida_a_tabela(server):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db = SQLAlchemy(app)
+
+    class Item(db.Model):
+        __tablename__ = 'itens'
+        id = db.Column(db.Integer, primary_key=True)
+        nome = db.Column(db.String(50))
+
+    cache = make_cache(server)
+    install_sqlalchemy_invalidation(db, cache)
+
+    with app.app_context():
+        db.create_all()
+        cache.set('itens', 'lista', ['x'])
+        cache.set('outros', 'lista', ['y'])
+
+        db.session.add(Item(nome='novo'))
+        db.session.commit()
+
+        assert cache.version('itens') == 1
+        assert cache.get('itens', 'lista') is None
+        assert cache.version('outros') == 0
+        assert cache.get('outros', 'lista') == ['y']
+
+        # Rollback não invalida
+        db.session.add(Item(nome='descartado'))
+        db.session.flush()
+        db.session.rollback()
+        assert cache.version('itens') == 1
+
+def test_colunas_ignoradas_nao_invalidam(server):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db = SQLAlchemy(app)
+
+    class Usuario(db.Model):
+        __tablename__ = 'usuarios'
+        id = db.Column(db.Integer, primary_key=True)
+        nome = db.Column(db.String(50))
+        ultimo_login = db.Column(db.Integer)
+
+    cache = make_cache(server)
+    install_sqlalchemy_invalidation(db, cache, ignored_columns={'usuarios': ['ultimo_login']})
+
+    with app.app_context():
+        db.create_all()
+        usuario = Usuario(nome='a')
+        db.session.add(usuario)
+        db.session.commit()
+        assert cache.version('usuarios') == 1
+
+        # Só o ultimo_login: não invalida
+        usuario.ultimo_login = 1
+        db.session.commit()
+        assert cache.version('usuarios') == 1
+
+        # Junto com outra coluna, invalida
+        usuario.ultimo_login = 2
+        usuario.nome = 'b'
+        db.session.commit()
+        assert cache.version('usuarios') == 2
+
+def test_versao_nova_sem_mensagem_torna_l1_antigo_ausente(server):
+    worker_b = make_cache(server)
+    worker_b.set('Lancamentos', 'records', ['antigo'])
+    # Escrita de outro worker: INCR feito, mensagem do pub/sub ainda não chegou
+    worker_b.redis.incr('gi:version:Lancamentos')
+    assert worker_b.get('Lancamentos', 'records') == ['antigo']
+
+    # Um carregamento derivado lê a versão nova e não recebe a entrada velha
+    vistos = []
+    def loader():
+        vistos.append(worker_b.get('Lancamentos', 'records'))
+        return 'derivado'
+
+    assert worker_b.get_or_set('Lancamentos', 'total', loader) == 'derivado'
+    assert vistos == [None]
+    assert worker_b.l1.get(('Lancamentos', 'total')) == ('derivado', 1)
+
+def test_l2_de_versao_antiga_e_ausente(server):
+    worker_a = make_cache(server)
+    worker_a.set('Lancamentos', 'records', ['antigo'])
+    # Versão incrementada, chaves ainda não apagadas
+    worker_a.redis.incr('gi:version:Lancamentos')
+
+    worker_b = make_cache(server)
+    assert worker_b.version('Lancamentos') == 1
+    assert worker_b.get('Lancamentos', 'records') is None
+    assert worker_b.l2_misses == 1
+
+class _Explosivo:
+    executado = []
+
+    def __reduce__(self):
+        return (_Explosivo.executado.append, ('executado',))
+
+def test_valor_do_redis_sem_assinatura_valida_nao_e_desserializado(server):
+    import pickle
+
+    cache = make_cache(server)
+    cache.set('Unidades', 'records', [1])
+    cache.redis.set('gi:data:Unidades:records', b'\x00' * 32 + pickle.dumps((0, _Explosivo())))
+
+    outro = make_cache(server)
+    assert outro.get('Unidades', 'records') is None
+    assert _Explosivo.executado == []
+    assert outro.stats()['l2_rejected'] == 1
+
+    # Assinado com outra chave: também recusado
+    estranho = make_cache(server, signing_key='outra-chave')
+    assert estranho.get('Unidades', 'records') is None
+
+def test_sem_chave_de_assinatura_valores_ficam_no_l1(server):
+    cache = make_cache(server, signing_key=None)
+    assert cache.set('Unidades', 'records', [1]) is True
+    assert cache.get('Unidades', 'records') == [1]
+    assert cache.redis.get('gi:data:Unidades:records') is None
+    assert make_cache(server, signing_key=None).get('Unidades', 'records') is None
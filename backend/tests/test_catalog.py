@@ -0,0 +1,67 @@
+"""Testes da interpretação das metas e do status (catalog.py)"""
+
+import pytest
+
+from catalog import IndicatorCatalog, parse_meta
+
+@pytest.mark.parametrize('texto, op, alvo', [
+    ('Zero', '=', 0.0),
+    ('zero', '=', 0.0),
+    ('<5%', '<', 5.0),
+    ('>=95', '>=', 95.0),
+    ('≤ 2,5', '≤', 2.5),
+    ('≥ 90 %', '≥', 90.0),
+    ('> 0.5', '>', 0.5),
+])
+def test_parse_meta(texto, op, alvo):
+    meta = parse_meta(texto)
+    assert (meta.op, meta.target) == (op, alvo)
+
+@pytest.mark.parametrize('texto', ['95', '5%', '', None, 'N/A', 'abaixo de 5'])
+def test_meta_nao_interpretavel(texto):
+    assert parse_meta(texto) is None
+
+@pytest.mark.parametrize('texto, valor, status', [
+    # Zero: sem margem
+    ('Zero', 0, 'green'),
+    ('Zero', 0.1, 'red'),
+    # Máximo de 5 com tolerância de 10% (até 5,5)
+    ('<5%', 4.99, 'green'),
+    ('<5%', 5, 'yellow'),
+    ('<5%', 5.5, 'yellow'),
+    ('<5%', 5.51, 'red'),
+    # Mínimo de 95 (a partir de 85,5)
+    ('>=95', 95, 'green'),
+    ('>=95', 85.5, 'yellow'),
+    ('>=95', 85.49, 'red'),
+    # Vírgula decimal
+    ('≤ 2,5', 2.5, 'green'),
+    ('≤ 2,5', 2.75, 'yellow'),
+    ('≤ 2,5', 2.76, 'red'),
+    # Sem resultado
+    ('<5%', None, 'gray'),
+])
+def test_status(texto, valor, status):
+    assert parse_meta(texto, tolerance=0.1).status(valor) == status
+
+def test_tolerancia_zero_sem_amarelo():
+    meta = parse_meta('<5%', tolerance=0)
+    assert meta.status(5) == 'red'
+    assert meta.status(4) == 'green'
+
+def test_catalogo_em_lote():
+    catalogo = IndicatorCatalog.from_records([
+        {'Indicador': 'Mortalidade', 'Meta': '<5%'},
+        {'Indicador': 'Adesão', 'Meta': '>=95'},
+        {'Indicador': 'Sem operador', 'Meta': '95'},
+    ], tolerance=0.1)
+
+    assert catalogo.statuses(
+        ['Mortalidade', 'Adesão', 'Sem operador', 'Desconhecido', 'Mortalidade'],
+        [3, 90, 100, 1, None]
+    ) == ['green', 'yellow', 'gray', 'gray', 'gray']
+
+def test_tolerancia_do_ambiente(monkeypatch):
+    monkeypatch.setenv('META_TOLERANCE', '0.5')
+    catalogo = IndicatorCatalog.from_records([{'Indicador': 'Mortalidade', 'Meta': '<4'}])
+    assert catalogo.statuses(['Mortalidade', 'Mortalidade'], [6, 6.1]) == ['yellow', 'red']
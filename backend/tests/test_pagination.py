@@ -0,0 +1,112 @@
+"""Testes da paginação por cursor (pagination.py)"""
+
+import pytest
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+
+from pagination import (
+    PageRequest, PaginationError, decode_cursor, encode_cursor, page_request,
+    paginate_query, paginate_sequence, set_page_headers
+)
+
+def chave(item):
+    return (item,)
+
+def test_cursor_ida_e_volta():
+    valores = [3, 'Taxa de Mortalidade', 'ação']
+    assert decode_cursor(encode_cursor(valores)) == valores
+
+@pytest.mark.parametrize('cursor', ['não-base64!', 'e30', encode_cursor([])[:-1] + '@', 'bnVsbA'])
+def test_cursor_invalido(cursor):
+    with pytest.raises(PaginationError):
+        decode_cursor(cursor)
+
+def test_sequencia_percorre_todas_as_paginas():
+    itens = list(range(10))
+    vistos = []
+    after = None
+    while True:
+        pagina = paginate_sequence(itens, chave, PageRequest(limit=3, after=after))
+        vistos.extend(pagina.items)
+        assert pagina.total == 10
+        if pagina.next_cursor is None:
+            break
+        after = decode_cursor(pagina.next_cursor)
+
+    assert vistos == itens
+    # A última página (um item) não indica próxima
+    assert pagina.items == [9]
+
+def test_sequencia_retoma_depois_de_chave_removida():
+    # A busca binária retoma na primeira chave maior que a do cursor
+    pagina = paginate_sequence([1, 2, 5, 8], chave, PageRequest(limit=2, after=[3]))
+    assert pagina.items == [5, 8]
+    assert pagina.next_cursor is None
+
+def test_sequencia_sem_paginacao_devolve_tudo():
+    pagina = paginate_sequence([1, 2, 3], chave, PageRequest())
+    assert pagina.items == [1, 2, 3]
+    assert pagina.total is None
+
+def test_scope_diferente_recusa_o_cursor():
+    itens = list(range(5))
+    pagina = paginate_sequence(itens, chave, PageRequest(limit=2), scope='a')
+    after = decode_cursor(pagina.next_cursor)
+
+    assert paginate_sequence(itens, chave, PageRequest(limit=2, after=after), scope='a').items == [2, 3]
+    with pytest.raises(PaginationError):
+        paginate_sequence(itens, chave, PageRequest(limit=2, after=after), scope='b')
+
+def test_cursor_de_outro_formato_na_sequencia():
+    with pytest.raises(PaginationError):
+        paginate_sequence([1, 2], chave, PageRequest(limit=1, after=[{'x': 1}]))
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db = SQLAlchemy(app)
+
+    class Item(db.Model):
+        __tablename__ = 'itens'
+        id = db.Column(db.Integer, primary_key=True)
+        grupo = db.Column(db.Integer)
+
+    @app.route('/itens')
+    def listar():
+        try:
+            pagina = paginate_query(Item.query, [Item.grupo, Item.id], page_request(), count=Item.query.count)
+        except PaginationError as e:
+            return jsonify({'message': str(e)}), 400
+        return set_page_headers(jsonify([item.id for item in pagina.items]), pagina)
+
+    with app.app_context():
+        db.create_all()
+        for id in range(1, 8):
+            db.session.add(Item(id=id, grupo=id % 2))
+        db.session.commit()
+    return app
+
+def test_query_keyset_percorre_todas_as_paginas(app):
+    client = app.test_client()
+    vistos = []
+    url = '/itens?limit=3'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers['X-Total-Count'] == '7'
+        vistos.extend(response.get_json())
+        cursor = response.headers.get('X-Next-Cursor')
+        url = f'/itens?limit=3&after={cursor}' if cursor else None
+
+    # Ordem (grupo, id): pares, depois ímpares
+    assert vistos == [2, 4, 6, 1, 3, 5, 7]
+    # A última página não tem X-Next-Cursor nem Link
+    assert 'Link' not in response.headers
+
+def test_query_cursor_invalido_400(app):
+    client = app.test_client()
+    assert client.get('/itens?after=lixo').status_code == 400
+    assert client.get(f"/itens?after={encode_cursor([1])}").status_code == 400
+    assert client.get('/itens?limit=0').status_code == 400
+    assert client.get('/itens?limit=abc').status_code == 400
@@ -0,0 +1,168 @@
+"""Testes do hashing de senhas com controle de admissão (passwords.py)"""
+
+import importlib
+from contextlib import contextmanager
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from passwords import PasswordHasher, PasswordHasherBusy
+
+@pytest.fixture
+def hasher_env(monkeypatch):
+    monkeypatch.setenv('BCRYPT_ROUNDS', '4')
+    monkeypatch.setenv('PASSWORD_WORKERS', '0')
+    monkeypatch.setenv('PASSWORD_MAX_PENDING', '1')
+    monkeypatch.setenv('PASSWORD_ADMISSION_TIMEOUT', '0.05')
+
+@contextmanager
+def fila_cheia(hasher):
+    """Ocupa todas as vagas do hasher, como logins em andamento"""
+    for _ in range(hasher.max_pending):
+        hasher._slots.acquire()
+    try:
+        yield
+    finally:
+        for _ in range(hasher.max_pending):
+            hasher._slots.release()
+
+def test_fila_cheia_recusa_rapido():
+    hasher = PasswordHasher(rounds=4, workers=0, max_pending=1, admission_timeout=0.01)
+    hashed = hasher.hash('segredo')
+
+    with fila_cheia(hasher):
+        with pytest.raises(PasswordHasherBusy):
+            hasher.check('segredo', hashed)
+    assert hasher.stats()['rejected'] == 1
+
+    # Vaga liberada: volta a verificar
+    assert hasher.check('segredo', hashed)
+    assert hasher.stats()['in_flight'] == 0
+
+def test_rehash_por_custo_e_hash_do_werkzeug():
+    hasher = PasswordHasher(rounds=4, workers=0)
+    antigo = PasswordHasher(rounds=5, workers=0).hash('segredo')
+    werkzeug = generate_password_hash('segredo')
+
+    assert not hasher.needs_rehash(hasher.hash('segredo'))
+    assert hasher.needs_rehash(antigo)
+    assert hasher.needs_rehash(werkzeug)
+    # Hashes do werkzeug (models.py) continuam válidos até a troca
+    assert hasher.check('segredo', werkzeug)
+    assert not hasher.check('outra', werkzeug)
+
+def test_login_sqlite_ocupado_responde_503(hasher_env, monkeypatch):
+    monkeypatch.setenv('SQLITE_DATABASE_URI', 'sqlite://')
+    app_sqlite = importlib.import_module('app_sqlite')
+    # O módulo pode ter sido importado antes, com outro custo
+    monkeypatch.setattr(app_sqlite.password_hasher, 'rounds', 4)
+    monkeypatch.setattr(app_sqlite.password_hasher, 'admission_timeout', 0.05)
+
+    with app_sqlite.app.app_context():
+        app_sqlite.db.create_all()
+        unidade = app_sqlite.Unidade(nome='UTI', codigo='UTI')
+        usuario = app_sqlite.Usuario(nome='Ana', email='ana@hospital.com', unidade=unidade,
+                                     senha_hash=PasswordHasher(rounds=5, workers=0).hash('segredo'))
+        app_sqlite.db.session.add_all([unidade, usuario])
+        app_sqlite.db.session.commit()
+
+    client = app_sqlite.app.test_client()
+    credenciais = {'email': 'ana@hospital.com', 'senha': 'segredo'}
+    try:
+        with fila_cheia(app_sqlite.password_hasher):
+            resposta = client.post('/auth/login', json=credenciais)
+        assert resposta.status_code == 503
+        assert resposta.headers['Retry-After'] == '2'
+
+        resposta = client.post('/auth/login', json=credenciais)
+        assert resposta.status_code == 200
+        with app_sqlite.app.app_context():
+            senha_hash = app_sqlite.Usuario.query.filter_by(email='ana@hospital.com').one().senha_hash
+        assert senha_hash.startswith('$2b$04$')
+    finally:
+        with app_sqlite.app.app_context():
+            app_sqlite.db.drop_all()
+
+def test_login_postgresql_old_passa_pelo_pool(hasher_env, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite://')
+    monkeypatch.setenv('CORS_ORIGINS', 'http://localhost:3000')
+    # O app do módulo também sobe em produção (sem o SQLite em arquivo)
+    monkeypatch.setenv('FLASK_ENV', 'production')
+    app_old = importlib.import_module('app_postgresql_OLD')
+    from models import db, Unidade, Usuario
+
+    app = app_old.create_app('production')
+    hasher = app.extensions['password_hasher']
+    with app.app_context():
+        db.create_all()
+        unidade = Unidade(nome='UTI', codigo='UTI')
+        db.session.add_all([unidade, Usuario(nome='Ana', email='ana@hospital.com', unidade=unidade,
+                                             senha_hash=generate_password_hash('segredo'))])
+        db.session.commit()
+
+    client = app.test_client()
+    credenciais = {'email': 'ana@hospital.com', 'senha': 'segredo'}
+    try:
+        with fila_cheia(hasher):
+            resposta = client.post('/auth/login', json=credenciais)
+        assert resposta.status_code == 503
+        assert resposta.headers['Retry-After'] == '2'
+
+        assert client.post('/auth/login', json={**credenciais, 'senha': 'errada'}).status_code == 401
+
+        # Hash do werkzeug trocado por bcrypt no login
+        assert client.post('/auth/login', json=credenciais).status_code == 200
+        with app.app_context():
+            assert Usuario.query.one().senha_hash.startswith('$2b$04$')
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params):
+        self.conn.executed.append((sql, params))
+
+    def fetchone(self):
+        return self.conn.user
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, user):
+        self.user = user
+        self.executed = []
+        self.commits = 0
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        pass
+
+def test_login_postgresql_regera_hash(hasher_env, monkeypatch):
+    app_postgresql = importlib.import_module('app_postgresql')
+    hasher = PasswordHasher(rounds=4, workers=0, max_pending=1, admission_timeout=0.05)
+    monkeypatch.setattr(app_postgresql, 'password_hasher', hasher)
+    conn = FakeConnection({'id': 7, 'email': 'ana@hospital.com', 'nome': 'Ana', 'role': 'admin',
+                           'senha_hash': PasswordHasher(rounds=5, workers=0).hash('segredo')})
+    monkeypatch.setattr(app_postgresql, 'get_db', lambda: conn)
+    client = app_postgresql.app.test_client()
+    credenciais = {'email': 'ana@hospital.com', 'senha': 'segredo'}
+
+    with fila_cheia(hasher):
+        resposta = client.post('/auth/login', json=credenciais)
+    assert resposta.status_code == 503
+    assert resposta.headers['Retry-After'] == '2'
+
+    assert client.post('/auth/login', json=credenciais).status_code == 200
+    sql, (senha_hash, user_id) = conn.executed[-1]
+    assert sql.startswith('UPDATE usuarios SET senha_hash')
+    assert user_id == 7 and senha_hash.startswith('$2b$04$')
+    assert conn.commits == 1
@@ -0,0 +1,48 @@
+"""Testes dos registros compactos das abas (records.py)"""
+
+import pickle
+
+import pytest
+from gspread.utils import numericise as gspread_numericise
+
+from records import Lancamento, numericise, records_as_dicts
+
+@pytest.mark.parametrize('valor', [
+    '', '0', '42', '-7', '+3', ' 12 ', '3.5', '.5', '1e3', '2,000.1', '1,5', ',5',
+    '1_000', '_1', '3_2', 'nan', 'inf', '-Infinity', 'abc', 'N/A', 'Média Geral',
+    '2025-03', '10%', '\xa03', '٣', 'a_b', 42, 1.5, None,
+])
+def test_numericise_igual_ao_gspread(valor):
+    esperado = gspread_numericise(valor)
+    obtido = numericise(valor)
+    if esperado != esperado:
+        assert obtido != obtido
+    else:
+        assert obtido == esperado
+        assert type(obtido) is type(esperado)
+
+ROWS = [
+    ['Timestamp', 'Email_Usuario', 'ID_Unidade', 'Indicador_Nome', 'Mes', 'Ano',
+     'Valor_Numerador', 'Valor_Denominador', 'Observacao'],
+    ['2025-03-01', 'a@b.c', 'U1', 'Taxa', '3', '2025', '4', '10', 'revisado'],
+    ['2025-03-02', 'a@b.c', 'U2', 'Taxa', '3', '2025', '1_000', '2,000'],
+]
+
+def test_decode_mantem_colunas_extras():
+    records = Lancamento.decode(ROWS)
+    assert [record.to_dict() for record in records] == records_as_dicts(ROWS)
+    assert records[0].to_dict()['Observacao'] == 'revisado'
+    assert records[1].valor_numerador == '1_000'
+    assert records[1].valor_denominador == 2000
+
+def test_decode_sem_colunas_extras():
+    rows = [row[:8] for row in ROWS]
+    records = Lancamento.decode(rows)
+    assert records[0].extra is None
+    assert [record.to_dict() for record in records] == records_as_dicts(rows)
+
+def test_pickle_preserva_extras():
+    record = Lancamento.decode(ROWS)[0]
+    copia = pickle.loads(pickle.dumps(record))
+    assert copia.to_dict() == record.to_dict()
+    assert copia.values() == record.values()
@@ -0,0 +1,117 @@
+"""Testes dos acumulados em memória (rolling.py) com escritas concorrentes"""
+
+from cache import TwoLevelCache
+from columnar import to_periodo
+from rolling import RollingStore
+
+PERIODO = to_periodo(2025, 3)
+
+def make_store(linhas):
+    cache = TwoLevelCache()
+    return cache, RollingStore(cache, 'Lancamentos', lambda: list(linhas))
+
+def mes(store):
+    return store.get().get('Taxa', 1, PERIODO)['mes']
+
+def test_apply_soma_os_deltas_da_escrita():
+    linhas = [('Taxa', 1, PERIODO, 2.0, 10.0)]
+    cache, store = make_store(linhas)
+    store.get()
+
+    marca = store.begin_write()
+    linhas.append(('Taxa', 1, PERIODO, 3.0, 10.0))
+    cache.invalidate('Lancamentos')
+    store.apply(marca, [('Taxa', 1, PERIODO, 3.0, 10.0)])
+
+    # Aplicado na cópia existente, sem reconstruir
+    assert store.current() is not None
+    assert mes(store) == (5.0, 20.0)
+
+def test_reconstrucao_depois_da_escrita_nao_conta_duas_vezes():
+    linhas = [('Taxa', 1, PERIODO, 2.0, 10.0)]
+    cache, store = make_store(linhas)
+    store.get()
+
+    marca = store.begin_write()
+    linhas.append(('Taxa', 1, PERIODO, 3.0, 10.0))
+    cache.invalidate('Lancamentos')
+    # Outra requisição reconstrói da fonte já com a escrita
+    store.get()
+    store.apply(marca, [('Taxa', 1, PERIODO, 3.0, 10.0)])
+
+    assert mes(store) == (5.0, 20.0)
+
+def test_reconstrucao_com_versao_antiga_e_dados_novos_e_descartada():
+    linhas = [('Taxa', 1, PERIODO, 2.0, 10.0)]
+    cache, store = make_store(linhas)
+    store.get()
+    escrita = ('Taxa', 1, PERIODO, 3.0, 10.0)
+    marca = None
+
+    def loader():
+        # A reconstrução lê a versão antes da escrita e a fonte depois dela
+        nonlocal marca
+        marca = store.begin_write()
+        linhas.append(escrita)
+        rows = list(linhas)
+        cache.invalidate('Lancamentos')
+        return rows
+
+    # Uma reconstrução (versão da cópia diferente da atual) que cruza a escrita
+    cache.invalidate('Lancamentos')
+    store.loader = loader
+    store.get()
+    store.loader = lambda: list(linhas)
+
+    # A cópia ficou marcada com a versão anterior à escrita, mas já a contém
+    store.apply(marca, [escrita])
+
+    assert store.current() is None
+    assert mes(store) == (5.0, 20.0)
+
+def test_sql_rows_em_ordem_de_periodo():
+    from flask import Flask
+    from flask_sqlalchemy import SQLAlchemy
+    from rolling import sql_rows
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db = SQLAlchemy(app)
+
+    class Lancamento(db.Model):
+        __tablename__ = 'lancamentos'
+        id = db.Column(db.Integer, primary_key=True)
+        indicador_id = db.Column(db.Integer)
+        unidade_id = db.Column(db.Integer)
+        ano = db.Column(db.Integer)
+        mes = db.Column(db.Integer)
+        valor = db.Column(db.Numeric(10, 2))
+
+    with app.app_context():
+        db.create_all()
+        # Gravados fora de ordem
+        for ano, mes, valor in ((2025, 3, 4), (2024, 12, 1), (2025, 1, 2), (2025, 3, 6)):
+            db.session.add(Lancamento(indicador_id=1, unidade_id=1, ano=ano, mes=mes, valor=valor))
+        db.session.commit()
+
+        rows = list(sql_rows(db, Lancamento))
+        assert [row[2] for row in rows] == sorted(row[2] for row in rows)
+
+        store = RollingStore(TwoLevelCache(), 'lancamentos', lambda: sql_rows(db, Lancamento))
+        janelas = store.get().get(1, 1, PERIODO)
+        assert janelas['mes'] == (10.0, 2)
+        assert janelas['ano'] == (12.0, 3)
+        assert janelas['ultimos_12_meses'] == (13.0, 4)
+
+def test_assinatura_nova_reconstroi():
+    linhas = [('Taxa', 1, PERIODO, 2.0, 10.0)]
+    assinatura = ['a']
+    store = RollingStore(TwoLevelCache(), 'Lancamentos', lambda: list(linhas), signature=lambda: assinatura[0])
+    store.get()
+
+    # Arquivos de anos trocados pelo job, sem escrita na aba
+    linhas.append(('Taxa', 1, PERIODO, 3.0, 10.0))
+    assinatura[0] = 'b'
+
+    assert store.current() is None
+    assert mes(store) == (5.0, 20.0)
@@ -0,0 +1,63 @@
+"""Testes da serialização das respostas (serialization.py e to_dict dos modelos)"""
+
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify
+
+from models import db, Unidade, Usuario, Indicador, Lancamento
+from serialization import FastJSONProvider
+
+CRIADO_EM = datetime(2025, 3, 1, 8, 30)
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    @app.route('/lancamentos')
+    def lancamentos():
+        return jsonify({
+            'lancamentos': [lancamento.to_dict() for lancamento in Lancamento.query.order_by(Lancamento.id)],
+            'indicadores': [indicador.to_dict() for indicador in Indicador.query.order_by(Indicador.id)]
+        })
+
+    with app.app_context():
+        db.create_all()
+        unidade = Unidade(nome='UTI', codigo='UTI', criado_em=CRIADO_EM)
+        usuario = Usuario(nome='Ana', email='ana@exemplo.com', senha_hash='x', unidade=unidade, criado_em=CRIADO_EM)
+        zero = Indicador(nome='Quedas', tipo='quantidade', meta_mensal=Decimal('0'), criado_em=CRIADO_EM)
+        taxa = Indicador(nome='Taxa', tipo='percentual', meta_mensal=Decimal('95.50'), criado_em=CRIADO_EM)
+        db.session.add_all([unidade, usuario, zero, taxa])
+        db.session.add(Lancamento(indicador=taxa, unidade=unidade, usuario=usuario, ano=2025, mes=3,
+                                  valor=Decimal('12.3456'), criado_em=CRIADO_EM, atualizado_em=CRIADO_EM))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_to_dict_serializavel_pelo_json_padrao(app):
+    with app.app_context():
+        dados = [objeto.to_dict() for modelo in (Unidade, Usuario, Indicador, Lancamento)
+                 for objeto in modelo.query]
+    # Os dicts vão também para o changelog e para json.dumps fora do Flask
+    assert json.loads(json.dumps(dados)) == dados
+
+def test_resposta_igual_a_de_antes_do_provider(app):
+    resposta = app.test_client().get('/lancamentos')
+    corpo = resposta.get_json()
+
+    lancamento = corpo['lancamentos'][0]
+    assert lancamento['valor'] == 12.3456
+    assert lancamento['criado_em'] == '2025-03-01T08:30:00'
+    assert lancamento['atualizado_em'] == '2025-03-01T08:30:00'
+    assert lancamento['indicador_nome'] == 'Taxa'
+
+    metas = {indicador['nome']: indicador['meta_mensal'] for indicador in corpo['indicadores']}
+    # Meta zero continua saindo como null
+    assert metas == {'Quedas': None, 'Taxa': 95.5}
+    assert corpo['indicadores'][0]['criado_em'] == '2025-03-01T08:30:00'
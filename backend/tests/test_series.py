@@ -0,0 +1,95 @@
+"""Testes das séries mensais (series.py) e das fatias do columnar.py"""
+
+from types import SimpleNamespace
+
+from columnar import ColumnarLancamentos, to_periodo
+from series import SerieRequest, sql_series, sql_serie_response
+
+def lancamento(nome, unidade, ano, mes, num, den):
+    return SimpleNamespace(indicador_nome=nome, id_unidade=unidade, ano=ano, mes=mes,
+                           valor_numerador=num, valor_denominador=den)
+
+def make_colunas():
+    return ColumnarLancamentos.from_records([
+        lancamento('Taxa', 'A', 2025, 3, '4', '10'),
+        lancamento('Taxa', 'B', 2024, 12, '1', '2'),
+        lancamento('Taxa', 'A', 2025, 1, '2', '5'),
+        lancamento('Taxa', 'B', 2025, 3, '6', '30'),
+        lancamento('Taxa', 'A', 2025, 3, '1', '10'),
+        lancamento('Outro', 'A', 2025, 2, '9', '9'),
+        lancamento('Outro', 'A', 2025, 4, '7', '7'),
+        # Sem mês válido: fica de fora
+        lancamento('Taxa', 'A', 2025, '', '5', '5'),
+    ])
+
+def test_fatia_respeita_as_pontas_do_intervalo():
+    colunas = make_colunas()
+    inicio, fim = to_periodo(2025, 1), to_periodo(2025, 3)
+
+    lo, hi = colunas._range('Taxa', inicio, fim)
+    assert [colunas.periodo[i] for i in range(lo, hi)] == [inicio, fim, fim, fim]
+
+    # Só o mês da ponta
+    lo, hi = colunas._range('Taxa', fim, fim)
+    assert hi - lo == 3
+
+    # A fatia não entra nas linhas do indicador vizinho
+    lo, hi = colunas._range('Outro', to_periodo(2024, 1), to_periodo(2026, 1))
+    assert hi - lo == 2
+
+def test_fatia_fora_do_intervalo_ou_indicador_desconhecido_vem_vazia():
+    colunas = make_colunas()
+    assert colunas.sums('Taxa', to_periodo(2023, 1), to_periodo(2023, 12)) == {}
+    assert colunas.sums('Taxa', to_periodo(2026, 1), to_periodo(2026, 12)) == {}
+    assert colunas.sums('Inexistente', to_periodo(2025, 1), to_periodo(2025, 12)) == {}
+
+def test_series_alinhadas_com_soma_geral():
+    colunas = make_colunas()
+    series = colunas.series('Taxa', to_periodo(2025, 1), to_periodo(2025, 3), ['A', 'X'], geral=True)
+
+    # Lançamentos repetidos no mês são somados
+    assert series['A'] == ([2.0, None, 5.0], [5.0, None, 20.0])
+    # Unidade sem lançamentos vem vazia
+    assert series['X'] == ([None] * 3, [None] * 3)
+    # Geral: somas de todas as unidades, inclusive as não pedidas
+    assert series[None] == ([2.0, None, 11.0], [5.0, None, 50.0])
+
+def test_sql_media_geral_e_razao_das_somas():
+    from flask import Flask
+    from flask_sqlalchemy import SQLAlchemy
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db = SQLAlchemy(app)
+
+    class Lancamento(db.Model):
+        __tablename__ = 'lancamentos'
+        id = db.Column(db.Integer, primary_key=True)
+        indicador_id = db.Column(db.Integer)
+        unidade_id = db.Column(db.Integer)
+        ano = db.Column(db.Integer)
+        mes = db.Column(db.Integer)
+        valor = db.Column(db.Numeric(10, 2))
+
+    with app.app_context():
+        db.create_all()
+        for unidade_id, valor in ((1, 2), (1, 4), (2, 9)):
+            db.session.add(Lancamento(indicador_id=1, unidade_id=unidade_id, ano=2025, mes=3, valor=valor))
+        # Fora do intervalo pedido
+        db.session.add(Lancamento(indicador_id=1, unidade_id=1, ano=2025, mes=4, valor=100))
+        db.session.commit()
+
+        pedido = SerieRequest(to_periodo(2025, 2), to_periodo(2025, 3), [1, 2], True)
+        series = sql_series(db, Lancamento, 1, pedido)
+
+    assert series[1] == ([None, 6.0], [None, 2])
+    assert series[None] == ([None, 15.0], [None, 3])
+
+    indicador = SimpleNamespace(to_dict=lambda: {'id': 1})
+    resposta = {serie['unidade']: serie for serie in sql_serie_response(indicador, pedido, series)['series']}
+    assert resposta[1]['valor'] == [None, 3.0]
+    assert resposta[2]['valor'] == [None, 9.0]
+    # Média de todos os lançamentos (15 / 3), não a média das unidades (6)
+    assert resposta['Média Geral']['valor'] == [None, 5.0]
+    assert resposta['Média Geral']['numerador'] == [None, 15.0]
+    assert resposta['Média Geral']['denominador'] == [None, 3]
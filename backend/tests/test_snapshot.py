@@ -0,0 +1,103 @@
+"""Testes do snapshot colunar mapeado em memória (snapshot.py)"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import snapshot
+from columnar import ColumnarLancamentos, to_periodo
+from snapshot import MAGIC, Snapshot, SnapshotStore, write_snapshot
+
+def make_columnar():
+    return ColumnarLancamentos.from_records([
+        SimpleNamespace(indicador_nome=nome, id_unidade=unidade, ano=ano, mes=mes,
+                        valor_numerador=num, valor_denominador=den)
+        for nome, unidade, ano, mes, num, den in (
+            ('Taxa', 1, 2025, 3, 4, 10),
+            ('Taxa', 'Média Geral', 2025, 1, 2.5, 5),
+            ('Satisfação', 2, 2024, 12, 9, 9),
+        )
+    ])
+
+class Builder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return make_columnar()
+
+def assert_same(columnar):
+    original = make_columnar()
+    assert list(columnar.rows()) == list(original.rows())
+    inicio, fim = to_periodo(2025, 1), to_periodo(2025, 3)
+    assert columnar.series('Taxa', inicio, fim, [1], geral=True) == original.series('Taxa', inicio, fim, [1], geral=True)
+
+def test_grava_mapeia_e_reconstroi(tmp_path):
+    builder = Builder()
+    store = SnapshotStore(str(tmp_path), builder)
+    assert_same(store.get('1:1'))
+    assert builder.calls == 1
+
+    # Outro worker mapeia o arquivo existente, sem reconstruir
+    outro = Builder()
+    assert_same(SnapshotStore(str(tmp_path), outro).get('1:1'))
+    assert outro.calls == 0
+
+    # Chave nova (escrita no namespace): reconstrói
+    assert_same(store.get('1:2'))
+    assert builder.calls == 2
+    assert Snapshot.open(store.path).chave == '1:2'
+
+@pytest.mark.parametrize('corromper', [
+    lambda data: data[:len(MAGIC) + 4] + b'{nao e json' + data[len(MAGIC) + 15:],
+    lambda data: data[:len(MAGIC) + 2],
+    lambda data: data[:len(data) // 2],
+    lambda data: b'',
+])
+def test_arquivo_corrompido_e_recusado(tmp_path, corromper):
+    path = str(tmp_path / 'snap')
+    write_snapshot(path, make_columnar(), 'k')
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(corromper(data))
+
+    with pytest.raises(ValueError):
+        Snapshot.open(path)
+
+def test_cabecalho_corrompido_e_reconstruido(tmp_path):
+    store = SnapshotStore(str(tmp_path), Builder())
+    store.get('k')
+    with open(store.path, 'r+b') as f:
+        f.seek(len(MAGIC) + 4)
+        f.write(b'\xff\xff\xff')
+
+    builder = Builder()
+    assert_same(SnapshotStore(str(tmp_path), builder).get('k'))
+    assert builder.calls == 1
+
+def test_sem_arquivo_utilizavel_usa_copia_em_memoria(tmp_path, monkeypatch):
+    def write_corrompido(path, columnar, chave):
+        with open(path, 'wb') as f:
+            f.write(MAGIC + b'\x00')
+
+    monkeypatch.setattr(snapshot, 'write_snapshot', write_corrompido)
+    builder = Builder()
+    store = SnapshotStore(str(tmp_path), builder)
+
+    assert_same(store.get('k'))
+    # A cópia em memória serve às leituras seguintes da mesma chave
+    assert_same(store.get('k'))
+    assert builder.calls == 1
+
+def test_erro_de_disco_usa_copia_em_memoria(tmp_path, monkeypatch):
+    def write_falha(path, columnar, chave):
+        raise OSError('disco cheio')
+
+    monkeypatch.setattr(snapshot, 'write_snapshot', write_falha)
+    builder = Builder()
+    store = SnapshotStore(str(tmp_path), builder)
+
+    assert_same(store.get('k'))
+    assert builder.calls == 1
@@ -0,0 +1,222 @@
+"""Testes do stream SSE de alterações (stream.py)"""
+
+import json
+import queue
+import importlib
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from changes import ChangeLog, visibility
+from stream import StreamHub, StreamUnauthorized, StreamUnavailable
+
+def parse(chunk):
+    """(evento, id, dados) de um evento SSE"""
+    campos = dict(line.split(': ', 1) for line in chunk.decode('utf-8').strip().split('\n'))
+    return campos.get('event'), campos.get('id'), json.loads(campos['data'])
+
+def authenticate(token, params, query):
+    return (visibility(None, todas_unidades=True), None) if token == 'valido' else None
+
+def make_hub(**kwargs):
+    changelog = ChangeLog()
+    hub = StreamHub(changelog, authenticate, json.dumps, heartbeat=0.01, **kwargs)
+    return changelog, hub
+
+def lancar(changelog, unidade=1, mes=3):
+    return changelog.record('lancamentos', 'criado', {'ano': 2025, 'mes': mes, 'unidade_id': unidade}, unidade=unidade)
+
+def test_token_invalido_e_recusado():
+    _, hub = make_hub()
+
+    with pytest.raises(StreamUnauthorized):
+        hub.connect('outro', {}, True)
+    with pytest.raises(StreamUnauthorized):
+        hub.connect(None, {}, False)
+    assert hub.stats()['clients'] == 0
+
+def test_limite_de_conexoes():
+    _, hub = make_hub(max_clients=1)
+    body = hub.connect('valido', {}, True)
+
+    with pytest.raises(StreamUnavailable):
+        hub.connect('valido', {}, True)
+
+    body.close()
+    hub.connect('valido', {}, True).close()
+    assert hub.stats()['clients'] == 0
+
+def test_reenvia_o_log_depois_do_cursor_sem_repetir():
+    changelog, hub = make_hub()
+    lancar(changelog)
+    cursor = changelog.cursor()
+    lancar(changelog, mes=4)
+    lancar(changelog, mes=5)
+
+    body = hub.connect('valido', {}, True, since=cursor)
+    # Gravada depois de conectar e antes do reenvio: vai para a fila e para o log
+    lancar(changelog, mes=6)
+
+    assert next(body) == b'retry: 3000\n\n'
+    eventos = [parse(next(body)) for _ in range(3)]
+    assert [(nome, dados['dados']['mes']) for nome, _, dados in eventos] == [
+        ('alteracao', 4), ('alteracao', 5), ('alteracao', 6)
+    ]
+    assert eventos[-1][1] == changelog.cursor()
+    # O que estava na fila já foi reenviado: só o heartbeat
+    assert next(body) == b': ping\n\n'
+
+    lancar(changelog, mes=7)
+    nome, id, dados = parse(next(body))
+    assert (nome, dados['dados']['mes'], id) == ('alteracao', 7, changelog.cursor())
+    body.close()
+
+def test_cursor_de_outra_vida_pede_recarga():
+    changelog, hub = make_hub()
+    lancar(changelog)
+
+    body = hub.connect('valido', {}, True, since='outra-epoca.1')
+    next(body)
+    nome, id, dados = parse(next(body))
+
+    assert nome == 'recarregar'
+    assert id == dados['cursor'] == changelog.cursor()
+    body.close()
+
+def test_cliente_lento_e_desconectado():
+    changelog, hub = make_hub(queue_size=2)
+    body = hub.connect('valido', {}, True)
+    assert next(body) == b'retry: 3000\n\n'
+    assert parse(next(body))[0] == 'conectado'
+
+    for mes in (1, 2, 3):
+        lancar(changelog, mes=mes)
+
+    assert hub.stats()['dropped'] == 1
+    assert hub.stats()['clients'] == 0
+    # A resposta termina: o navegador reconecta com Last-Event-ID
+    assert list(body) == []
+
+    # Os outros assinantes continuam recebendo
+    outro = hub.connect('valido', {}, True)
+    next(outro), next(outro)
+    lancar(changelog, mes=4)
+    assert parse(next(outro))[2]['dados']['mes'] == 4
+    outro.close()
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def subscribe(self, channel):
+        pass
+
+    def listen(self):
+        while True:
+            yield {'type': 'message', 'data': self.redis.messages.get()}
+
+class FakeRedis:
+    def __init__(self):
+        self.messages = queue.Queue()
+
+    def publish(self, channel, data):
+        self.messages.put(data)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+def test_ouvinte_do_redis_so_na_primeira_conexao():
+    redis = FakeRedis()
+    changelog = ChangeLog()
+    hub = StreamHub(changelog, authenticate, json.dumps, redis_client=redis, heartbeat=1)
+
+    # Alterações gravadas sem assinantes seguem em JSON para os outros processos
+    lancar(changelog)
+    entry, cursor = json.loads(redis.messages.get_nowait())
+    assert entry['dados']['mes'] == 3 and cursor == changelog.cursor()
+    assert hub._listener is None
+
+    body = hub.connect('valido', {}, True)
+    next(body), next(body)
+    assert hub._listener.is_alive()
+
+    lancar(changelog, mes=8)
+    assert parse(next(body))[2]['dados']['mes'] == 8
+    body.close()
+
+@pytest.fixture
+def sqlite_app(monkeypatch):
+    monkeypatch.setenv('SQLITE_DATABASE_URI', 'sqlite://')
+    app_sqlite = importlib.import_module('app_sqlite')
+    monkeypatch.setattr(app_sqlite.stream_hub, 'heartbeat', 0.01)
+
+    with app_sqlite.app.app_context():
+        app_sqlite.db.create_all()
+        uti = app_sqlite.Unidade(nome='UTI', codigo='UTI')
+        cc = app_sqlite.Unidade(nome='Centro Cirúrgico', codigo='CC')
+        usuario = app_sqlite.Usuario(nome='Ana', email='ana@hospital.com', unidade=uti, senha_hash='x')
+        app_sqlite.db.session.add_all([uti, cc, usuario])
+        app_sqlite.db.session.commit()
+        ids = uti.id, cc.id
+        sessao = create_access_token(identity=str(usuario.id))
+    try:
+        yield app_sqlite, sessao, ids
+    finally:
+        with app_sqlite.app.app_context():
+            app_sqlite.db.drop_all()
+
+def open_stream(client, url, **kwargs):
+    resposta = client.get(url, buffered=False, **kwargs)
+    return resposta, iter(resposta.response)
+
+def test_rota_so_aceita_token_do_stream_na_query(sqlite_app):
+    app_sqlite, sessao, _ = sqlite_app
+    client = app_sqlite.app.test_client()
+
+    assert client.get('/api/stream').status_code == 401
+    # O JWT da sessão não vale na query string
+    assert client.get(f'/api/stream?token={sessao}').status_code == 401
+
+    token = client.post('/api/stream/token', headers={'Authorization': f'Bearer {sessao}'}).get_json()['token']
+    # E o token do stream não vale nas rotas da API
+    assert client.get('/api/changes', headers={'Authorization': f'Bearer {token}'}).status_code != 200
+
+    resposta, body = open_stream(client, f'/api/stream?token={token}')
+    assert resposta.status_code == 200
+    assert resposta.mimetype == 'text/event-stream'
+    assert 'Content-Encoding' not in resposta.headers
+    next(body)
+    assert parse(next(body))[0] == 'conectado'
+    assert app_sqlite.stream_hub.stats()['clients'] == 1
+    resposta.close()
+    assert app_sqlite.stream_hub.stats()['clients'] == 0
+
+    # Fora do navegador, o JWT da sessão no cabeçalho
+    resposta, body = open_stream(client, '/api/stream', headers={'Authorization': f'Bearer {sessao}'})
+    assert resposta.status_code == 200
+    resposta.close()
+
+def test_rota_reenvia_pelo_last_event_id(sqlite_app):
+    app_sqlite, sessao, (uti, cc) = sqlite_app
+    client = app_sqlite.app.test_client()
+    changelog = app_sqlite.changelog
+    cursor = changelog.cursor()
+    lancar(changelog, unidade=uti, mes=1)
+    lancar(changelog, unidade=cc, mes=2)
+    lancar(changelog, unidade=uti, mes=3)
+
+    # Operador: só a própria unidade, mesmo pedindo outra
+    resposta, body = open_stream(client, f'/api/stream?unidade_id={cc}', headers={
+        'Authorization': f'Bearer {sessao}',
+        'Last-Event-ID': cursor
+    })
+    assert resposta.status_code == 200
+    next(body)
+    eventos = [parse(next(body)) for _ in range(2)]
+    assert [dados['dados']['mes'] for _, _, dados in eventos] == [1, 3]
+    assert eventos[-1][1] == changelog.cursor()
+    assert next(body) == b': ping\n\n'
+    resposta.close()
+
+    assert client.get('/api/stream?periodo=2025-13', headers={'Authorization': f'Bearer {sessao}'}).status_code == 400
+    assert client.get('/api/stream', headers={'Authorization': f'Bearer {sessao}', 'Last-Event-ID': 'x'}).status_code == 400
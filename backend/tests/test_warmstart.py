@@ -0,0 +1,89 @@
+"""Testes do cache das abas em disco (warmstart.py)"""
+
+import re
+
+from records import Lancamento, records_as_dicts
+from warmstart import MAGIC, SheetDiskCache, marker_from_records, marker_from_rows
+
+ROWS = [
+    ['Timestamp', 'Email_Usuario', 'ID_Unidade', 'Indicador_Nome', 'Mes', 'Ano',
+     'Valor_Numerador', 'Valor_Denominador', 'Observacao'],
+    ['2025-03-01', 'ana@hospital.com', '1', 'Taxa', '3', '2025', '4', '10', 'revisão'],
+    ['2025-03-02', 'ana@hospital.com', 'Média Geral', 'Taxa', '3', '2025', '2.5', ''],
+]
+
+class FakeSpreadsheet:
+    """values_batch_get sobre linhas em memória, como a API (sem vazios no fim)"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.ranges = []
+
+    def values_batch_get(self, ranges):
+        self.ranges.extend(ranges)
+        value_ranges = []
+        for text in ranges:
+            inicio, fim = map(int, re.search(r'!(\d+):(\d+)$', text).groups())
+            values = []
+            for row in self.rows[inicio - 1:fim]:
+                row = list(row)
+                while row and row[-1] == '':
+                    row.pop()
+                values.append(row)
+            while values and not values[-1]:
+                values.pop()
+            value_ranges.append({'range': text, 'values': values})
+        return {'valueRanges': value_ranges}
+
+def make_disk(tmp_path):
+    disk = SheetDiskCache(str(tmp_path))
+    records = Lancamento.decode(ROWS)
+    dicts = records_as_dicts(ROWS)
+    # Gravação síncrona (save() grava numa thread)
+    disk._write('Lancamentos', 'records:Lancamento', marker_from_rows(ROWS), records)
+    disk._write('Lancamentos', 'records', marker_from_records(dicts), dicts)
+    return disk, records, dicts
+
+def test_grava_e_le_sem_pickle(tmp_path):
+    disk, records, dicts = make_disk(tmp_path)
+
+    entries = {key: entry for _, key, *entry in disk.load()}
+    marca, lidos = entries['records:Lancamento']
+    assert marca == marker_from_rows(ROWS)
+    assert isinstance(lidos, tuple)
+    assert [record.to_dict() for record in lidos] == [record.to_dict() for record in records]
+    assert entries['records'] == [marker_from_records(dicts), dicts]
+
+    data = (tmp_path / 'Lancamentos.records_Lancamento.cache').read_bytes()
+    assert data.startswith(MAGIC)
+
+def test_arquivo_invalido_e_descartado(tmp_path):
+    disk, _, _ = make_disk(tmp_path)
+    # Arquivo do formato antigo (pickle) ou adulterado
+    (tmp_path / 'Indicadores.records.cache').write_bytes(b'GIWARM\x01\n' + b'x' * 10)
+
+    assert len(disk.load()) == 2
+    assert not (tmp_path / 'Indicadores.records.cache').exists()
+
+def test_marca_valida_reaproveita(tmp_path):
+    disk, _, _ = make_disk(tmp_path)
+    spreadsheet = FakeSpreadsheet(ROWS)
+
+    valid = disk.revalidate(spreadsheet, disk.load())
+
+    assert len(valid) == 2
+    # As duas leituras da aba têm a mesma marca: uma faixa só
+    assert spreadsheet.ranges == ["'Lancamentos'!3:4"]
+
+def test_ultima_linha_alterada_invalida(tmp_path):
+    disk, _, _ = make_disk(tmp_path)
+    rows = [list(row) for row in ROWS]
+    rows[-1][6] = '3'
+
+    assert disk.revalidate(FakeSpreadsheet(rows), disk.load()) == []
+
+def test_linha_acrescentada_invalida(tmp_path):
+    disk, _, _ = make_disk(tmp_path)
+    rows = ROWS + [['2025-03-03', 'ana@hospital.com', '2', 'Taxa', '3', '2025', '1', '1']]
+
+    assert disk.revalidate(FakeSpreadsheet(rows), disk.load()) == []
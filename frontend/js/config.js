@@ -9,6 +9,13 @@ const API_CONFIG = {
     : 'https://sua-api.netlify.app',
   apiEndpoint: '/api',
   authEndpoint: '/auth',
+  // Stream SSE de alterações: rota da própria API; streamEnabled false =
+  // sem push
+  streamEnabled: true,
+  get streamURL() {
+    if (!this.streamEnabled) return null;
+    return `${this.baseURL}${this.apiEndpoint}/stream`;
+  },
   timeout: 10000,
   retryAttempts: 3,
   auth: {
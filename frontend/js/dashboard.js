@@ -6,6 +6,10 @@ class DashboardManager {
   constructor() {
     this.currentDashboardData = [];
     this.isLoading = false;
+    this.stream = null;
+    this.streamFilters = null;
+    this.streamCursor = null;
+    this.streamRetry = null;
   }
 
   init() {
@@ -46,7 +50,8 @@ class DashboardManager {
     }
   }
 
-  async carregarDashboard() {
+  // silencioso: recarga pedida pelo stream, sem loading nem aviso
+  async carregarDashboard({ silencioso = false } = {}) {
     if (this.isLoading) return;
 
     this.isLoading = true;
@@ -59,7 +64,7 @@ class DashboardManager {
       this.updateDashboardHeader(filters);
       
       // Mostra loading
-      this.showLoading();
+      if (!silencioso) this.showLoading();
       
       // Busca dados
       const lancamentos = await this.fetchLancamentos(filters);
@@ -67,7 +72,10 @@ class DashboardManager {
       // Renderiza resultados
       this.renderDashboardResults(lancamentos);
       
-      window.app.showSuccess('Dashboard atualizado com sucesso!');
+      // Recebe por push as alterações dos filtros exibidos
+      this.assinarAlteracoes(filters);
+      
+      if (!silencioso) window.app.showSuccess('Dashboard atualizado com sucesso!');
       
     } catch (error) {
       window.app.log('error', 'Erro ao carregar dashboard:', error);
@@ -78,6 +86,95 @@ class DashboardManager {
     }
   }
 
+  // Abre (ou mantém, se os filtros não mudaram) o stream de alterações
+  async assinarAlteracoes(filters, since = null) {
+    const chave = JSON.stringify(filters);
+    if (this.stream && this.streamFilters === chave) return;
+
+    this.fecharStream();
+    this.streamFilters = chave;
+
+    const periodo = filters.ano && filters.mes
+      ? `${filters.ano}-${String(filters.mes).padStart(2, '0')}`
+      : null;
+
+    let source;
+    try {
+      source = await this.subscribeChanges({
+        unidade: filters.unidade || null,
+        periodo,
+        since,
+        onChange: (entry) => this.aplicarAlteracao(entry, filters),
+        onReload: () => this.carregarDashboard({ silencioso: true })
+      });
+    } catch (error) {
+      window.app.log('warn', 'Stream de alterações indisponível:', error);
+      source = null;
+    }
+
+    // Os filtros mudaram enquanto o token era pedido
+    if (this.streamFilters !== chave) {
+      if (source) source.close();
+      return;
+    }
+    this.stream = source;
+    if (!source) return;
+
+    source.addEventListener('conectado', (event) => {
+      this.streamCursor = event.lastEventId;
+    });
+    source.addEventListener('error', () => {
+      // Resposta de erro (ex.: token do stream vencido na reconexão): o
+      // EventSource desiste; assina de novo com outro token, do último cursor
+      if (source.readyState !== EventSource.CLOSED || this.stream !== source) return;
+      this.stream = null;
+      clearTimeout(this.streamRetry);
+      this.streamRetry = setTimeout(() => this.assinarAlteracoes(filters, this.streamCursor), 5000);
+    });
+  }
+
+  fecharStream() {
+    clearTimeout(this.streamRetry);
+    if (this.stream) this.stream.close();
+    this.stream = null;
+    this.streamFilters = null;
+  }
+
+  clearCache() {
+    this.fecharStream();
+    this.streamCursor = null;
+    this.currentDashboardData = [];
+  }
+
+  // Atualiza o card do indicador lançado com os acumulados do mês que vêm
+  // na alteração; sem eles (ou sem o card), recarrega a listagem
+  aplicarAlteracao(entry, filters) {
+    if (entry.entidade !== 'Lancamentos') return;
+
+    const dados = entry.dados || {};
+    if (filters.ano && String(dados.Ano) !== String(filters.ano)) return;
+    if (filters.mes && String(dados.Mes) !== String(filters.mes)) return;
+
+    const agregados = entry.agregados;
+    const janelas = agregados && (filters.unidade ? agregados.janelas : agregados.geral);
+    const linha = filters.mes && Array.isArray(this.currentDashboardData)
+      ? this.currentDashboardData.find(lanc => lanc.Indicador_Nome === dados.Indicador_Nome
+          && (!filters.unidade || String(lanc.ID_Unidade) === String(dados.ID_Unidade)))
+      : null;
+
+    if (!janelas || !linha) {
+      this.carregarDashboard({ silencioso: true });
+      return;
+    }
+
+    const [numerador, denominador] = janelas.mes;
+    linha.Valor_Numerador = numerador;
+    linha.Valor_Denominador = denominador;
+    linha.resultado = denominador ? (numerador / denominador * 100).toFixed(2) : 'N/A';
+    linha.status = agregados.status[filters.unidade ? 'unidade' : 'geral'];
+    this.renderDashboardResults(this.currentDashboardData);
+  }
+
   getFilters() {
     return {
       unidade: document.getElementById('filtro-unidade')?.value || '',
@@ -173,8 +270,10 @@ class DashboardManager {
       if (filters.unidade) params.append('unidade', filters.unidade);
       if (filters.ano) params.append('ano', filters.ano);
       if (filters.mes) params.append('mes', filters.mes);
+      params.append('formato', 'compacto');
       
-      return await window.app.makeApiCall(`/lancamentos?${params.toString()}`);
+      const data = await window.app.makeApiCall(`/lancamentos?${params.toString()}`);
+      return this.expandCompact(data);
       
     } catch (error) {
       // Fallback para dados de exemplo em desenvolvimento
@@ -182,6 +281,87 @@ class DashboardManager {
     }
   }
 
+  // Série mensal de um indicador (gráficos de tendência) em uma requisição
+  async fetchSerie(indicadorId, { unidades = ['geral'], meses = 12, fim = null } = {}) {
+    const params = new URLSearchParams();
+    params.append('unidades', unidades.join(','));
+    params.append('meses', meses);
+    if (fim) params.append('fim', fim);
+    
+    return await window.app.makeApiCall(
+      `/indicadores/${encodeURIComponent(indicadorId)}/serie?${params.toString()}`
+    );
+  }
+
+  // Mês, últimos 12 meses e acumulado no ano de todos os indicadores
+  async fetchAcumulados({ periodo = null, unidade = null } = {}) {
+    const params = new URLSearchParams();
+    if (periodo) params.append('periodo', periodo);
+    if (unidade) params.append('unidade', unidade);
+
+    return await window.app.makeApiCall(`/indicadores/acumulados?${params.toString()}`);
+  }
+
+  // Ranking das unidades em cada indicador (posição, percentil e desvio)
+  async fetchRanking(periodo = null) {
+    const params = new URLSearchParams();
+    if (periodo) params.append('periodo', periodo);
+
+    return await window.app.makeApiCall(`/indicadores/ranking?${params.toString()}`);
+  }
+
+  // Alterações desde o cursor (sem cursor, devolve só o cursor atual).
+  // Com recarregar = true, as listagens devem ser recarregadas por completo
+  async fetchChanges(since = null) {
+    const params = new URLSearchParams();
+    if (since) params.append('since', since);
+
+    return await window.app.makeApiCall(`/changes?${params.toString()}`);
+  }
+
+  // Push das alterações (SSE). onChange recebe cada entrada do log (com os
+  // acumulados do indicador em "agregados", quando disponíveis); onReload é
+  // chamado quando as listagens precisam ser recarregadas. Resolve com o
+  // EventSource (close() para encerrar) ou null sem streamURL configurada
+  async subscribeChanges({ unidade = null, periodo = null, since = null, onChange, onReload } = {}) {
+    const { streamURL, auth } = window.APP_CONFIG.API_CONFIG;
+    if (!streamURL || !localStorage.getItem(auth.tokenKey) || !window.EventSource) return null;
+
+    // A URL do EventSource aparece em logs: vai nela um token curto do
+    // stream, pedido com o JWT da sessão no cabeçalho
+    const { token } = await window.APP_CONFIG.ApiUtils.post('/stream/token');
+
+    const params = new URLSearchParams({ token });
+    if (unidade) params.append('unidade', unidade);
+    if (periodo) params.append('periodo', periodo);
+    if (since) params.append('since', since);
+
+    const source = new EventSource(`${streamURL}?${params.toString()}`);
+    source.addEventListener('alteracao', (event) => {
+      this.streamCursor = event.lastEventId;
+      if (onChange) onChange(JSON.parse(event.data));
+    });
+    source.addEventListener('recarregar', (event) => {
+      this.streamCursor = event.lastEventId;
+      if (onReload) onReload();
+    });
+    return source;
+  }
+
+  // Formato compacto: dados dos indicadores numa tabela à parte
+  expandCompact(data) {
+    if (!data || !Array.isArray(data.lancamentos)) {
+      return data;
+    }
+    
+    const vazio = { meta: 'N/A', descricao: 'N/A', num_label: 'N/A', den_label: 'N/A' };
+    const indicadores = data.indicadores || {};
+    return data.lancamentos.map(lanc => ({
+      ...lanc,
+      ...(indicadores[lanc.Indicador_Nome] || vazio)
+    }));
+  }
+
   getMockData(filters) {
     // Dados de exemplo para desenvolvimento
     return [